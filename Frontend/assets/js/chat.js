@@ -25,16 +25,31 @@ $(document).ready(function() {
     }
   }
 
+  // Session id assigned by the backend on the first reply; sent back with
+  // every message so this tab keeps its own conversation with the bot.
+  var sessionId = sessionStorage.getItem('chatbotSessionId');
+
   function callChatbotApi(message) {
+    var unstructured = {
+      text: message
+    };
+    if (sessionId) {
+      unstructured.id = sessionId;
+    }
     // params, body, additionalParams
     return sdk.chatbotPost({}, {
       messages: [{
         type: 'unstructured',
-        unstructured: {
-          text: message
-        }
+        unstructured: unstructured
       }]
-    }, {});
+    }, {}).then((response) => {
+      var messages = response.data.messages || [];
+      if (!sessionId && messages.length > 0 && messages[0].unstructured && messages[0].unstructured.id) {
+        sessionId = messages[0].unstructured.id;
+        sessionStorage.setItem('chatbotSessionId', sessionId);
+      }
+      return response;
+    });
   }
 
   function insertMessage() {
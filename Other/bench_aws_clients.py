@@ -0,0 +1,79 @@
+"""
+Per-invocation cost of getting the AWS clients the lambdas use, building them
+inside every invocation (as lf0/lf1/lf2 used to) versus the shared
+aws_clients registry. Each mode runs in a fresh interpreter so the first
+invocation is a real cold start; GetQueueUrl is served by the SQS stand-in
+with injected latency.
+
+    python Other/bench_aws_clients.py --invocations 50 --latency 0.02
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+LAMBDAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambdas')
+sys.path.insert(0, LAMBDAS)
+
+
+def per_invocation(fake_sqs):
+    import boto3
+
+    boto3.client('lex-runtime')
+    boto3.client('sqs')
+    boto3.resource('dynamodb')
+    boto3.client('sns')
+    fake_sqs.get_queue_url(QueueName='DiningBotQueue')
+
+
+def registry(fake_sqs):
+    import aws_clients
+
+    aws_clients.client('lex-runtime')
+    aws_clients.client('sqs')
+    aws_clients.resource('dynamodb')
+    aws_clients.client('sns')
+    aws_clients.queue_url('DiningBotQueue', sqs=fake_sqs)
+
+
+def run(mode, invocations, latency):
+    """Time `invocations` calls of one mode in this interpreter; print JSON."""
+    import boto3  # noqa: F401  imported by every lambda either way
+    from local_aws import FakeSQS
+
+    invoke = per_invocation if mode == 'before' else registry
+    fake_sqs = FakeSQS(latency=latency)
+    timings = []
+    for _ in range(invocations):
+        start = time.perf_counter()
+        invoke(fake_sqs)
+        timings.append((time.perf_counter() - start) * 1000)
+    print(json.dumps({'cold': timings[0], 'warm': sum(timings[1:]) / max(1, len(timings) - 1),
+                      'get_queue_url': fake_sqs.stats['get_queue_url']}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--invocations', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds per GetQueueUrl')
+    parser.add_argument('--mode', choices=['before', 'after'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run(args.mode, args.invocations, args.latency)
+        return
+
+    env = dict(os.environ, AWS_DEFAULT_REGION=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
+    print("{:<8} {:>10} {:>10} {:>14}".format('mode', 'cold ms', 'warm ms', 'GetQueueUrl'))
+    for mode in ('before', 'after'):
+        output = subprocess.check_output([sys.executable, __file__, '--mode', mode,
+                                          '--invocations', str(args.invocations),
+                                          '--latency', str(args.latency)], env=env)
+        result = json.loads(output)
+        print("{:<8} {:>10.1f} {:>10.2f} {:>14}".format(mode, result['cold'], result['warm'], result['get_queue_url']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+End-to-end run of the chatbot pipeline against the in-process stand-ins:
+conversations go through lf0.lambda_handler, the fake Lex calls
+lf1.lambda_handler, lf1 queues the request on the fake SQS, and a consumer
+thread drains the queue with lf2.lambda_handler, which searches the fake
+search domain and texts through the fake SNS. Every stand-in adds
+`--latency` seconds per call and the catalog comes from a fixture.
+
+Reports conversation throughput, per-turn latency of lf0, latency from the
+first message to the SMS being sent, and the per-stage metrics.
+
+    python Other/bench_e2e.py --conversations 200 --concurrency 8 --latency 0.01
+    python Other/bench_e2e.py --catalog staging.jsonl
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambdas'))
+
+import aws_clients
+import metrics
+import structured_log
+from local_aws import (FIXTURE_CUISINES, FakeDynamoDB, FakeLex, FakeSearch, FakeSNS, FakeSQS,
+                       fixture_catalog, load_catalog)
+from restaurant_search import INDEX, restaurant_document
+from restaurant_store import TABLE_NAME
+
+
+def local_environment(catalog, latency, throttle_every=0):
+    """Register stand-ins for every service the lambdas use; returns them by name."""
+    import lf1
+    import lf2
+
+    services = {
+        'dynamodb': FakeDynamoDB(latency=latency),
+        'sqs': FakeSQS(latency=latency),
+        'sns': FakeSNS(latency=latency, throttle_every=throttle_every),
+        'lex-runtime': FakeLex(lf1.lambda_handler, latency=latency),
+        'search': FakeSearch(latency=latency),
+    }
+    services['dynamodb'].Table(TABLE_NAME).load(catalog)
+    services['search'].index_documents(INDEX, [restaurant_document(item) for item in catalog])
+
+    aws_clients.reset()
+    for name in ('dynamodb', 'sqs', 'sns', 'lex-runtime'):
+        aws_clients.register(name, services[name])
+    lf2.SEARCH_CLIENT = services['search']
+    lf2.SNAPSHOT = None
+    return services
+
+
+def conversation(index, cuisines):
+    phone = '212{:07d}'.format(index)
+    return phone, ['hi', 'I need some restaurant suggestions', 'New York', cuisines[index % len(cuisines)],
+                   '19:30', str(1 + index % 6), phone, 'thanks']
+
+
+def lf0_event(client_id, text):
+    return {'messages': [{'type': 'unstructured',
+                          'unstructured': {'id': client_id, 'text': text, 'timestamp': ''}}]}
+
+
+def drain_queue(lf2, stop):
+    """Play the SQS trigger: call lf2 until the producers are done and the queue is empty."""
+    while True:
+        result = lf2.lambda_handler({}, None)
+        if result is None:
+            if stop.is_set():
+                return
+            time.sleep(0.005)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--conversations', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=1, help='conversations in flight at once')
+    parser.add_argument('--latency', type=float, default=0.01, help='seconds per stand-in call')
+    parser.add_argument('--throttle-every', type=int, default=0, help='every Nth SMS is throttled')
+    parser.add_argument('--catalog', help='JSON or JSONL yelp-restaurants items (default: generated fixture)')
+    parser.add_argument('--per-cuisine', type=int, default=50, help='size of the generated fixture')
+    args = parser.parse_args()
+
+    import lf0
+    import lf2
+
+    local = metrics.set_sink(metrics.LocalSink())
+    catalog = load_catalog(args.catalog) if args.catalog else fixture_catalog(args.per_cuisine)
+    cuisines = sorted({item['Cuisine'].lower() for item in catalog} & set(FIXTURE_CUISINES))
+    services = local_environment(catalog, args.latency, args.throttle_every)
+    structured_log.configure('WARNING')
+
+    started = {}
+    turn_ms = []
+    turn_lock = threading.Lock()
+
+    def run_conversation(index):
+        phone, turns = conversation(index, cuisines)
+        started['+1' + phone] = time.monotonic()
+        for text in turns:
+            start = time.perf_counter()
+            lf0.lambda_handler(lf0_event('client-{}'.format(index), text), None)
+            with turn_lock:
+                turn_ms.append((time.perf_counter() - start) * 1000)
+
+    stop = threading.Event()
+    consumer = threading.Thread(target=drain_queue, args=(lf2, stop), daemon=True)
+    start = time.monotonic()
+    consumer.start()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        list(executor.map(run_conversation, range(args.conversations)))
+    stop.set()
+    consumer.join()
+    elapsed = time.monotonic() - start
+
+    sent = services['sns'].sent
+    end_to_end = sorted((message['SentAt'] - started[message['PhoneNumber']]) * 1000
+                        for message in sent if message['PhoneNumber'] in started)
+    turns = sorted(turn_ms)
+
+    print("conversations {}  suggestions sent {}  in {:.2f}s  ({:.1f} conversations/s)".format(
+        args.conversations, len(sent), elapsed, args.conversations / elapsed))
+    for label, values in (('lf0 turn', turns), ('end to end', end_to_end)):
+        if values:
+            print("{:<11} p50 {:>8.1f} ms  p95 {:>8.1f} ms  p99 {:>8.1f} ms".format(
+                label, metrics.percentile(values, 0.50), metrics.percentile(values, 0.95),
+                metrics.percentile(values, 0.99)))
+    print()
+    print(local.report())
+    print()
+    if lf0.QUICK_REPLIES is not None:
+        print("quick replies: {}".format(lf0.QUICK_REPLIES.snapshot()))
+    print("calls: " + ", ".join("{} {}".format(name, dict(service.stats)) for name, service in sorted(services.items())))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Nearest-restaurant query latency of lambdas/geo_index.py against a brute-force
+scan (vectorized haversine over every point, then argpartition), on uniformly
+random points over New York City. Every grid answer is checked against the
+brute-force one.
+
+    python Other/bench_geo_index.py
+    python Other/bench_geo_index.py --sizes 10000 1000000 --k 5 --queries 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambdas'))
+
+import metrics
+from geo_index import DEFAULT_CELL_DEGREES, GeoIndex, haversine_km
+
+# Bounding box of the five boroughs.
+LAT_RANGE = (40.49, 40.92)
+LON_RANGE = (-74.26, -73.70)
+
+
+def brute_force(lats, lons, lat, lon, k):
+    distances = haversine_km(lat, lon, lats, lons)
+    nearest = np.argpartition(distances, k - 1)[:k] if len(distances) > k else np.arange(len(distances))
+    return nearest[np.argsort(distances[nearest], kind='stable')], distances
+
+
+def timings_ms(function, queries):
+    values = []
+    for lat, lon in queries:
+        start = time.perf_counter()
+        function(lat, lon)
+        values.append((time.perf_counter() - start) * 1000)
+    return sorted(values)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--cell', type=float, default=DEFAULT_CELL_DEGREES, help='grid cell size in degrees')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    queries = list(zip(rng.uniform(*LAT_RANGE, args.queries).tolist(),
+                       rng.uniform(*LON_RANGE, args.queries).tolist()))
+
+    print("{:>9} {:>9} {:>18} {:>18} {:>8}".format('points', 'build ms', 'grid p50/p99 ms', 'scan p50/p99 ms',
+                                                  'speedup'))
+    for size in args.sizes:
+        lats = rng.uniform(*LAT_RANGE, size)
+        lons = rng.uniform(*LON_RANGE, size)
+        start = time.perf_counter()
+        index = GeoIndex(lats, lons, cell_degrees=args.cell)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        for lat, lon in queries[:100]:
+            positions, distances = index.nearest(lat, lon, args.k)
+            expected, all_distances = brute_force(lats, lons, lat, lon, args.k)
+            if not np.allclose(distances, all_distances[expected]):
+                raise SystemExit('Grid and brute-force answers differ at ({}, {})'.format(lat, lon))
+
+        grid = timings_ms(lambda lat, lon: index.nearest(lat, lon, args.k), queries)
+        scan = timings_ms(lambda lat, lon: brute_force(lats, lons, lat, lon, args.k), queries)
+        print("{:>9} {:>9.1f} {:>8.3f}/{:<9.3f} {:>8.3f}/{:<9.3f} {:>7.1f}x".format(
+            size, build_ms, metrics.percentile(grid, 0.5), metrics.percentile(grid, 0.99),
+            metrics.percentile(scan, 0.5), metrics.percentile(scan, 0.99),
+            metrics.percentile(scan, 0.5) / metrics.percentile(grid, 0.5)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Repeat suggestions with and without lambdas/history.py.
+
+Part one measures the Bloom filter itself: bytes per phone, add/lookup cost
+and the false-positive rate at several fill levels against the theoretical
+(1 - e^(-k n / m))^k.
+
+Part two runs lf2.process_records against the in-process stand-ins: every
+phone asks for the same cuisine `--requests` times, and the suggestions it
+receives are checked for restaurants it was already sent. It also counts the
+history table's DynamoDB calls per request.
+
+    python Other/bench_history.py
+    python Other/bench_history.py --phones 100 --requests 10 --per-cuisine 200 --ranking uniform
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambdas'))
+
+from bench_e2e import local_environment
+from cuisine_snapshot import CuisineSnapshot, build_snapshot
+from history import DEFAULT_BITS, DEFAULT_CAPACITY, DEFAULT_HASHES, KEY_NAME, TABLE_NAME, BloomFilter, HistoryStore
+from local_aws import FIXTURE_CUISINES, StaticSnapshot, fixture_catalog
+
+SUGGESTED = re.compile(r'\n\d+\. (.+?), located at ')
+
+
+def bloom_report(bits, hashes, probes=20000):
+    print("Bloom filter: {} bits ({} bytes per phone), {} hashes".format(bits, bits // 8, hashes))
+    print("{:>6} {:>10} {:>10} {:>10} {:>10}".format('ids', 'add us', 'lookup us', 'fp', 'fp theory'))
+    for fill in (25, 50, 100, DEFAULT_CAPACITY, 2 * DEFAULT_CAPACITY):
+        bloom = BloomFilter(bits, hashes)
+        start = time.perf_counter()
+        for i in range(fill):
+            bloom.add('restaurant-{}'.format(i))
+        add_us = (time.perf_counter() - start) * 1e6 / fill
+        start = time.perf_counter()
+        false_positives = sum('other-{}'.format(i) in bloom for i in range(probes))
+        lookup_us = (time.perf_counter() - start) * 1e6 / probes
+        if not all('restaurant-{}'.format(i) in bloom for i in range(fill)):
+            raise SystemExit('Bloom filter lost an id')
+        theory = (1 - math.exp(-hashes * fill / bits)) ** hashes
+        print("{:>6} {:>10.2f} {:>10.2f} {:>10.4f} {:>10.4f}".format(
+            fill, add_us, lookup_us, false_positives / probes, theory))
+
+
+def run_requests(lf2, services, phones, requests, cuisine):
+    """Every phone asks `requests` times; returns (requests with a repeat, repeated restaurants)."""
+    sent_before = len(services['sns'].sent)
+    for round_number in range(requests):
+        bodies = [json.dumps({'location': 'new york', 'cuisine': cuisine, 'people': '2',
+                              'time': '19:{:02d}'.format(round_number), 'phone': '+1212{:07d}'.format(phone)})
+                  for phone in range(phones)]
+        for start in range(0, len(bodies), 10):
+            lf2.process_records([{'MessageId': 'm-{}-{}'.format(round_number, start + i), 'Body': body}
+                                 for i, body in enumerate(bodies[start:start + 10])])
+
+    history = {}
+    with_repeat = repeated = 0
+    for message in services['sns'].sent[sent_before:]:
+        names = SUGGESTED.findall(message['Message'])
+        seen = history.setdefault(message['PhoneNumber'], set())
+        repeats = sum(name in seen for name in names)
+        with_repeat += bool(repeats)
+        repeated += repeats
+        seen.update(names)
+    return with_repeat, repeated
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--phones', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=8, help='requests per phone for the same cuisine')
+    parser.add_argument('--per-cuisine', type=int, default=200, help='size of the generated fixture')
+    parser.add_argument('--ranking', choices=['weighted', 'uniform'], default='uniform')
+    parser.add_argument('--snapshot', action='store_true', help='answer from a cuisine snapshot, not search')
+    parser.add_argument('--bits', type=int, default=DEFAULT_BITS)
+    parser.add_argument('--hashes', type=int, default=DEFAULT_HASHES)
+    args = parser.parse_args()
+
+    bloom_report(args.bits, args.hashes)
+    print()
+
+    import lf2
+
+    logging.disable(logging.ERROR)
+    lf2.RANKING = args.ranking
+    catalog = fixture_catalog(args.per_cuisine)
+    services = local_environment(catalog, latency=0)
+    if args.snapshot:
+        lf2.SNAPSHOT = StaticSnapshot(CuisineSnapshot(build_snapshot(catalog)))
+    dynamodb = services['dynamodb']
+    dynamodb.create_table(TableName=TABLE_NAME, KeySchema=[{'AttributeName': KEY_NAME, 'KeyType': 'HASH'}])
+    total = args.phones * args.requests
+    print("{} phones x {} requests for {} ({} restaurants, {} picks from {})".format(
+        args.phones, args.requests, FIXTURE_CUISINES[0], args.per_cuisine, args.ranking,
+        'a snapshot' if args.snapshot else 'search'))
+
+    for label, store in (('no history', None), ('history', HistoryStore(bits=args.bits, hashes=args.hashes))):
+        lf2.HISTORY = store
+        dynamodb.stats.clear()
+        with_repeat, repeated = run_requests(lf2, services, args.phones, args.requests, FIXTURE_CUISINES[0])
+        print("{:<10}  requests with a repeat {:>5.1%}  repeated restaurants {:>5}  "
+              "get_item/request {:.2f}  batch writes/request {:.2f}".format(
+                  label, with_repeat / total, repeated, dynamodb.stats['get_item'] / total,
+                  dynamodb.stats['batch_write_item'] / total))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Requests per second of lf2.SUGGESTION_STAGES (search, then composing the
+message, which reads DynamoDB only for stale search documents) run through
+fanout.run_pipeline at increasing concurrency, against the local stand-ins
+with injected network latency. Texting is left out: lf2 sends the composed
+suggestions as one batch after the pipeline.
+
+    python Other/bench_lf2_fanout.py --requests 200 --latency 0.02
+    python Other/bench_lf2_fanout.py --stale 0.2
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambdas'))
+
+import structured_log
+from bench_e2e import local_environment
+from fanout import run_pipeline
+from local_aws import FIXTURE_CUISINES, fixture_catalog
+from record_cache import RecordCache
+from restaurant_search import INDEX
+
+
+def make_stale(search, fraction, rng):
+    """Drop the display fields from `fraction` of the indexed documents."""
+    for document in search.documents(INDEX).values():
+        if rng.random() < fraction:
+            document.pop('Name', None)
+            document.pop('Address', None)
+
+
+def requests(lf2, count, rng):
+    for i in range(count):
+        body = json.dumps({'location': 'new york', 'cuisine': rng.choice(FIXTURE_CUISINES), 'people': '2',
+                           'time': '19:30', 'phone': '+1212555{:04d}'.format(i)})
+        request = lf2.parse_request(body, 'bench-{}'.format(i))
+        request['correlation_id'] = 'bench-{}'.format(i)
+        yield request
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds per stand-in call')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 5, 10, 20, 50])
+    parser.add_argument('--per-cuisine', type=int, default=200, help='size of the generated fixture')
+    parser.add_argument('--stale', type=float, default=0.0,
+                        help='fraction of search documents missing their display fields')
+    args = parser.parse_args()
+
+    import lf2
+
+    rng = random.Random(0)
+    services = local_environment(fixture_catalog(args.per_cuisine), args.latency)
+    make_stale(services['search'], args.stale, rng)
+    lf2.HISTORY = None
+    structured_log.configure('WARNING')
+
+    print("{:>11} {:>10} {:>8} {:>14}".format('concurrency', 'req/s', 'failed', 'dynamodb reads'))
+    for concurrency in args.concurrency:
+        # A cold cache each round, so every round reads the same stale records.
+        lf2.RESTAURANT_CACHE = RecordCache()
+        batch = list(requests(lf2, args.requests, rng))
+        reads = services['dynamodb'].stats['batch_get_item']
+        start = time.perf_counter()
+        outcomes = run_pipeline(batch, lf2.SUGGESTION_STAGES, concurrency)
+        elapsed = time.perf_counter() - start
+        failed = sum(1 for outcome in outcomes if outcome.error is not None)
+        print("{:>11} {:>10.1f} {:>8} {:>14}".format(
+            concurrency, args.requests / elapsed, failed, services['dynamodb'].stats['batch_get_item'] - reads))
+
+
+if __name__ == '__main__':
+    main()
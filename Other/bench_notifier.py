@@ -0,0 +1,52 @@
+"""
+Throughput of notifier.Notifier against the SNS stand-in with injected latency
+and throttling, at increasing concurrency. Reports sends per second, retries,
+dead-lettered messages and per-attempt latency percentiles.
+
+    python Other/bench_notifier.py --messages 500 --latency 0.02 --throttle-every 25
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambdas'))
+
+import metrics
+from local_aws import FakeSNS, FakeSQS
+from notifier import Notification, Notifier
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds per publish')
+    parser.add_argument('--throttle-every', type=int, default=25, help='every Nth publish is throttled')
+    parser.add_argument('--invalid-every', type=int, default=100, help='every Nth phone number is malformed')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 5, 10, 20])
+    args = parser.parse_args()
+    logging.disable(logging.ERROR)
+
+    notifications = [Notification('+1212555{:04d}'.format(i) if not args.invalid_every or i % args.invalid_every
+                                  else '555-{:04d}'.format(i), 'Suggestion #{}'.format(i), 'bench-{}'.format(i))
+                     for i in range(args.messages)]
+
+    print("{:>11} {:>9} {:>6} {:>7} {:>8} {:>13} {:>8} {:>8}".format(
+        'concurrency', 'sends/s', 'sent', 'retries', 'rejected', 'dead-lettered', 'p50 ms', 'p99 ms'))
+    for concurrency in args.concurrency:
+        local = metrics.set_sink(metrics.LocalSink())
+        sqs = FakeSQS()
+        notifier = Notifier(FakeSNS(args.latency, args.throttle_every), concurrency=concurrency,
+                            base_delay=0.02, dead_letter_queue='DiningBotNotifyDLQ', sqs=sqs)
+        start = time.perf_counter()
+        notifier.send_all(notifications)
+        elapsed = time.perf_counter() - start
+        sns = local.summary()['sns']
+        print("{:>11} {:>9.1f} {:>6} {:>7} {:>8} {:>13} {:>8.1f} {:>8.1f}".format(
+            concurrency, args.messages / elapsed, notifier.stats['sent'], notifier.stats['retries'],
+            notifier.stats['rejected'], notifier.stats['dead_lettered'], sns['p50_ms'], sns['p99_ms']))
+
+
+if __name__ == '__main__':
+    main()
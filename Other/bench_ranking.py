@@ -0,0 +1,86 @@
+"""
+Cost and effect of lambdas/ranking.py's quality-weighted picks.
+
+For each candidate count it times scoring plus a weighted draw from scratch
+(what lf2 does with search hits), a draw from a prebuilt Ranker (what a
+cuisine snapshot does) and the same draw from search-style dicts. It then
+compares the picks with uniform random.sample: mean Bayesian score of the
+suggestions and how often the top decile shows up.
+
+    python Other/bench_ranking.py
+    python Other/bench_ranking.py --sizes 50 1000 10000 --k 5 --temperature 0.5
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambdas'))
+
+import metrics
+from ranking import DEFAULT_PRIOR_REVIEWS, DEFAULT_TEMPERATURE, Ranker, rank_documents
+
+
+def timings_us(function, runs):
+    values = []
+    for seed in range(runs):
+        start = time.perf_counter()
+        function(seed)
+        values.append((time.perf_counter() - start) * 1e6)
+    return sorted(values)
+
+
+def candidates(size, rng):
+    """Yelp-like ratings (half stars, skewed high) and long-tailed review counts."""
+    ratings = np.clip(np.round(rng.normal(3.9, 0.6, size) * 2) / 2, 1, 5)
+    reviews = np.floor(rng.lognormal(4, 1.5, size)).astype(np.int64)
+    return ratings, reviews
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 1000, 5000, 100000])
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--runs', type=int, default=2000)
+    parser.add_argument('--prior-reviews', type=float, default=DEFAULT_PRIOR_REVIEWS)
+    parser.add_argument('--temperature', type=float, default=DEFAULT_TEMPERATURE)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(11)
+    print("{:>7} {:>18} {:>18} {:>18} {:>15} {:>15}".format(
+        'cands', 'score+draw p50/p99', 'draw p50/p99 us', 'dicts p50/p99 us', 'mean score u/w', 'top 10% u/w'))
+    for size in args.sizes:
+        ratings, reviews = candidates(size, rng)
+        documents = [{'RestaurantID': str(i), 'Rating': float(rating), 'ReviewCount': int(count)}
+                     for i, (rating, count) in enumerate(zip(ratings, reviews))]
+        ranker = Ranker(ratings, reviews, args.prior_reviews, args.temperature)
+        runs = args.runs if size <= 10000 else max(50, args.runs // 20)
+
+        fresh = timings_us(lambda seed: Ranker(ratings, reviews, args.prior_reviews, args.temperature)
+                           .sample(args.k, seed), runs)
+        draw = timings_us(lambda seed: ranker.sample(args.k, seed), runs)
+        dicts = timings_us(lambda seed: rank_documents(documents, args.k, seed, args.prior_reviews,
+                                                       args.temperature), runs)
+
+        top_decile = ranker.scores >= np.quantile(ranker.scores, 0.9)
+        uniform = np.concatenate([random.Random(seed).sample(range(size), min(args.k, size))
+                                  for seed in range(runs)])
+        weighted = np.concatenate([ranker.sample(args.k, seed) for seed in range(runs)])
+        for picks in (uniform, weighted):
+            if len(set(picks[:args.k].tolist())) != min(args.k, size):
+                raise SystemExit('A draw repeated a candidate')
+
+        print("{:>7} {:>8.1f}/{:<9.1f} {:>8.1f}/{:<9.1f} {:>8.1f}/{:<9.1f} {:>7.2f}/{:<7.2f} {:>6.0%}/{:<8.0%}".format(
+            size,
+            metrics.percentile(fresh, 0.5), metrics.percentile(fresh, 0.99),
+            metrics.percentile(draw, 0.5), metrics.percentile(draw, 0.99),
+            metrics.percentile(dicts, 0.5), metrics.percentile(dicts, 0.99),
+            ranker.scores[uniform].mean(), ranker.scores[weighted].mean(),
+            top_decile[uniform].mean(), top_decile[weighted].mean()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Compare the DynamoDB read cost of resolving suggested restaurants with one
+filtered scan per id against a single BatchGetItem, using the local stand-in.
+
+    python Other/bench_restaurant_lookup.py --catalog 5000 --ids 10
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambdas'))
+
+from local_aws import FakeDynamoDB
+from restaurant_store import TABLE_NAME, get_restaurants
+
+
+def build_catalog(dynamodb, size):
+    table = dynamodb.Table(TABLE_NAME)
+    table.load({'id': 'r{:07d}'.format(i), 'Name': 'Restaurant {}'.format(i),
+                'Address': '{} Broadway New York, NY'.format(i)} for i in range(size))
+    return table
+
+
+def scan_per_id(dynamodb, ids):
+    table = dynamodb.Table(TABLE_NAME)
+    items = []
+    for restaurant_id in ids:
+        start_key = None
+        while True:
+            kwargs = {'FilterExpression': lambda item, rid=restaurant_id: item['id'] == rid}
+            if start_key:
+                kwargs['ExclusiveStartKey'] = start_key
+            response = table.scan(**kwargs)
+            items.extend(response['Items'])
+            start_key = response.get('LastEvaluatedKey')
+            if not start_key:
+                break
+    return items
+
+
+def measure(label, dynamodb, lookup, ids):
+    dynamodb.stats.clear()
+    start = time.perf_counter()
+    items = lookup(dynamodb, ids)
+    elapsed = time.perf_counter() - start
+    print("{:<14} found={:<3} calls={:<6} items_read={:<9} {:.2f} ms".format(
+        label, len(items),
+        dynamodb.stats['scan'] + dynamodb.stats['batch_get_item'],
+        dynamodb.stats['items_read'], elapsed * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--catalog', type=int, default=5000)
+    parser.add_argument('--ids', type=int, default=10)
+    args = parser.parse_args()
+
+    dynamodb = FakeDynamoDB()
+    build_catalog(dynamodb, args.catalog)
+    ids = ['r{:07d}'.format(i) for i in random.sample(range(args.catalog), args.ids)]
+    ids.append('missing-id')
+
+    measure('scan per id', dynamodb, scan_per_id, ids)
+    measure('batch get', dynamodb, lambda db, keys: get_restaurants(keys, db), ids)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Per-turn cost of validating DiningSuggestions slots: the hand-written checks
+lf1 used before (copied below as legacy_validate) versus the compiled
+SUGGEST_DINE_SCHEMA. Both are first checked to agree on every sample turn,
+except for the deliberate differences listed in CHANGED_TURNS.
+
+    python Other/bench_slot_validation.py --turns 200000
+"""
+import argparse
+import logging
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambdas'))
+# Compare against the city-only Location rule the legacy checks implemented.
+os.environ['LF1_NEIGHBORHOOD_LOCATIONS'] = 'false'
+
+import lf1
+
+SAMPLE_TURNS = [
+    {'Location': None, 'Cuisine': None, 'DiningTime': None, 'NumPeople': None, 'PhoneNum': None},
+    {'Location': 'New York', 'Cuisine': None, 'DiningTime': None, 'NumPeople': None, 'PhoneNum': None},
+    {'Location': 'new york', 'Cuisine': 'Thai', 'DiningTime': '19:30', 'NumPeople': None, 'PhoneNum': None},
+    {'Location': 'New York', 'Cuisine': 'Korean', 'DiningTime': '19:30', 'NumPeople': '4', 'PhoneNum': '2125550100'},
+    {'Location': 'Boston', 'Cuisine': 'Thai', 'DiningTime': None, 'NumPeople': None, 'PhoneNum': None},
+    {'Location': 'New York', 'Cuisine': 'French', 'DiningTime': None, 'NumPeople': None, 'PhoneNum': None},
+    {'Location': 'New York', 'Cuisine': 'Thai', 'DiningTime': '7pm', 'NumPeople': None, 'PhoneNum': None},
+    {'Location': 'New York', 'Cuisine': 'Thai', 'DiningTime': '23:15', 'NumPeople': None, 'PhoneNum': None},
+    {'Location': 'New York', 'Cuisine': 'Thai', 'DiningTime': '09:00', 'NumPeople': None, 'PhoneNum': None},
+    {'Location': 'New York', 'Cuisine': 'Thai', 'DiningTime': '12:00', 'NumPeople': '25', 'PhoneNum': None},
+    {'Location': 'New York', 'Cuisine': 'Thai', 'DiningTime': '12:00', 'NumPeople': '0', 'PhoneNum': None},
+    {'Location': 'New York', 'Cuisine': 'Thai', 'DiningTime': '12:00', 'NumPeople': '2', 'PhoneNum': '555-0100'},
+]
+
+# Turns the schema deliberately answers differently from the legacy checks,
+# which only looked at the hour: minutes past 59 are not a time.
+CHANGED_TURNS = [
+    ({'Location': 'New York', 'Cuisine': 'Thai', 'DiningTime': '10:75', 'NumPeople': None, 'PhoneNum': None},
+     lf1.build_validation_result(False, 'DiningTime', 'Invalid time format, please use HH:MM format.')),
+]
+
+
+def legacy_validate(slots):
+    """validate_suggest_dine as it was before the slot schema."""
+    def try_ex(func):
+        try:
+            return func()
+        except KeyError:
+            return None
+
+    def parse_int(n):
+        try:
+            return int(n)
+        except ValueError:
+            return float('nan')
+
+    location = try_ex(lambda: slots['Location'])
+    cuisine = try_ex(lambda: slots['Cuisine'])
+    dineTime = try_ex(lambda: slots['DiningTime'])
+    numPeople = try_ex(lambda: slots['NumPeople'])
+    phoneNum = try_ex(lambda: slots['PhoneNum'])
+
+    if location and location.lower() not in ['new york']:
+        return lf1.build_validation_result(
+            False, 'Location',
+            'We currently do not support {} as a valid destination. We are currently only supporting New York as a city.'.format(location))
+    if cuisine and cuisine.lower() not in ['italian', 'thai', 'american', 'chinese', 'indian', 'caribbean', 'korean', 'mexican']:
+        return lf1.build_validation_result(
+            False, 'Cuisine',
+            'We currently only support Italian, Thai, Chinese, Indian, Korean, Caribbean, Mexican and American cuisines. Can you choose from one of these?')
+    if dineTime is not None:
+        if len(dineTime) != 5:
+            return lf1.build_validation_result(False, 'DiningTime', 'Invalid time format, please use HH:MM format.')
+        hour, minute = dineTime.split(':')
+        hour = parse_int(hour)
+        minute = parse_int(minute)
+        if math.isnan(hour) or math.isnan(minute):
+            return lf1.build_validation_result(False, 'DiningTime', 'Invalid time format, please use HH:MM format.')
+        if hour < 10 or hour > 22:
+            return lf1.build_validation_result(False, 'DiningTime', 'You can dine in from 10am. to 10pm only.')
+    if numPeople is not None:
+        if int(numPeople) > 20 or int(numPeople) < 1:
+            return lf1.build_validation_result(
+                False, 'NumPeople',
+                'You can host only between 1 to 20 people. Can you provide the valid value in this range?')
+    if phoneNum is not None and (len(phoneNum) != 10 or not phoneNum.isdigit()):
+        return lf1.build_validation_result(
+            False, 'PhoneNum', 'Please enter a valid 10 digit phone number in the format 1234567890.')
+    return {'isValid': True}
+
+
+def time_per_turn(validate, turns):
+    start = time.perf_counter()
+    for i in range(turns):
+        validate(SAMPLE_TURNS[i % len(SAMPLE_TURNS)])
+    return (time.perf_counter() - start) / turns * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--turns', type=int, default=200000)
+    args = parser.parse_args()
+    # Measure validation, not the debug logging both versions share.
+    logging.getLogger().setLevel(logging.INFO)
+
+    # ...nor the 'validate' metric wrapped around the compiled version.
+    compiled_validate = lf1.validate_suggest_dine.__wrapped__
+
+    for slots in SAMPLE_TURNS:
+        assert legacy_validate(slots) == compiled_validate(slots), slots
+    for slots, expected in CHANGED_TURNS:
+        assert legacy_validate(slots) != expected and compiled_validate(slots) == expected, slots
+
+    legacy = time_per_turn(legacy_validate, args.turns)
+    compiled = time_per_turn(compiled_validate, args.turns)
+    print("legacy   {:>8.0f} ns/turn".format(legacy))
+    print("compiled {:>8.0f} ns/turn  ({:.1f}x)".format(compiled, legacy / compiled))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Crawl a local fake Yelp server with yelp.fetch_pages at several worker counts
+and report wall time, pages fetched and 429s absorbed by the retry path.
+
+    python Other/bench_yelp_crawl.py --latency 0.05 --throttle-every 20
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_yelp_server import FakeYelpServer
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--businesses-per-term', type=int, default=180)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--throttle-every', type=int, default=20)
+    parser.add_argument('--requests-per-second', type=float, default=50)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    server = FakeYelpServer(args.businesses_per_term, args.throttle_every, args.latency).start()
+    os.environ['YELP_API_URL'] = server.url
+    import yelp
+    yelp.RETRY_BASE_DELAY = 0.05
+
+    print("{:>7} {:>8} {:>6} {:>10} {:>9}".format('workers', 'seconds', 'pages', 'businesses', 'throttled'))
+    for workers in args.workers:
+        server.requests = server.throttled = 0
+        start = time.perf_counter()
+        searches = [(city, cuisine, 0) for city in yelp.CITIES for cuisine in yelp.CUISINES]
+        pages = list(yelp.fetch_pages(searches, workers=workers, requests_per_second=args.requests_per_second))
+        elapsed = time.perf_counter() - start
+        print("{:>7} {:>8.2f} {:>6} {:>10} {:>9}".format(
+            workers, elapsed, len(pages), sum(len(page[3]) for page in pages), server.throttled))
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
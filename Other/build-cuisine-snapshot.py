@@ -0,0 +1,63 @@
+"""
+Build the per-cuisine snapshot lf2 serves suggestions from (see
+lambdas/cuisine_snapshot.py). Run it after the Yelp loader, then point lf2's
+CUISINE_SNAPSHOT_URI at the output; warm containers pick up the new version
+on their next check.
+
+    python Other/build-cuisine-snapshot.py cuisine-snapshot.json.gz
+    python Other/build-cuisine-snapshot.py s3://my-bucket/cuisine-snapshot.json.gz
+"""
+import argparse
+import os
+import sys
+
+import boto3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambdas'))
+
+from cuisine_snapshot import build_snapshot, dump_snapshot
+
+SNAPSHOT_FIELDS = ['id', 'Cuisine', 'Name', 'Address', 'Rating', 'Number of Reviews',
+                   'Latitude', 'Longitude', 'Zip Code']
+
+
+def scan_restaurants(table):
+    """Yield every restaurant, reading only the attributes the snapshot keeps."""
+    kwargs = {
+        'ProjectionExpression': ', '.join('#f{}'.format(i) for i in range(len(SNAPSHOT_FIELDS))),
+        'ExpressionAttributeNames': {'#f{}'.format(i): name for i, name in enumerate(SNAPSHOT_FIELDS)},
+    }
+    while True:
+        response = table.scan(**kwargs)
+        yield from response['Items']
+        if 'LastEvaluatedKey' not in response:
+            break
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('output', help='local path or s3://bucket/key')
+    parser.add_argument('--table', default='yelp-restaurants')
+    parser.add_argument('--region', default='us-east-1')
+    args = parser.parse_args()
+
+    table = boto3.resource('dynamodb', region_name=args.region).Table(args.table)
+    document = build_snapshot(scan_restaurants(table))
+    data = dump_snapshot(document)
+
+    if args.output.startswith('s3://'):
+        bucket, key = args.output[5:].split('/', 1)
+        boto3.client('s3', region_name=args.region).put_object(
+            Bucket=bucket, Key=key, Body=data, ContentType='application/gzip')
+    else:
+        with open(args.output, 'wb') as snapshot_file:
+            snapshot_file.write(data)
+
+    counts = {cuisine: len(columns['ids']) for cuisine, columns in document['cuisines'].items()}
+    print("Snapshot {} ({} bytes, {} zip codes): {}".format(
+        document['version'], len(data), len(document['zips']), counts))
+
+
+if __name__ == '__main__':
+    main()
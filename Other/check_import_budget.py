@@ -0,0 +1,81 @@
+"""
+Cold-start import budget for the lambdas.
+
+Imports each handler module in a fresh interpreter with `-X importtime`, the
+way a new Lambda container does, and reports the slowest imports it pulled
+in. Exits non-zero when any module's median import time is over budget, so
+it can gate a deploy:
+
+    python Other/check_import_budget.py lf1 --budget-ms 50
+    python Other/check_import_budget.py lf0 lf1 lf2 lf3 --budget-ms 400 --runs 5
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+LAMBDAS = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambdas'))
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def import_profile(module):
+    """
+    Import `module` once in a new interpreter. Returns the total import time in
+    microseconds and {imported module: cumulative microseconds} for the
+    modules it imported directly.
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [LAMBDAS, env.get('PYTHONPATH')]))
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)],
+                            env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode != 0:
+        raise RuntimeError('import {} failed:\n{}'.format(module, result.stderr[-2000:]))
+
+    # Children are reported before their parent, so collect the second level
+    # until the top-level entry they belong to shows up.
+    pending = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative, depth, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if depth == 3:
+            pending[name] = cumulative
+        elif depth == 1:
+            if name == module:
+                return cumulative, pending
+            pending = {}
+    return 0, {}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('modules', nargs='*', default=['lf1'])
+    parser.add_argument('--budget-ms', type=float, default=50.0)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=5)
+    args = parser.parse_args()
+
+    over_budget = []
+    for module in args.modules:
+        profiles = [import_profile(module) for _ in range(args.runs)]
+        median_ms = statistics.median(total for total, _ in profiles) / 1000.0
+        status = 'ok' if median_ms <= args.budget_ms else 'OVER BUDGET'
+        print("{:<6} {:>8.1f} ms  (budget {:.0f} ms)  {}".format(module, median_ms, args.budget_ms, status))
+        children = profiles[-1][1]
+        for name in sorted(children, key=children.get, reverse=True)[:args.top]:
+            print("         {:>8.1f} ms  {}".format(children[name] / 1000.0, name))
+        if median_ms > args.budget_ms:
+            over_budget.append(module)
+
+    if over_budget:
+        print("Over the {:.0f} ms import budget: {}".format(args.budget_ms, ', '.join(over_budget)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,61 +1,234 @@
-from variables import * 
-from requests_aws4auth import AWS4Auth
-from elasticsearch import Elasticsearch
-
-import boto3
-import requests
+"""
+Index every restaurant in yelp-restaurants into the search domain.
+
+DynamoDB parallel-scan segments are read by worker threads and streamed
+through a bounded queue, so memory stays flat however large the table is.
+Documents are written with chunked _bulk requests; items the domain rejects
+with 429/5xx are resent.
+
+With --incremental only items whose insertedAtTimestamp is newer than the
+last successful run are indexed, and the checkpoint moves forward once they
+are written. The scan still reads the table, but index writes scale with
+churn. For read cost that scales with churn too, lambdas/lf3.py applies the
+table's DynamoDB stream (deletes included); --stream-records replays saved
+stream records through the same code.
+
+    python Other/es-index-restaurants.py --segments 8 --chunk-size 500
+    python Other/es-index-restaurants.py --incremental --checkpoint s3://bucket/index-checkpoint.json
+    python Other/es-index-restaurants.py --stream-records records.jsonl
+    python Other/es-index-restaurants.py --local 20000   # against in-process stand-ins
+"""
+import argparse
 import json
-
-host = 'https://search-concierge-chatbot-mupjitn6btj57fg6oxgajiffdy.us-east-1.es.amazonaws.com/' 
-path = 'restaurants/Restaurant/' 
-region = 'us-east-1' 
-service = 'es'
-
-dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-yelp_restaurants_table = dynamodb.Table(
-    'yelp-restaurants')
-
-index = 1
-
-lastEvaluatedKey = None
-table_items = [] # Result Array
-
-while True:
-
-    if lastEvaluatedKey == None:
-        response = yelp_restaurants_table.scan() # This only runs the first time - provide no ExclusiveStartKey initially
-    else:
-        response = yelp_restaurants_table.scan(
-        ExclusiveStartKey=lastEvaluatedKey # In subsequent calls, provide the ExclusiveStartKey
-    )
-
-    table_items.extend(response['Items']) # Appending to our resultset list
-
-    # Set our lastEvlauatedKey to the value for next operation,
-    # else, there's no more results and we can exit
-    if 'LastEvaluatedKey' in response:
-        lastEvaluatedKey = response['LastEvaluatedKey']
+import os
+import queue
+import sys
+import threading
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambdas'))
+
+from restaurant_search import INDEX, HttpSearchClient, bulk_write, index_action, restaurant_document
+
+TABLE_NAME = 'yelp-restaurants'
+REGION = 'us-east-1'
+
+# Re-index this many seconds before the last run started, to cover items written
+# while it was scanning. Indexing is idempotent, so the overlap is harmless.
+CHECKPOINT_OVERLAP = 300
+
+_SEGMENT_DONE = object()
+
+
+class _SegmentError:
+    def __init__(self, segment, error):
+        self.segment = segment
+        self.error = error
+
+
+def scan_segment(table, segment, total_segments, filter_expression=None):
+    """Yield the items of one parallel-scan segment, page by page."""
+    kwargs = {'Segment': segment, 'TotalSegments': total_segments}
+    if filter_expression is not None:
+        kwargs['FilterExpression'] = filter_expression
+    while True:
+        response = table.scan(**kwargs)
+        yield from response['Items']
+        if 'LastEvaluatedKey' not in response:
+            break
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def parallel_scan(make_table, total_segments, buffer_size=2000, filter_expression=None):
+    """
+    Scan all segments at once, one thread each, and yield items as they arrive.
+    `make_table` is called once per thread, since boto3 resources are not thread
+    safe. At most `buffer_size` items wait in memory before scanners block.
+    """
+    items = queue.Queue(maxsize=buffer_size)
+
+    def worker(segment):
+        try:
+            for item in scan_segment(make_table(), segment, total_segments, filter_expression):
+                items.put(item)
+        except Exception as e:
+            items.put(_SegmentError(segment, e))
+        finally:
+            items.put(_SEGMENT_DONE)
+
+    for segment in range(total_segments):
+        threading.Thread(target=worker, args=(segment,), daemon=True).start()
+
+    finished = 0
+    while finished < total_segments:
+        item = items.get()
+        if item is _SEGMENT_DONE:
+            finished += 1
+        elif isinstance(item, _SegmentError):
+            raise RuntimeError('Scan of segment {} failed'.format(item.segment)) from item.error
+        else:
+            yield item
+
+
+def chunked(iterable, size):
+    chunk = []
+    for element in iterable:
+        chunk.append(element)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def index_restaurants(items, client, chunk_size=500, max_retries=3, index=INDEX):
+    """
+    Bulk-index a stream of table items. Returns (indexed, failed, seconds).
+    """
+    start = time.perf_counter()
+    indexed = 0
+    failed = 0
+    actions = (index_action(restaurant_document(item), index) for item in items)
+    for chunk in chunked(actions, chunk_size):
+        succeeded, rejected = bulk_write(client, chunk, max_retries=max_retries)
+        indexed += succeeded
+        failed += len(rejected)
+        for (meta, _), error in rejected:
+            print("Failed to index {}: {}".format(meta['index']['_id'], error))
+        elapsed = time.perf_counter() - start
+        print("{} indexed, {} failed, {:.0f} docs/s".format(indexed, failed, indexed / elapsed))
+    return indexed, failed, time.perf_counter() - start
+
+
+def read_checkpoint(location):
+    """Return the saved checkpoint dict, or None before the first incremental run."""
+    try:
+        if location.startswith('s3://'):
+            import boto3
+            bucket, key = location[5:].split('/', 1)
+            body = boto3.client('s3', region_name=REGION).get_object(Bucket=bucket, Key=key)['Body'].read()
+        else:
+            with open(location, 'rb') as checkpoint_file:
+                body = checkpoint_file.read()
+    except Exception as e:
+        if isinstance(e, FileNotFoundError) or getattr(e, 'response', {}).get('Error', {}).get('Code') == 'NoSuchKey':
+            return None
+        raise
+    return json.loads(body.decode('utf-8'))
+
+
+def write_checkpoint(location, checkpoint):
+    """Write the checkpoint atomically, so an interrupted run never leaves it half written."""
+    body = json.dumps(checkpoint).encode('utf-8')
+    if location.startswith('s3://'):
+        import boto3
+        bucket, key = location[5:].split('/', 1)
+        boto3.client('s3', region_name=REGION).put_object(Bucket=bucket, Key=key, Body=body)
+        return
+    temporary = location + '.tmp'
+    with open(temporary, 'wb') as checkpoint_file:
+        checkpoint_file.write(body)
+    os.replace(temporary, location)
+
+
+def changed_since(timestamp):
+    """Scan filter for items written after `timestamp`."""
+    try:
+        from boto3.dynamodb.conditions import Attr
+    except ImportError:
+        # The local stand-ins also accept a plain predicate.
+        return lambda item: item.get('insertedAtTimestamp', 0) > timestamp
+    return Attr('insertedAtTimestamp').gt(Decimal(str(timestamp)))
+
+
+def replay_stream_records(path, client):
+    """Apply DynamoDB Streams records saved one JSON object per line."""
+    from lf3 import apply_stream_records
+
+    with open(path) as records_file:
+        records = [json.loads(line) for line in records_file if line.strip()]
+    failed = apply_stream_records(records, client)
+    print("Applied {} of {} stream records".format(len(records) - len(failed), len(records)))
+
+
+def local_environment(size):
+    """Fake table of `size` restaurants and a fake search domain."""
+    from local_aws import FakeDynamoDB, FakeSearch
+
+    dynamodb = FakeDynamoDB(scan_page_size=500)
+    dynamodb.Table(TABLE_NAME).load({
+        'id': 'r{:07d}'.format(i), 'Cuisine': 'thai', 'Name': 'Restaurant {}'.format(i),
+        'Address': '{} Broadway'.format(i), 'Rating': 4, 'Number of Reviews': i % 500,
+        'Latitude': '40.7', 'Longitude': '-73.9'} for i in range(size))
+    return (lambda: dynamodb.Table(TABLE_NAME)), FakeSearch(reject_bulk_items=5)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--segments', type=int, default=4, help='parallel scan segments / worker threads')
+    parser.add_argument('--chunk-size', type=int, default=500, help='documents per _bulk request')
+    parser.add_argument('--max-retries', type=int, default=3)
+    parser.add_argument('--incremental', action='store_true', help='only index items changed since the checkpoint')
+    parser.add_argument('--checkpoint', default='index-checkpoint.json', help='local path or s3://bucket/key')
+    parser.add_argument('--stream-records', metavar='FILE', help='apply saved DynamoDB stream records instead of scanning')
+    parser.add_argument('--local', type=int, metavar='N', help='index N fake restaurants in-process')
+    args = parser.parse_args()
+
+    if args.local:
+        make_table, client = local_environment(args.local)
     else:
-        break
+        import boto3
 
-print(len(table_items)) # Return Value: 6
+        def make_table():
+            return boto3.session.Session().resource('dynamodb', region_name=REGION).Table(TABLE_NAME)
 
+        client = HttpSearchClient(timeout=60)
 
-for item in table_items:
-    # print(item['Name'])
-    id = item['id']
-    cuisine = item['Cuisine']
+    if args.stream_records:
+        replay_stream_records(args.stream_records, client)
+        return
 
-    url = host + path + id
-    payload = {'RestaurantID': id, "Cuisine": cuisine}
-    response = requests.post(url, auth=("demo", "Demo@1234"), json=payload)
+    filter_expression = None
+    if args.incremental:
+        checkpoint = read_checkpoint(args.checkpoint)
+        if checkpoint is not None:
+            since = checkpoint['started_at'] - CHECKPOINT_OVERLAP
+            print("Indexing items written since {}".format(since))
+            filter_expression = changed_since(since)
+    started_at = time.time()
 
-    print("\n{}: {} - {}".format(index, cuisine, response.text))
-    index = index + 1
+    items = parallel_scan(make_table, args.segments, filter_expression=filter_expression)
+    indexed, failed, elapsed = index_restaurants(items, client, args.chunk_size, args.max_retries)
+    print("\nDone: {} indexed, {} failed in {:.1f}s ({:.0f} docs/s)".format(
+        indexed, failed, elapsed, indexed / elapsed if elapsed else 0))
 
+    if args.incremental:
+        if failed:
+            print("Checkpoint not advanced because of failed documents")
+        else:
+            write_checkpoint(args.checkpoint, {'started_at': started_at, 'indexed': indexed})
 
-headers = {'content-type': 'application/json'}
-esUrl = 'https://search-concierge-chatbot-mupjitn6btj57fg6oxgajiffdy.us-east-1.es.amazonaws.com/_search?q={cuisine}'.format(cuisine = cuisine)
-esResponse = requests.get(esUrl, auth=("demo", "Demo@1234"), data=json.dumps(payload), headers=headers)
 
-print(esResponse.text)
\ No newline at end of file
+if __name__ == '__main__':
+    main()
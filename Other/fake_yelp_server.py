@@ -0,0 +1,113 @@
+"""
+Local stand-in for the Yelp Fusion business search endpoint, for exercising
+yelp.py without an API key or quota.
+
+Every search term has `businesses_per_term` synthetic results, served in pages
+like the real API. Every `throttle_every`-th request is answered with 429 and
+`latency` seconds are added to each response.
+
+    python Other/fake_yelp_server.py --port 8099
+    YELP_API_URL=http://127.0.0.1:8099/v3/businesses/search python Other/yelp.py
+"""
+import argparse
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeYelpServer:
+
+    def __init__(self, businesses_per_term=120, throttle_every=0, latency=0.0, port=0):
+        self.businesses_per_term = businesses_per_term
+        self.throttle_every = throttle_every
+        self.latency = latency
+        self.requests = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/v3/businesses/search'.format(self._server.server_address[1])
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def business(self, term, location, index):
+        seed = zlib.crc32('{}|{}'.format(term, index).encode('utf-8'))
+        return {
+            'id': 'fake-{:08x}'.format(seed),
+            'name': '{} #{}'.format(term.title(), index),
+            'rating': 1 + (seed % 9) / 2,
+            'review_count': seed % 2000,
+            'location': {'display_address': ['{} Broadway'.format(index), '{}, NY 10001'.format(location)],
+                         'zip_code': '100{:02d}'.format(seed % 100)},
+            'coordinates': {'latitude': 40.70 + (seed % 1000) / 10000.0,
+                            'longitude': -74.00 + (seed % 997) / 10000.0},
+        }
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                with fake._lock:
+                    fake.requests += 1
+                    throttle = fake.throttle_every and fake.requests % fake.throttle_every == 0
+                    if throttle:
+                        fake.throttled += 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if throttle:
+                    return self._reply(429, {'error': {'code': 'TOO_MANY_REQUESTS_PER_SECOND'}})
+
+                query = parse_qs(urlparse(self.path).query)
+                term = query.get('term', [''])[0]
+                location = query.get('location', [''])[0]
+                offset = int(query.get('offset', ['0'])[0])
+                limit = int(query.get('limit', ['20'])[0])
+                if offset + limit > 1000:
+                    return self._reply(400, {'error': {'code': 'VALIDATION_ERROR'}})
+                end = min(offset + limit, fake.businesses_per_term)
+                businesses = [fake.business(term, location, i) for i in range(offset, end)]
+                self._reply(200, {'businesses': businesses, 'total': fake.businesses_per_term})
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--businesses-per-term', type=int, default=120)
+    parser.add_argument('--throttle-every', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeYelpServer(args.businesses_per_term, args.throttle_every, args.latency, args.port)
+    print("Serving {}".format(server.url))
+    server._server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,571 @@
+"""
+In-process stand-ins for the AWS services used by the lambdas.
+
+They implement just enough of the boto3 call signatures for the code in
+lambdas/ and count every call and item read, so the cost of an access pattern
+can be measured locally without touching a real account. They live here, not
+in lambdas/, so they are not deployed with the functions.
+"""
+import copy
+import json
+import random
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+
+
+def _condition_matches(condition, item):
+    """
+    Evaluate a boto3.dynamodb.conditions expression (Attr/Key comparisons joined
+    with And/Or) against a plain dict item.
+    """
+    if condition is None:
+        return True
+    if callable(condition) and not hasattr(condition, 'get_expression'):
+        return condition(item)
+
+    expression = condition.get_expression()
+    operator = expression['operator']
+    values = expression['values']
+    if operator == 'AND':
+        return all(_condition_matches(value, item) for value in values)
+    if operator == 'OR':
+        return any(_condition_matches(value, item) for value in values)
+
+    name = values[0].name
+    if operator == 'attribute_exists':
+        return name in item
+    if operator == 'attribute_not_exists':
+        return name not in item
+    if name not in item:
+        return False
+    actual = item[name]
+    expected = values[1] if len(values) > 1 else None
+    if operator == '=':
+        return actual == expected
+    if operator == '<>':
+        return actual != expected
+    if operator == '<':
+        return actual < expected
+    if operator == '<=':
+        return actual <= expected
+    if operator == '>':
+        return actual > expected
+    if operator == '>=':
+        return actual >= expected
+    if operator == 'IN':
+        return actual in values[1]
+    raise NotImplementedError('Condition operator {} is not supported locally'.format(operator))
+
+
+class _FakeService:
+    """
+    Shared call counters and an injectable per-call latency in seconds.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    def _call(self, operation):
+        self._count(operation)
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class FakeTable:
+    """
+    Dict-backed DynamoDB table keyed by a single hash key.
+    """
+
+    def __init__(self, name, owner, key_name='id'):
+        self.name = name
+        self.key_name = key_name
+        self._owner = owner
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def load(self, items):
+        with self._lock:
+            for item in items:
+                self._items[item[self.key_name]] = copy.deepcopy(item)
+
+    def get_item(self, Key, **kwargs):
+        self._owner._call('get_item')
+        item = self._items.get(Key[self.key_name])
+        if item is None:
+            return {}
+        self._owner._count('items_read')
+        return {'Item': copy.deepcopy(item)}
+
+    def put_item(self, Item, **kwargs):
+        self._owner._call('put_item')
+        self._owner._count('items_written')
+        with self._lock:
+            self._items[Item[self.key_name]] = copy.deepcopy(Item)
+        return {}
+
+    def scan(self, FilterExpression=None, ExclusiveStartKey=None, Limit=None,
+             Segment=None, TotalSegments=None, **kwargs):
+        """
+        Every item examined counts as read, whether or not it passes the filter,
+        which is how DynamoDB bills scans. Parallel scan segments split the keys
+        by a stable hash.
+        """
+        self._owner._call('scan')
+        keys = sorted(self._items)
+        if TotalSegments:
+            keys = [key for key in keys if zlib.crc32(str(key).encode('utf-8')) % TotalSegments == Segment]
+        if ExclusiveStartKey is not None:
+            start = ExclusiveStartKey[self.key_name]
+            keys = [key for key in keys if key > start]
+        page_size = Limit or self._owner.scan_page_size
+        page = keys[:page_size]
+
+        self._owner._count('items_read', len(page))
+        items = [copy.deepcopy(self._items[key]) for key in page
+                 if _condition_matches(FilterExpression, self._items[key])]
+        response = {'Items': items, 'Count': len(items), 'ScannedCount': len(page)}
+        if len(keys) > page_size:
+            response['LastEvaluatedKey'] = {self.key_name: page[-1]}
+        return response
+
+
+class FakeDynamoDB(_FakeService):
+    """
+    Stand-in for boto3.resource('dynamodb').
+
+    `max_batch_get` and `max_batch_write` cap how many keys a batch call serves
+    before returning the rest as unprocessed, to exercise the retry paths.
+    """
+
+    def __init__(self, max_batch_get=100, max_batch_write=25, scan_page_size=1000, latency=0.0):
+        super().__init__(latency)
+        self.max_batch_get = max_batch_get
+        self.max_batch_write = max_batch_write
+        self.scan_page_size = scan_page_size
+        self._tables = {}
+
+    def Table(self, name):
+        if name not in self._tables:
+            self._tables[name] = FakeTable(name, self)
+        return self._tables[name]
+
+    def create_table(self, TableName, KeySchema, **kwargs):
+        """Only the hash key of `KeySchema` is used; tables default to an 'id' key."""
+        self._call('create_table')
+        key_name = next(key['AttributeName'] for key in KeySchema if key['KeyType'] == 'HASH')
+        self._tables[TableName] = FakeTable(TableName, self, key_name=key_name)
+        return self._tables[TableName]
+
+    def batch_get_item(self, RequestItems, **kwargs):
+        self._call('batch_get_item')
+        responses = {}
+        unprocessed = {}
+        budget = self.max_batch_get
+        for table_name, request in RequestItems.items():
+            keys = request['Keys']
+            if len(keys) > 100:
+                raise ValueError('Too many items requested for the BatchGetItem call')
+            table = self.Table(table_name)
+            served, deferred = keys[:budget], keys[budget:]
+            budget -= len(served)
+
+            items = []
+            for key in served:
+                item = table._items.get(key[table.key_name])
+                if item is not None:
+                    items.append(copy.deepcopy(item))
+            self._count('items_read', len(items))
+            responses[table_name] = items
+            if deferred:
+                unprocessed[table_name] = dict(request, Keys=deferred)
+        return {'Responses': responses, 'UnprocessedKeys': unprocessed}
+
+    def batch_write_item(self, RequestItems, **kwargs):
+        """`max_batch_write` caps how many requests are applied per call."""
+        self._call('batch_write_item')
+        unprocessed = {}
+        budget = self.max_batch_write
+        for table_name, requests in RequestItems.items():
+            if len(requests) > 25:
+                raise ValueError('Too many items requested for the BatchWriteItem call')
+            table = self.Table(table_name)
+            applied, deferred = requests[:budget], requests[budget:]
+            budget -= len(applied)
+            with table._lock:
+                for request in applied:
+                    if 'PutRequest' in request:
+                        item = request['PutRequest']['Item']
+                        table._items[item[table.key_name]] = copy.deepcopy(item)
+                    else:
+                        table._items.pop(request['DeleteRequest']['Key'][table.key_name], None)
+            self._count('items_written', len(applied))
+            if deferred:
+                unprocessed[table_name] = deferred
+        return {'UnprocessedItems': unprocessed}
+
+
+class FakeSQS(_FakeService):
+    """
+    Stand-in for boto3.client('sqs') holding one or more in-memory queues.
+
+    Received messages become invisible for the visibility timeout and reappear
+    unless deleted, like a real standard queue. Long polling is not simulated:
+    an empty queue returns immediately.
+    """
+
+    def __init__(self, visibility_timeout=30, clock=time.monotonic, latency=0.0):
+        super().__init__(latency)
+        self.visibility_timeout = visibility_timeout
+        self._clock = clock
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def _queue(self, url):
+        return self._queues.setdefault(url, [])
+
+    def get_queue_url(self, QueueName, **kwargs):
+        self._call('get_queue_url')
+        url = 'https://sqs.local/000000000000/{}'.format(QueueName)
+        self._queue(url)
+        return {'QueueUrl': url}
+
+    def send_message(self, QueueUrl, MessageBody, MessageAttributes=None, **kwargs):
+        self._call('send_message')
+        message = {
+            'MessageId': str(uuid.uuid4()),
+            'Body': MessageBody,
+            'MessageAttributes': MessageAttributes or {},
+            'Attributes': {'SentTimestamp': str(int(time.time() * 1000))},
+            'visible_at': 0,
+            'receipts': 0,
+        }
+        with self._lock:
+            self._queue(QueueUrl).append(message)
+        return {'MessageId': message['MessageId']}
+
+    def receive_message(self, QueueUrl, MaxNumberOfMessages=1, VisibilityTimeout=None, **kwargs):
+        self._call('receive_message')
+        timeout = self.visibility_timeout if VisibilityTimeout is None else VisibilityTimeout
+        now = self._clock()
+        received = []
+        with self._lock:
+            for message in self._queue(QueueUrl):
+                if len(received) == MaxNumberOfMessages:
+                    break
+                if message['visible_at'] > now:
+                    continue
+                message['visible_at'] = now + timeout
+                message['receipts'] += 1
+                message['ReceiptHandle'] = '{}#{}'.format(message['MessageId'], message['receipts'])
+                received.append({key: message[key] for key in
+                                 ('MessageId', 'ReceiptHandle', 'Body', 'MessageAttributes', 'Attributes')})
+        self._count('messages_received', len(received))
+        return {'Messages': received} if received else {}
+
+    def _delete(self, url, receipt_handle):
+        with self._lock:
+            queue = self._queue(url)
+            for index, message in enumerate(queue):
+                if message.get('ReceiptHandle') == receipt_handle:
+                    del queue[index]
+                    return True
+        return False
+
+    def delete_message(self, QueueUrl, ReceiptHandle, **kwargs):
+        self._call('delete_message')
+        self._delete(QueueUrl, ReceiptHandle)
+        return {}
+
+    def delete_message_batch(self, QueueUrl, Entries, **kwargs):
+        self._call('delete_message_batch')
+        if len(Entries) > 10:
+            raise ValueError('Maximum number of entries per request are 10')
+        successful, failed = [], []
+        for entry in Entries:
+            if self._delete(QueueUrl, entry['ReceiptHandle']):
+                successful.append({'Id': entry['Id']})
+            else:
+                failed.append({'Id': entry['Id'], 'Code': 'ReceiptHandleIsInvalid',
+                               'Message': 'The receipt handle is not valid', 'SenderFault': True})
+        return {'Successful': successful, 'Failed': failed}
+
+    def pending(self, url):
+        """Number of messages still on the queue, visible or in flight."""
+        return len(self._queue(url))
+
+
+class FakeClientError(Exception):
+    """Shaped like botocore's ClientError: the error code is in response['Error']['Code']."""
+
+    def __init__(self, code, message, operation):
+        super().__init__('An error occurred ({}) when calling the {} operation: {}'.format(code, operation, message))
+        self.response = {'Error': {'Code': code, 'Message': message}}
+
+
+class FakeSNS(_FakeService):
+    """
+    Stand-in for boto3.client('sns') that records every SMS it is asked to send.
+    Every `throttle_every`-th publish fails with Throttling, and phone numbers
+    that are not E.164 ("+" and digits) fail with InvalidParameter.
+    """
+
+    def __init__(self, latency=0.0, throttle_every=0):
+        super().__init__(latency)
+        self.throttle_every = throttle_every
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def publish(self, Message, PhoneNumber=None, TopicArn=None, **kwargs):
+        self._call('publish')
+        if self.throttle_every:
+            with self._lock:
+                self._count('attempts')
+                throttled = self.stats['attempts'] % self.throttle_every == 0
+            if throttled:
+                self._count('throttled')
+                raise FakeClientError('Throttling', 'Rate exceeded', 'Publish')
+        if PhoneNumber is not None and not (PhoneNumber.startswith('+') and PhoneNumber[1:].isdigit()):
+            raise FakeClientError('InvalidParameter', 'Invalid parameter: PhoneNumber', 'Publish')
+        message_id = str(uuid.uuid4())
+        with self._lock:
+            self.sent.append({'MessageId': message_id, 'PhoneNumber': PhoneNumber,
+                              'TopicArn': TopicArn, 'Message': Message, 'SentAt': time.monotonic()})
+        return {'MessageId': message_id}
+
+
+class FakeSearch(_FakeService):
+    """
+    Stand-in for the search domain, answering the query shapes built by
+    restaurant_search: term filters (optionally under bool/function_score),
+    a seeded random_score, `size` and `_source` filtering.
+    """
+
+    def __init__(self, latency=0.0, reject_bulk_items=0):
+        super().__init__(latency)
+        # The first `reject_bulk_items` bulk items are answered with 429.
+        self.reject_bulk_items = reject_bulk_items
+        self._indices = {}
+        self._lock = threading.Lock()
+
+    def documents(self, index):
+        return self._indices.get(index, {})
+
+    def index_documents(self, index, documents, id_field='RestaurantID'):
+        with self._lock:
+            docs = self._indices.setdefault(index, {})
+            for document in documents:
+                docs[document[id_field]] = copy.deepcopy(document)
+
+    def _terms(self, query):
+        """Collect the term filters of a query as {field: value}."""
+        if 'function_score' in query:
+            return self._terms(query['function_score'].get('query', {'match_all': {}}))
+        if 'bool' in query:
+            terms = {}
+            clauses = query['bool'].get('filter', [])
+            for clause in clauses if isinstance(clauses, list) else [clauses]:
+                terms.update(self._terms(clause))
+            return terms
+        if 'term' in query:
+            field, value = next(iter(query['term'].items()))
+            return {field.replace('.keyword', ''): value.get('value') if isinstance(value, dict) else value}
+        if 'match_all' in query:
+            return {}
+        raise NotImplementedError('Query {} is not supported locally'.format(list(query)))
+
+    def search(self, index, body):
+        self._call('search')
+        query = body.get('query', {'match_all': {}})
+        terms = self._terms(query)
+        with self._lock:
+            docs = [doc for _, doc in sorted(self._indices.get(index, {}).items())
+                    if all(doc.get(field) == value for field, value in terms.items())]
+
+        random_score = query.get('function_score', {}).get('random_score')
+        if random_score is not None:
+            random.Random(random_score.get('seed')).shuffle(docs)
+        hits = docs[:body.get('size', 10)]
+
+        fields = body.get('_source')
+        if isinstance(fields, list):
+            hits = [{field: doc[field] for field in fields if field in doc} for doc in hits]
+        self._count('documents_returned', len(hits))
+        return {'hits': {'total': len(docs), 'hits': [{'_index': index, '_source': copy.deepcopy(hit)}
+                                                      for hit in hits]}}
+
+    def bulk(self, payload):
+        self._call('bulk')
+        lines = [json.loads(line) for line in payload.decode('utf-8').splitlines() if line]
+        items = []
+        position = 0
+        while position < len(lines):
+            meta = lines[position]
+            operation, target = next(iter(meta.items()))
+            source = lines[position + 1] if operation in ('index', 'create') else None
+            position += 2 if source is not None else 1
+
+            with self._lock:
+                if self.reject_bulk_items > 0:
+                    self.reject_bulk_items -= 1
+                    items.append({operation: {'_id': target['_id'], 'status': 429,
+                                              'error': {'type': 'es_rejected_execution_exception'}}})
+                    continue
+                docs = self._indices.setdefault(target['_index'], {})
+                if operation == 'delete':
+                    status = 200 if docs.pop(target['_id'], None) is not None else 404
+                else:
+                    status = 200 if target['_id'] in docs else 201
+                    docs[target['_id']] = source
+            self._count('bulk_items')
+            items.append({operation: {'_id': target['_id'], 'status': status}})
+        return {'errors': any(next(iter(item.values()))['status'] >= 300 for item in items), 'items': items}
+
+
+class FakeLex(_FakeService):
+    """
+    Stand-in for boto3.client('lex-runtime') that runs a DiningBot-shaped
+    dialog locally and calls `code_hook` (lf1.lambda_handler) with the same
+    events Lex sends it. Sessions are kept per userId. Greetings and thanks are
+    recognized from a few utterances; anything else starts or continues
+    DiningSuggestions, whose slots are elicited in SLOT_ORDER.
+    """
+
+    SLOT_ORDER = ('Location', 'Cuisine', 'DiningTime', 'NumPeople', 'PhoneNum')
+    SLOT_PROMPTS = {
+        'Location': 'Which city are you going to dine in?',
+        'Cuisine': 'What cuisine would you like to try?',
+        'DiningTime': 'What time would you like to dine?',
+        'NumPeople': 'How many people are in your party?',
+        'PhoneNum': 'What phone number should I text the suggestions to?',
+    }
+    UTTERANCES = {
+        'Greetings': {'hi', 'hello', 'hey', 'hi there', 'good morning'},
+        'ThankYou': {'thanks', 'thank you', 'thank you so much', 'bye'},
+    }
+
+    def __init__(self, code_hook, latency=0.0, bot_name='DiningBot'):
+        super().__init__(latency)
+        self.code_hook = code_hook
+        self.bot_name = bot_name
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _session(self, user_id):
+        with self._lock:
+            return self._sessions.setdefault(user_id, {'intent': None, 'slots': None, 'slotToElicit': None,
+                                                       'sessionAttributes': {}})
+
+    def _invoke(self, source, session, user_id, intent_name, text, request_attributes):
+        event = {
+            'messageVersion': '1.0',
+            'invocationSource': source,
+            'userId': user_id,
+            'sessionAttributes': dict(session['sessionAttributes']),
+            'requestAttributes': request_attributes,
+            'bot': {'name': self.bot_name, 'alias': self.bot_name, 'version': '$LATEST'},
+            'outputDialogMode': 'Text',
+            'currentIntent': {'name': intent_name, 'slots': dict(session['slots'] or {}),
+                              'confirmationStatus': 'None'},
+            'inputTranscript': text,
+        }
+        response = self.code_hook(event, None)
+        session['sessionAttributes'] = response.get('sessionAttributes') or {}
+        return response['dialogAction']
+
+    def post_text(self, botName, botAlias, userId, inputText, sessionAttributes=None,
+                  requestAttributes=None, **kwargs):
+        self._call('post_text')
+        session = self._session(userId)
+        if sessionAttributes is not None:
+            session['sessionAttributes'] = dict(sessionAttributes)
+        text = inputText.strip()
+
+        if session['intent'] is None:
+            session['intent'] = next((intent for intent, phrases in self.UTTERANCES.items()
+                                      if text.lower().strip('!.? ') in phrases), 'DiningSuggestions')
+            session['slots'] = {slot: None for slot in self.SLOT_ORDER} \
+                if session['intent'] == 'DiningSuggestions' else {}
+        elif session['slotToElicit']:
+            session['slots'][session['slotToElicit']] = text
+        intent_name = session['intent']
+
+        if intent_name == 'DiningSuggestions':
+            action = self._invoke('DialogCodeHook', session, userId, intent_name, text, requestAttributes)
+            if action['type'] == 'Delegate':
+                session['slots'] = dict(action['slots'])
+                missing = [slot for slot in self.SLOT_ORDER if not session['slots'].get(slot)]
+                if missing:
+                    action = {'type': 'ElicitSlot', 'slotToElicit': missing[0],
+                              'message': {'contentType': 'PlainText', 'content': self.SLOT_PROMPTS[missing[0]]}}
+                else:
+                    action = self._invoke('FulfillmentCodeHook', session, userId, intent_name, text,
+                                          requestAttributes)
+            elif action['type'] == 'ElicitSlot':
+                session['slots'] = dict(action['slots'])
+        else:
+            action = self._invoke('FulfillmentCodeHook', session, userId, intent_name, text, requestAttributes)
+
+        response = {'intentName': intent_name, 'slots': dict(session['slots'] or {}),
+                    'sessionAttributes': session['sessionAttributes'],
+                    'message': action['message']['content']}
+        if action['type'] == 'ElicitSlot':
+            session['slotToElicit'] = response['slotToElicit'] = action['slotToElicit']
+            response['dialogState'] = 'ElicitSlot'
+        else:
+            response['dialogState'] = action.get('fulfillmentState', 'Fulfilled')
+            session.update(intent=None, slots=None, slotToElicit=None)
+        return response
+
+
+class StaticSnapshot:
+    """Stands in for lf2's SnapshotLoader with an already built CuisineSnapshot."""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def get(self):
+        return self.snapshot
+
+
+# --- Fixture catalog ---
+
+
+FIXTURE_CUISINES = ('italian', 'thai', 'american', 'chinese', 'indian', 'caribbean', 'korean', 'mexican')
+
+
+def fixture_catalog(per_cuisine=50, cuisines=FIXTURE_CUISINES):
+    """Deterministic yelp-restaurants items, `per_cuisine` for each cuisine."""
+    items = []
+    for cuisine in cuisines:
+        for i in range(per_cuisine):
+            seed = zlib.crc32('{}|{}'.format(cuisine, i).encode('utf-8'))
+            items.append({
+                'id': 'fixture-{:08x}'.format(seed),
+                'Name': '{} Kitchen #{}'.format(cuisine.title(), i),
+                'Cuisine': cuisine,
+                'Rating': 1 + (seed % 9) / 2,
+                'Number of Reviews': seed % 2000,
+                'Address': '{} Broadway New York, NY 10001'.format(i + 1),
+                'Zip Code': '100{:02d}'.format(seed % 100),
+                'Latitude': str(40.70 + (seed % 1000) / 10000.0),
+                'Longitude': str(-74.00 + (seed % 997) / 10000.0),
+            })
+    return items
+
+
+def load_catalog(path):
+    """yelp-restaurants items from a JSON list or a JSONL file (yelp.py --dry-run output)."""
+    with open(path) as catalog_file:
+        text = catalog_file.read()
+    if text.lstrip().startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
@@ -1,86 +1,421 @@
-import logging
+import argparse
 import os
+import sys
 import boto3
 import json
+import queue
+import random
 import requests
+from requests.adapters import HTTPAdapter
+import threading
 import time
-import datetime
 import traceback
 
 from decimal import Decimal
 
-def yelp():
-    
-    api_key = "4bDFA5yKFIS-Oas0ud56n791zryYwPomGQVjAaWLcMbNLKtwSV2lF6TzI9laPPL7wZnwwGc0Rx7Qrh7HIEIg0BhBNukJ-3J3QAQ_lluLKGWWRqW5gC8SC1_Vn0gdYnYx"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambdas'))
 
-    count = 0
-    repeated = 0
-    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-    yelp_restaurants_table = dynamodb.Table(
-        'yelp-restaurants')
+from restaurant_store import BatchWriter
 
-    headers = {'Authorization': 'Bearer {}'.format(api_key)}
-    search_api_url = 'https://api.yelp.com/v3/businesses/search'
+API_KEY = os.environ.get('YELP_API_KEY', "4bDFA5yKFIS-Oas0ud56n791zryYwPomGQVjAaWLcMbNLKtwSV2lF6TzI9laPPL7wZnwwGc0Rx7Qrh7HIEIg0BhBNukJ-3J3QAQ_lluLKGWWRqW5gC8SC1_Vn0gdYnYx")
+SEARCH_API_URL = os.environ.get('YELP_API_URL', 'https://api.yelp.com/v3/businesses/search')
 
-    # cities = {'New York', 'Boston'}
-    cities = {'New York'}
-    cuisines = {'indian','chinese','mexican','italian','thai','american','caribbean','korean'}
+# cities = {'New York', 'Boston'}
+CITIES = {'New York'}
+CUISINES = {'indian','chinese','mexican','italian','thai','american','caribbean','korean'}
 
+# Yelp serves at most 1000 results per search, 50 at a time.
+PAGE_SIZE = 50
+MAX_RESULTS = 1000
+
+# Yelp Fusion throttles bursts with 429s; stay under its per-second limit.
+REQUESTS_PER_SECOND = float(os.environ.get('YELP_REQUESTS_PER_SECOND', 5))
+WORKERS = int(os.environ.get('YELP_WORKERS', 4))
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 0.5
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, bursts of up to `capacity`.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def new_session(workers=WORKERS):
+    """One HTTP session shared by every fetch thread, with a connection per worker."""
+    session = requests.Session()
+    session.headers['Authorization'] = 'Bearer {}'.format(API_KEY)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_page(session, limiter, city, cuisine, offset):
+    """
+    Fetch one page of search results, retrying 429 and 5xx responses with
+    exponential backoff (or the server's Retry-After).
+    """
+    params = {'term': cuisine + " restaurants",
+        'location': city,
+        'offset' : offset,
+        'limit': PAGE_SIZE}
+
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.acquire()
+        response = session.get(SEARCH_API_URL, params=params, timeout=5)
+        if response.status_code != 429 and response.status_code < 500:
+            response.raise_for_status()
+            return response.json(parse_float=Decimal)['businesses']
+
+        if attempt == MAX_RETRIES:
+            break
+        retry_after = response.headers.get('Retry-After')
+        delay = float(retry_after) if retry_after else RETRY_BASE_DELAY * (2 ** attempt)
+        time.sleep(delay + random.uniform(0, RETRY_BASE_DELAY))
+
+    raise RuntimeError('Yelp returned {} for {} offset {}'.format(response.status_code, cuisine, offset))
+
+
+def crawl_search(session, limiter, city, cuisine, start=0):
+    """
+    Page through one (city, cuisine) search from offset `start`, stopping at the
+    first short page since there is nothing after it. Yields (offset, businesses).
+    """
+    for offset in range(start, MAX_RESULTS, PAGE_SIZE):
+        businesses = get_page(session, limiter, city, cuisine, offset)
+        yield offset, businesses
+        if len(businesses) < PAGE_SIZE:
+            break
+
+
+def fetch_pages(searches, workers=WORKERS, requests_per_second=REQUESTS_PER_SECOND, failures=None):
+    """
+    Stage 1: crawl (city, cuisine, start offset) searches concurrently on `workers`
+    threads sharing one session and one rate limiter. Pages are yielded as
+    (city, cuisine, offset, businesses), in order within a search. A search that
+    fails is abandoned and appended to `failures` as (city, cuisine, error);
+    the others carry on.
+    """
+    session = new_session(workers)
+    limiter = TokenBucket(requests_per_second)
+    pending = queue.Queue()
+    for search in searches:
+        pending.put(search)
+    pages = queue.Queue(maxsize=workers * 2)
+    done = object()
+
+    def worker():
+        try:
+            while True:
+                try:
+                    city, cuisine, start = pending.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    for offset, businesses in crawl_search(session, limiter, city, cuisine, start):
+                        pages.put((city, cuisine, offset, businesses))
+                except Exception as e:
+                    traceback.print_exc()
+                    if failures is not None:
+                        failures.append((city, cuisine, e))
+        finally:
+            pages.put(done)
+
+    workers = min(workers, pending.qsize())
+    for _ in range(workers):
+        threading.Thread(target=worker, daemon=True).start()
+
+    finished = 0
+    while finished < workers:
+        page = pages.get()
+        if page is done:
+            finished += 1
+        else:
+            yield page
+
+
+def restaurant_item(business, cuisine):
+    display_address = business['location']['display_address']
+    address_string = ' '.join(display_address)
+
+    return {
+        'id': business['id'],
+        'Business ID': business['id'],
+        'insertedAtTimestamp': Decimal(time.time()),
+        'Name': business['name'],
+        'Cuisine': cuisine,
+        'Rating': business['rating'],
+        'Number of Reviews': business['review_count'],
+        'Address': address_string,
+        'Zip Code': business['location']['zip_code'],
+        'Latitude': str(business['coordinates']['latitude']),
+        'Longitude': str(business['coordinates']['longitude']),
+    }
+
+
+def normalize(pages):
+    """
+    Stage 2: turn raw pages into table items. Yields
+    (city, cuisine, offset, last, items), where `last` marks the final page of a search.
+    """
+    for city, cuisine, offset, businesses in pages:
+        last = len(businesses) < PAGE_SIZE or offset + PAGE_SIZE >= MAX_RESULTS
+        yield city, cuisine, offset, last, [restaurant_item(business, cuisine) for business in businesses]
+
+
+class CrawlCheckpoint:
+    """
+    Progress per (city, cuisine): the next offset to fetch, or done. Saved
+    atomically after every page, and only once that page has been written.
+    `sink` names where the pages went; resuming into another sink would skip
+    pages it never received, so that is refused.
+    """
+
+    def __init__(self, path, sink):
+        self.path = path
+        self.sink = sink
+        self.searches = {}
+        if path and os.path.exists(path):
+            with open(path) as checkpoint_file:
+                saved = json.load(checkpoint_file)
+            if saved.get('sink', sink) != sink:
+                raise ValueError('{} tracks a crawl into {}, not {}; use another --checkpoint'.format(
+                    path, saved['sink'], sink))
+            self.searches = saved['searches']
+
+    @staticmethod
+    def _key(city, cuisine):
+        return '{}|{}'.format(city, cuisine)
+
+    def remaining(self, cities, cuisines):
+        """(city, cuisine, start offset) for every search that is not finished."""
+        searches = []
+        for city in sorted(cities):
+            for cuisine in sorted(cuisines):
+                progress = self.searches.get(self._key(city, cuisine), {'next_offset': 0, 'done': False})
+                if not progress['done']:
+                    searches.append((city, cuisine, progress['next_offset']))
+        return searches
+
+    def record(self, city, cuisine, offset, last):
+        self.searches[self._key(city, cuisine)] = {'next_offset': offset + PAGE_SIZE, 'done': last}
+        if self.path:
+            temporary = self.path + '.tmp'
+            with open(temporary, 'w') as checkpoint_file:
+                json.dump({'sink': self.sink, 'searches': self.searches}, checkpoint_file)
+            os.replace(temporary, self.path)
+
+    def clear(self):
+        self.searches = {}
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class StoreSink:
+    """
+    Writes items to yelp-restaurants through a BatchWriter, skipping businesses
+    already written by this run. With a seen-ids file from earlier runs it also
+    tells new businesses from previously stored ones; without one it only
+    counts what it wrote, rather than reading the table to find out.
+    """
+
+    def __init__(self, dynamodb, seen_ids_path=None):
+        self.seen_ids_path = seen_ids_path
+        # Replaces a get_item per business: ids stored by earlier runs, and ids written by this one.
+        self.known_ids = load_seen_ids(seen_ids_path)
+        self.crawled_ids = set()
+        self.count = {}
+        self.repeated = {}
+        self.duplicates = 0
+        self.writer = BatchWriter(dynamodb, 'yelp-restaurants')
+
+    def write(self, cuisine, items):
+        for item in items:
+            id = item['id']
+            if id in self.crawled_ids:
+                # Listed under an earlier cuisine in this run; already written.
+                self.duplicates += 1
+                continue
+            self.crawled_ids.add(id)
+
+            if self.known_ids is not None and id in self.known_ids:
+                self.repeated[cuisine] = self.repeated.get(cuisine, 0) + 1
+            else:
+                self.count[cuisine] = self.count.get(cuisine, 0) + 1
+            self.writer.put(item)
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.flush()
+        if self.seen_ids_path:
+            save_seen_ids(self.seen_ids_path, (self.known_ids or set()) | self.crawled_ids)
+
+        for cuisine in sorted(set(self.count) | set(self.repeated)):
+            if self.known_ids is None:
+                print("\nCuisine: {} - Written: {}".format(cuisine, self.count[cuisine]))
+            else:
+                print("\nCuisine: {} - Added: {}, Repeated: {}".format(
+                    cuisine, self.count.get(cuisine, 0), self.repeated.get(cuisine, 0)))
+
+        # Per business, the old loader made a get_item and a put_item round trip and
+        # paid at least one write unit, duplicates included.
+        businesses = len(self.crawled_ids) + self.duplicates
+        round_trips = self.writer.stats['round_trips']
+        print("\nDynamoDB round trips: {} (was {}), duplicate writes skipped: {} (>= {} WCU saved)".format(
+            round_trips, 2 * businesses, self.duplicates, self.duplicates))
+
+
+class StagingSink:
+    """
+    Dry-run sink: writes items to a local JSONL file instead of the table, so a
+    crawl can later be replayed into the store without calling Yelp again.
+    A new crawl starts the file over; a resumed one appends to it.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.written = 0
+        self._file = open(path, 'a' if resume else 'w')
+
+    def write(self, cuisine, items):
+        for item in items:
+            self._file.write(json.dumps(item, default=float) + '\n')
+        self.written += len(items)
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        print("\nStaged {} items in {}".format(self.written, self.path))
+
+
+def write_pages(pages, sink, checkpoint):
+    """
+    Stage 3: write each page, then advance the checkpoint past it.
+    """
+    for city, cuisine, offset, last, items in pages:
+        sink.write(cuisine, items)
+        sink.flush()
+        checkpoint.record(city, cuisine, offset, last)
+
+
+def load_seen_ids(path=None):
+    """
+    Ids written by earlier runs, from their ids file. None without one: a scan
+    would read the whole table just to split the counts, so it is not done.
+    An ids file named but not yet created starts empty.
+    """
+    if not path:
+        return None
+    if not os.path.exists(path):
+        return set()
+    with open(path) as ids_file:
+        return {line.strip() for line in ids_file if line.strip()}
+
+
+def save_seen_ids(path, ids):
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as ids_file:
+        ids_file.writelines(id + '\n' for id in sorted(ids))
+    os.replace(temporary, path)
+
+
+def yelp(dynamodb=None, seen_ids_path=None, checkpoint_path=None, staging_path=None,
+         cities=CITIES, cuisines=CUISINES, **fetch_options):
+    """
+    Crawl Yelp into yelp-restaurants (or, with `staging_path`, into a JSONL file)
+    as a fetch -> normalize -> write pipeline. With `checkpoint_path`, an
+    interrupted or partly failed run resumes where it stopped; the checkpoint is
+    removed once every search has finished.
+    """
+    checkpoint = CrawlCheckpoint(checkpoint_path, 'staging:' + os.path.abspath(staging_path)
+                                 if staging_path else 'dynamodb:yelp-restaurants')
+    searches = checkpoint.remaining(cities, cuisines)
+    if checkpoint.searches:
+        print("Resuming {} unfinished searches from {}".format(len(searches), checkpoint_path))
+
+    if staging_path:
+        sink = StagingSink(staging_path, resume=bool(checkpoint.searches))
+    else:
+        sink = StoreSink(dynamodb or boto3.resource('dynamodb', region_name='us-east-1'), seen_ids_path)
+
+    failures = []
+    try:
+        write_pages(normalize(fetch_pages(searches, failures=failures, **fetch_options)), sink, checkpoint)
+    finally:
+        sink.close()
+
+    for city, cuisine, error in failures:
+        print("\nSearch {} / {} stopped early: {}".format(city, cuisine, error))
+    if not failures:
+        checkpoint.clear()
+    elif checkpoint_path:
+        print("\nRun again with the same checkpoint to resume")
+
+
+def replay(staging_path, dynamodb=None, seen_ids_path=None):
+    """
+    Write a staged crawl into yelp-restaurants. Items are restamped with the
+    replay time so incremental index syncs pick them up.
+    """
+    sink = StoreSink(dynamodb or boto3.resource('dynamodb', region_name='us-east-1'), seen_ids_path)
     try:
-        for city in cities:
-            for cuisine in cuisines:
-                count = 0
-                repeated = 0
-                for i in range(0,1000,50):
-                    params = {'term': cuisine + " restaurants", 
-                        'location': city,
-                        'offset' : i,
-                        'limit': 50}
-                    
-                    response = requests.get(search_api_url, headers=headers, params=params, timeout=5)
-                    data_dict = response.json(parse_float=Decimal)
-
-                    # print(data_dict['businesses'][0])
-
-
-                    for business in data_dict['businesses']:
-
-                        result = ""
-                        
-                        id = business['id']
-                        result = yelp_restaurants_table.get_item(
-                            Key={
-                                'id': id
-                            }
-                        )
-
-                        if 'Item' in result:
-                            repeated = repeated + 1
-                        else:
-                            count = count + 1
-
-                        display_address = business['location']['display_address']
-                        address_string = ' '.join(display_address)
-
-                        item = {
-                            'id': business['id'],
-                            'Business ID': business['id'],
-                            'insertedAtTimestamp': Decimal(time.time()),
-                            'Name': business['name'],
-                            'Cuisine': cuisine,
-                            'Rating': business['rating'],
-                            'Number of Reviews': business['review_count'],
-                            'Address': address_string,
-                            'Zip Code': business['location']['zip_code'],
-                            'Latitude': str(business['coordinates']['latitude']),
-                            'Longitude': str(business['coordinates']['longitude']),
-                        }
-
-                        dynamodb_response = yelp_restaurants_table.put_item(Item=item)
-
-                print("\nCuisine: {} - Added: {}, Repeated: {}".format(cuisine, count, repeated))
-
-    except Exception as e:
-        print(data_dict)
-
-yelp()
\ No newline at end of file
+        with open(staging_path) as staging_file:
+            for line in staging_file:
+                if not line.strip():
+                    continue
+                item = json.loads(line, parse_float=Decimal)
+                item['insertedAtTimestamp'] = Decimal(time.time())
+                sink.write(item['Cuisine'], [item])
+    finally:
+        sink.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--requests-per-second', type=float, default=REQUESTS_PER_SECOND)
+    parser.add_argument('--seen-ids', metavar='FILE', help='ids file kept between runs, to count new vs. previously stored businesses')
+    parser.add_argument('--checkpoint', metavar='FILE',
+                        help='per-search progress, for resuming an interrupted crawl (default: '
+                             'yelp-checkpoint.json, or STAGING.checkpoint.json for a dry run)')
+    parser.add_argument('--dry-run', metavar='STAGING', help='write items to this JSONL file instead of DynamoDB')
+    parser.add_argument('--replay', metavar='STAGING', help='load a staged crawl into DynamoDB without calling Yelp')
+    args = parser.parse_args()
+
+    if args.replay:
+        replay(args.replay, seen_ids_path=args.seen_ids)
+        return
+    # Dry runs and real runs keep separate checkpoints, so neither resumes the other.
+    checkpoint_path = args.checkpoint or (args.dry_run + '.checkpoint.json' if args.dry_run else 'yelp-checkpoint.json')
+    yelp(seen_ids_path=args.seen_ids, checkpoint_path=checkpoint_path, staging_path=args.dry_run,
+         workers=args.workers, requests_per_second=args.requests_per_second)
+
+
+if __name__ == '__main__':
+    main()
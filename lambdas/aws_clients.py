@@ -0,0 +1,105 @@
+"""
+Per-container registry of AWS clients shared by the lambdas.
+
+Clients are built lazily on first use and then reused by every invocation the
+container serves, with a connection pool sized for the lf2 worker threads and
+TCP keep-alive so warm invocations skip the TLS handshake. boto3 clients are
+thread safe and shared; resources are not, so each thread gets its own.
+Resolved identifiers such as queue URLs are cached the same way.
+
+Endpoints can be pointed elsewhere (e.g. a local emulator) per service with
+AWS_ENDPOINT_URL_<SERVICE>, such as AWS_ENDPOINT_URL_SQS, or for every
+service with AWS_ENDPOINT_URL. register() swaps in an in-process stand-in.
+"""
+import os
+import threading
+
+MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', 25))
+CONNECT_TIMEOUT = float(os.environ.get('AWS_CONNECT_TIMEOUT', 2))
+READ_TIMEOUT = float(os.environ.get('AWS_READ_TIMEOUT', 10))
+
+_clients = {}
+_overrides = {}
+_queue_urls = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _config():
+    from botocore.config import Config
+
+    return Config(
+        max_pool_connections=MAX_POOL_CONNECTIONS,
+        tcp_keepalive=True,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUT,
+        retries={'max_attempts': 3, 'mode': 'standard'},
+    )
+
+
+def endpoint_url(service_name):
+    """Endpoint override for `service_name` from the environment, if any."""
+    variable = 'AWS_ENDPOINT_URL_' + service_name.upper().replace('-', '_')
+    return os.environ.get(variable) or os.environ.get('AWS_ENDPOINT_URL') or None
+
+
+def _session():
+    if not hasattr(_local, 'session'):
+        import boto3
+        _local.session = boto3.session.Session()
+    return _local.session
+
+
+def client(service_name):
+    """The container's client for `service_name`, created on first use."""
+    found = _clients.get(service_name)
+    if found is not None:
+        return found
+    with _lock:
+        if service_name not in _clients:
+            _clients[service_name] = _session().client(
+                service_name, endpoint_url=endpoint_url(service_name), config=_config())
+        return _clients[service_name]
+
+
+def resource(service_name):
+    """This thread's resource for `service_name`, created on first use."""
+    if service_name in _overrides:
+        return _overrides[service_name]
+    resources = getattr(_local, 'resources', None)
+    if resources is None:
+        resources = _local.resources = {}
+    if service_name not in resources:
+        resources[service_name] = _session().resource(
+            service_name, endpoint_url=endpoint_url(service_name), config=_config())
+    return resources[service_name]
+
+
+def queue_url(queue_name, sqs=None):
+    """URL of an SQS queue, looked up once per container (with `sqs` if given)."""
+    url = _queue_urls.get(queue_name)
+    if url is None:
+        url = (sqs or client('sqs')).get_queue_url(QueueName=queue_name)['QueueUrl']
+        _queue_urls[queue_name] = url
+    return url
+
+
+def register(service_name, service):
+    """
+    Use `service` (e.g. a local_aws stand-in) for both client() and resource()
+    calls for `service_name` from now on, on every thread.
+    """
+    with _lock:
+        _clients[service_name] = service
+        _overrides[service_name] = service
+
+
+def reset():
+    """Forget every client, override and cached identifier, as in a new container."""
+    global _local
+    with _lock:
+        _clients.clear()
+        _overrides.clear()
+        _queue_urls.clear()
+        _local = threading.local()
+
@@ -0,0 +1,254 @@
+"""
+Per-cuisine restaurant snapshot that lets lf2 answer suggestions from memory.
+
+The snapshot is a gzipped JSON document holding, for every cuisine, parallel
+column arrays of ids, names, addresses, ratings, review counts and
+coordinates, plus the centroid of every zip code seen. It is built offline by
+Other/build-cuisine-snapshot.py whenever the Yelp loader has run, and read from
+a local path or an s3:// URI. A SnapshotLoader re-checks the source now and
+then, so publishing a new file refreshes warm containers without a redeploy.
+
+Snapshots built before coordinates were added simply have no 'lats'/'lons'
+columns; nearest() then returns nothing and callers keep picking at random.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from array import array
+
+import aws_clients
+from geo_index import GeoIndex
+from ranking import DEFAULT_PRIOR_REVIEWS, DEFAULT_TEMPERATURE, Ranker
+
+logger = logging.getLogger()
+
+FORMAT_VERSION = 1
+
+
+def finite_float(value):
+    """
+    A DynamoDB number (Decimal) or Yelp coordinate (a string, 'None' when
+    unknown) as a float, or None when it is missing or not finite.
+    """
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def build_snapshot(items, built_at=None):
+    """
+    Turn yelp-restaurants items into the snapshot document. `version` is a hash of
+    the content, so rebuilding an unchanged catalog yields the same version.
+    """
+    cuisines = {}
+    zip_points = {}
+    for item in sorted(items, key=lambda item: item['id']):
+        columns = cuisines.setdefault(item['Cuisine'].lower(), {
+            'ids': [], 'names': [], 'addresses': [], 'ratings': [], 'reviews': [], 'lats': [], 'lons': []})
+        lat, lon = finite_float(item.get('Latitude')), finite_float(item.get('Longitude'))
+        if lat is None or lon is None:
+            lat = lon = None
+        columns['ids'].append(item['id'])
+        columns['names'].append(item.get('Name') or '')
+        columns['addresses'].append(item.get('Address') or '')
+        columns['ratings'].append(float(item.get('Rating') or 0))
+        columns['reviews'].append(int(item.get('Number of Reviews') or 0))
+        columns['lats'].append(lat)
+        columns['lons'].append(lon)
+        if lat is not None and item.get('Zip Code'):
+            zip_points.setdefault(str(item['Zip Code']), []).append((lat, lon))
+
+    zips = {code: [round(sum(lat for lat, _ in points) / len(points), 6),
+                   round(sum(lon for _, lon in points) / len(points), 6)]
+            for code, points in zip_points.items()}
+    content = json.dumps([cuisines, zips], sort_keys=True, separators=(',', ':'))
+    return {
+        'format': FORMAT_VERSION,
+        'version': hashlib.sha1(content.encode('utf-8')).hexdigest()[:16],
+        'built_at': built_at if built_at is not None else time.time(),
+        'cuisines': cuisines,
+        'zips': zips,
+    }
+
+
+def dump_snapshot(document):
+    return gzip.compress(json.dumps(document, separators=(',', ':')).encode('utf-8'))
+
+
+class CuisineSnapshot:
+    """
+    In-memory view of one snapshot document. Ratings, review counts and
+    coordinates are kept in arrays; the string columns are plain lists shared
+    by every lookup. A cuisine's GeoIndex and Ranker are built on first use.
+    """
+
+    def __init__(self, document):
+        if document.get('format') != FORMAT_VERSION:
+            raise ValueError('Unsupported snapshot format {}'.format(document.get('format')))
+        self.version = document['version']
+        self.built_at = document['built_at']
+        self.zip_centroids = document.get('zips') or {}
+        self._cuisines = {}
+        self._reviews = {}
+        self._coordinates = {}
+        for cuisine, columns in document['cuisines'].items():
+            self._cuisines[cuisine] = (columns['ids'], columns['names'], columns['addresses'],
+                                       array('f', columns['ratings']))
+            self._reviews[cuisine] = array('l', columns.get('reviews') or [0] * len(columns['ids']))
+            if 'lats' in columns:
+                nan = float('nan')
+                self._coordinates[cuisine] = (
+                    array('d', (nan if lat is None else lat for lat in columns['lats'])),
+                    array('d', (nan if lon is None else lon for lon in columns['lons'])))
+        self._geo_indexes = {}
+        self._rankers = {}
+        self._lazy_lock = threading.Lock()
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(json.loads(gzip.decompress(data).decode('utf-8')))
+
+    def age(self, now=None):
+        return (now if now is not None else time.time()) - self.built_at
+
+    def __contains__(self, cuisine):
+        return cuisine.lower() in self._cuisines
+
+    def count(self, cuisine):
+        columns = self._cuisines.get(cuisine.lower())
+        return len(columns[0]) if columns else 0
+
+    def pick(self, cuisine, size, seed):
+        """
+        Up to `size` random restaurants of `cuisine`, repeatable for the same seed,
+        shaped like search `_source` documents.
+        """
+        columns = self._cuisines.get(cuisine.lower())
+        if not columns:
+            return []
+        ids, names, addresses, ratings = columns
+        rows = random.Random(seed).sample(range(len(ids)), min(size, len(ids)))
+        return [{'RestaurantID': ids[row], 'Name': names[row], 'Address': addresses[row],
+                 'Rating': ratings[row]} for row in rows]
+
+    def rank(self, cuisine, size, seed, prior_reviews=DEFAULT_PRIOR_REVIEWS, temperature=DEFAULT_TEMPERATURE):
+        """
+        Like pick(), but restaurants with better Bayesian-average ratings are
+        drawn more often (see ranking.py). Scores are computed once per cuisine.
+        """
+        cuisine = cuisine.lower()
+        columns = self._cuisines.get(cuisine)
+        if not columns:
+            return []
+        ids, names, addresses, ratings = columns
+        key = (cuisine, prior_reviews, temperature)
+        with self._lazy_lock:
+            ranker = self._rankers.get(key)
+            if ranker is None:
+                ranker = self._rankers[key] = Ranker(ratings, self._reviews[cuisine], prior_reviews, temperature)
+        rows = ranker.sample(size, seed).tolist()
+        return [{'RestaurantID': ids[row], 'Name': names[row], 'Address': addresses[row],
+                 'Rating': ratings[row]} for row in rows]
+
+    def has_coordinates(self, cuisine):
+        return cuisine.lower() in self._coordinates
+
+    def geo_index(self, cuisine):
+        """The GeoIndex over `cuisine`'s restaurants, or None without coordinates."""
+        cuisine = cuisine.lower()
+        if cuisine not in self._coordinates:
+            return None
+        with self._lazy_lock:
+            index = self._geo_indexes.get(cuisine)
+            if index is None:
+                index = self._geo_indexes[cuisine] = GeoIndex(*self._coordinates[cuisine])
+        return index
+
+    def nearest(self, cuisine, lat, lon, size, max_km=None):
+        """
+        The `size` restaurants of `cuisine` closest to (lat, lon), nearest first,
+        shaped like pick() results with the distance in km added.
+        """
+        index = self.geo_index(cuisine)
+        if index is None:
+            return []
+        ids, names, addresses, ratings = self._cuisines[cuisine.lower()]
+        rows, distances = index.nearest(lat, lon, size, max_km=max_km)
+        return [{'RestaurantID': ids[row], 'Name': names[row], 'Address': addresses[row],
+                 'Rating': ratings[row], 'Distance': round(float(distance), 2)}
+                for row, distance in zip(rows.tolist(), distances.tolist())]
+
+
+class SnapshotLoader:
+    """
+    Loads the snapshot once per container and re-checks the source at most every
+    `check_interval` seconds, reloading only when the file has changed.
+    `get()` returns None while there is no usable snapshot, including when the
+    loaded one is older than `max_age` seconds, so callers can fall back to search.
+    """
+
+    def __init__(self, uri, check_interval=300, max_age=7 * 24 * 3600, s3=None):
+        self.uri = uri
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self._s3 = s3
+        self._snapshot = None
+        self._marker = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _s3_client(self):
+        if self._s3 is None:
+            self._s3 = aws_clients.client('s3')
+        return self._s3
+
+    def _source_marker(self):
+        """Cheap change marker: the S3 ETag or the file's mtime and size."""
+        if self.uri.startswith('s3://'):
+            bucket, key = self.uri[5:].split('/', 1)
+            return self._s3_client().head_object(Bucket=bucket, Key=key)['ETag']
+        stat = os.stat(self.uri)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _read(self):
+        if self.uri.startswith('s3://'):
+            bucket, key = self.uri[5:].split('/', 1)
+            return self._s3_client().get_object(Bucket=bucket, Key=key)['Body'].read()
+        with open(self.uri, 'rb') as snapshot_file:
+            return snapshot_file.read()
+
+    def _refresh(self, now):
+        self._checked_at = now
+        try:
+            marker = self._source_marker()
+            if marker == self._marker and self._snapshot is not None:
+                return
+            snapshot = CuisineSnapshot.from_bytes(self._read())
+        except Exception:
+            logger.exception("Could not load cuisine snapshot from %s", self.uri)
+            return
+        if self._snapshot is None or snapshot.version != self._snapshot.version:
+            logger.info("Loaded cuisine snapshot %s built at %s", snapshot.version, snapshot.built_at)
+        self._snapshot = snapshot
+        self._marker = marker
+
+    def get(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is None or now - self._checked_at >= self.check_interval:
+                self._refresh(now)
+            snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        if self.max_age and snapshot.age() > self.max_age:
+            logger.warning("Cuisine snapshot %s is stale (%.0fs old)", snapshot.version, snapshot.age())
+            return None
+        return snapshot
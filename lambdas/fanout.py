@@ -0,0 +1,116 @@
+"""
+Bounded thread-pool pipeline for running many requests through a fixed list of
+blocking stages (search, DynamoDB lookup) at the same time. lf2 hands the
+results to a Notifier, which sends the SMS batch itself.
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger()
+
+DEFAULT_CONCURRENCY = 10
+
+# `timeout` is in seconds; None waits for the stage indefinitely.
+Stage = namedtuple('Stage', ['name', 'func', 'timeout'])
+
+# `value` is what the last stage returned; `stage` names the stage that failed.
+Outcome = namedtuple('Outcome', ['value', 'error', 'stage', 'elapsed'])
+
+
+class StageTimeout(Exception):
+    pass
+
+
+# One pool per concurrency for the life of the container. Warm invocations run
+# on the same worker threads, so per-thread clients (aws_clients.resource) are
+# built once instead of on every invocation.
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def _executor(concurrency):
+    with _executors_lock:
+        executor = _executors.get(concurrency)
+        if executor is None:
+            executor = _executors[concurrency] = ThreadPoolExecutor(
+                max_workers=concurrency, thread_name_prefix='fanout-{}'.format(concurrency))
+        return executor
+
+
+def run_pipeline(inputs, stages, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Push every input through `stages` in order, with at most `concurrency` stage
+    calls running at once. Each stage receives the previous stage's return value;
+    returning None ends that request early.
+
+    A stage that exceeds its timeout fails its request with StageTimeout. The
+    worker thread cannot be interrupted, so it keeps counting against the
+    concurrency limit until the call actually returns, also for later calls,
+    since the pool is shared.
+
+    Returns one Outcome per input, in input order.
+    """
+    inputs = list(inputs)
+    outcomes = [None] * len(inputs)
+    if not inputs:
+        return outcomes
+
+    started = [0.0] * len(inputs)
+    next_input = 0
+    # future -> (input index, stage index, deadline)
+    in_flight = {}
+    abandoned = set()
+    executor = _executor(concurrency)
+
+    def submit(index, stage_index, value):
+        stage = stages[stage_index]
+        deadline = time.monotonic() + stage.timeout if stage.timeout is not None else None
+        in_flight[executor.submit(stage.func, value)] = (index, stage_index, deadline)
+
+    def finish(index, value=None, error=None, stage=None):
+        outcomes[index] = Outcome(value, error, stage, time.monotonic() - started[index])
+
+    while next_input < len(inputs) or in_flight:
+        abandoned = {future for future in abandoned if not future.done()}
+        while next_input < len(inputs) and len(in_flight) + len(abandoned) < concurrency:
+            started[next_input] = time.monotonic()
+            submit(next_input, 0, inputs[next_input])
+            next_input += 1
+
+        if not in_flight:
+            # Only abandoned calls are holding the slots; wait for one to return.
+            wait(abandoned, return_when=FIRST_COMPLETED)
+            continue
+
+        deadlines = [deadline for _, _, deadline in in_flight.values() if deadline is not None]
+        timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+        done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            index, stage_index, _ = in_flight.pop(future)
+            stage = stages[stage_index]
+            error = future.exception()
+            if error is not None:
+                finish(index, error=error, stage=stage.name)
+                continue
+            value = future.result()
+            if value is None or stage_index + 1 == len(stages):
+                finish(index, value=value)
+            else:
+                submit(index, stage_index + 1, value)
+
+        now = time.monotonic()
+        for future, (index, stage_index, deadline) in list(in_flight.items()):
+            if deadline is not None and deadline <= now:
+                del in_flight[future]
+                # A call still queued behind another invocation's abandoned one never starts.
+                if not future.cancel():
+                    abandoned.add(future)
+                stage = stages[stage_index]
+                logger.warning("Stage %s timed out after %ss", stage.name, stage.timeout)
+                finish(index, error=StageTimeout(stage.name), stage=stage.name)
+
+    return outcomes
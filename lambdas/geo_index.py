@@ -0,0 +1,179 @@
+"""
+Nearest-restaurant queries over the catalog's coordinates.
+
+GeoIndex buckets points into a fixed grid of `cell_degrees` cells, stored as
+NumPy arrays sorted by cell key, so every row of cells around a query point
+is one contiguous slice found with searchsorted. A query widens the square of
+cells until it provably holds the K nearest points, then ranks just those
+candidates with a vectorized haversine distance.
+
+resolve_location() turns what a user typed as a location into a point: a
+"lat,lon" pair, a known neighborhood, or a zip code with a known centroid.
+NumPy is only imported once an index is built, so importing this module for
+the neighborhood table stays cheap.
+"""
+import math
+import re
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# 0.01 degrees is about 1.1 km north-south and 0.85 km east-west in New York.
+DEFAULT_CELL_DEGREES = 0.01
+
+# Approximate centers of the areas people ask for by name.
+NEIGHBORHOODS = {
+    'manhattan': (40.7831, -73.9712),
+    'midtown': (40.7549, -73.9840),
+    'times square': (40.7580, -73.9855),
+    'chelsea': (40.7465, -74.0014),
+    'soho': (40.7233, -74.0030),
+    'tribeca': (40.7163, -74.0086),
+    'greenwich village': (40.7336, -74.0027),
+    'west village': (40.7358, -74.0036),
+    'east village': (40.7265, -73.9815),
+    'lower east side': (40.7150, -73.9843),
+    'chinatown': (40.7158, -73.9970),
+    'financial district': (40.7075, -74.0113),
+    'upper west side': (40.7870, -73.9754),
+    'upper east side': (40.7736, -73.9566),
+    'harlem': (40.8116, -73.9465),
+    'brooklyn': (40.6782, -73.9442),
+    'williamsburg': (40.7081, -73.9571),
+    'queens': (40.7282, -73.7949),
+    'astoria': (40.7644, -73.9235),
+    'bronx': (40.8448, -73.8648),
+    'staten island': (40.5795, -74.1502),
+}
+
+# New York City zip codes: 100xx-104xx and 110xx-116xx.
+NYC_ZIP_CODE = r'1(?:0[0-4]|1[0-6])[0-9]{2}'
+POINT = r'-?[0-9]+(?:\.[0-9]+)?\s*,\s*-?[0-9]+(?:\.[0-9]+)?'
+# Locations given as a zip code or a "lat,lon" pair rather than by name.
+POINT_OR_ZIP_CODE = '(?:{}|{})'.format(NYC_ZIP_CODE, POINT)
+_POINT = re.compile(r'\s*(-?[0-9]+(?:\.[0-9]+)?)\s*,\s*(-?[0-9]+(?:\.[0-9]+)?)\s*\Z')
+
+
+def resolve_location(text, zip_centroids=None):
+    """(lat, lon) for a "lat,lon" pair, a neighborhood or a known zip code; else None."""
+    if not text:
+        return None
+    match = _POINT.match(text)
+    if match:
+        lat, lon = float(match.group(1)), float(match.group(2))
+        if -90 <= lat <= 90 and -180 <= lon <= 180:
+            return lat, lon
+        return None
+    key = ' '.join(text.lower().replace(',', ' ').split())
+    if key in NEIGHBORHOODS:
+        return NEIGHBORHOODS[key]
+    if zip_centroids and key in zip_centroids:
+        return tuple(zip_centroids[key])
+    return None
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Distance in km from one point to every point of the `lats`/`lons` arrays."""
+    import numpy as np
+
+    lat1 = math.radians(lat)
+    lat2 = np.radians(lats)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + \
+        math.cos(lat1) * np.cos(lat2) * np.sin(np.radians(lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GeoIndex:
+    """
+    Grid index over parallel latitude/longitude sequences. Points without
+    finite coordinates are left out. Queries return positions into the
+    original sequences, nearest first, with their distances in km.
+    """
+
+    def __init__(self, lats, lons, cell_degrees=DEFAULT_CELL_DEGREES):
+        import numpy as np
+
+        self._np = np
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        positions = np.flatnonzero(np.isfinite(lats) & np.isfinite(lons))
+        lats, lons = lats[positions], lons[positions]
+
+        self.cell = cell_degrees
+        self.size = len(positions)
+        if self.size:
+            self._lat0, self._lon0 = lats.min(), lons.min()
+            self._rows = int((lats.max() - self._lat0) // cell_degrees) + 1
+            self._cols = int((lons.max() - self._lon0) // cell_degrees) + 1
+        else:
+            self._lat0 = self._lon0 = 0.0
+            self._rows = self._cols = 1
+        keys = ((lats - self._lat0) // cell_degrees).astype(np.int64) * self._cols + \
+            ((lons - self._lon0) // cell_degrees).astype(np.int64)
+        order = np.argsort(keys, kind='stable')
+        self._keys = keys[order]
+        self._lats = lats[order]
+        self._lons = lons[order]
+        self._positions = positions[order]
+
+    def __len__(self):
+        return self.size
+
+    def _cell_of(self, lat, lon):
+        return int(math.floor((lat - self._lat0) / self.cell)), int(math.floor((lon - self._lon0) / self.cell))
+
+    def _square(self, row, col, ring):
+        """Indices (into the sorted arrays) of the points in the cells within `ring` of (row, col)."""
+        np = self._np
+        first_row, last_row = max(0, row - ring), min(self._rows - 1, row + ring)
+        first_col, last_col = max(0, col - ring), min(self._cols - 1, col + ring)
+        if first_row > last_row or first_col > last_col:
+            return np.empty(0, dtype=np.int64)
+        rows = np.arange(first_row, last_row + 1, dtype=np.int64) * self._cols
+        starts = np.searchsorted(self._keys, rows + first_col, side='left')
+        ends = np.searchsorted(self._keys, rows + last_col, side='right')
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if not total:
+            return np.empty(0, dtype=np.int64)
+        # Concatenate the ranges [start, end) without a Python loop.
+        offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        return np.arange(total, dtype=np.int64) + offsets
+
+    def _covers_everything(self, row, col, ring):
+        return row - ring <= 0 and col - ring <= 0 and row + ring >= self._rows - 1 and col + ring >= self._cols - 1
+
+    def _ring_km(self, lat, ring):
+        """Every point within this distance of the query lies inside the ring's square."""
+        widest_lat = min(89.9, abs(lat) + (ring + 1) * self.cell)
+        return ring * self.cell * KM_PER_DEGREE * math.cos(math.radians(widest_lat))
+
+    def _ranked(self, candidates, distances, count):
+        np = self._np
+        if len(candidates) > count:
+            nearest = np.argpartition(distances, count - 1)[:count]
+            candidates, distances = candidates[nearest], distances[nearest]
+        order = np.argsort(distances, kind='stable')
+        return self._positions[candidates[order]], distances[order]
+
+    def nearest(self, lat, lon, k, max_km=None):
+        """Positions and distances of the `k` points nearest to (lat, lon), within `max_km` if given."""
+        np = self._np
+        if not self.size or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        row, col = self._cell_of(lat, lon)
+        ring = 1
+        while True:
+            candidates = self._square(row, col, ring)
+            covered = self._covers_everything(row, col, ring)
+            reach = self._ring_km(lat, ring)
+            if len(candidates) >= k or covered or (max_km is not None and reach >= max_km):
+                distances = haversine_km(lat, lon, self._lats[candidates], self._lons[candidates])
+                if max_km is not None:
+                    inside = distances <= max_km
+                    candidates, distances = candidates[inside], distances[inside]
+                positions, distances = self._ranked(candidates, distances, k)
+                farthest = distances[-1] if len(distances) else 0.0
+                if covered or (len(distances) == k and farthest <= reach) or \
+                        (max_km is not None and reach >= max_km):
+                    return positions, distances
+            ring *= 2
@@ -0,0 +1,181 @@
+"""
+Per-phone history of the restaurants already texted, so that asking for the
+same cuisine again brings new suggestions.
+
+Each phone's history is a Bloom filter of a fixed `bits` size (256 bytes by
+default), stored as one item of the history table:
+
+    {'phone': '+12125551234', 'filter': <bytes>, 'bits': 2048, 'hashes': 7,
+     'count': 15, 'updated_at': 1700000000, 'expires_at': 1707776000}
+
+A request costs one GetItem when it is selected and its share of one
+BatchWriteItem once the suggestion has been sent. Membership can give false
+positives (about 0.7% at `capacity` ids with the defaults), which only means
+a restaurant is occasionally skipped; it never repeats a suggestion it knows.
+When `capacity` ids have been added the filter starts over, so memory stays
+fixed and old suggestions eventually come back. `expires_at` is meant for the
+table's TTL setting, so inactive phones are deleted.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import Counter
+
+import aws_clients
+from restaurant_store import BatchWriter
+
+logger = logging.getLogger()
+
+TABLE_NAME = 'dining-history'
+KEY_NAME = 'phone'
+DEFAULT_BITS = 2048
+DEFAULT_HASHES = 7
+# Roughly bits * ln 2 / hashes: beyond this many ids false positives climb fast.
+DEFAULT_CAPACITY = 200
+DEFAULT_TTL = 90 * 24 * 3600
+
+
+class BloomFilter:
+    """
+    `bits`-bit Bloom filter over string ids with `hashes` probes per id,
+    derived from one blake2b digest by double hashing.
+    """
+
+    def __init__(self, bits=DEFAULT_BITS, hashes=DEFAULT_HASHES, data=None, count=0):
+        if bits % 8:
+            raise ValueError('bits must be a multiple of 8')
+        self.bits = bits
+        self.hashes = hashes
+        self.count = count
+        self._data = bytearray(data) if data is not None else bytearray(bits // 8)
+        if len(self._data) != bits // 8:
+            raise ValueError('Expected {} bytes of filter data, got {}'.format(bits // 8, len(self._data)))
+
+    def _probes(self, value):
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+        first, step = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * step) % self.bits for i in range(self.hashes)]
+
+    def add(self, value):
+        for probe in self._probes(value):
+            self._data[probe >> 3] |= 1 << (probe & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        data = self._data
+        return all(data[probe >> 3] & (1 << (probe & 7)) for probe in self._probes(value))
+
+    def __len__(self):
+        """Ids added, counting repeats."""
+        return self.count
+
+    def estimated_count(self):
+        """Distinct ids implied by the bits set: -(bits / hashes) * ln(1 - set / bits)."""
+        set_bits = sum(bin(byte).count('1') for byte in self._data)
+        if set_bits >= self.bits:
+            return math.inf
+        return round(-self.bits / self.hashes * math.log1p(-set_bits / self.bits))
+
+    def union(self, other):
+        """
+        A filter holding the ids of both; they must have the same shape. Its
+        count is estimated from the merged bits, since ids in both filters
+        (e.g. a history loaded twice) would be counted twice by a sum.
+        """
+        if (other.bits, other.hashes) != (self.bits, self.hashes):
+            raise ValueError('Cannot merge Bloom filters of different shapes')
+        merged = BloomFilter(self.bits, self.hashes, bytes(a | b for a, b in zip(self._data, other._data)))
+        merged.count = max(self.count, other.count, min(merged.estimated_count(), self.count + other.count))
+        return merged
+
+    def to_bytes(self):
+        return bytes(self._data)
+
+
+def prefer_unseen(items, size, seen, key):
+    """
+    The first `size` items whose key is not in `seen`, in order, topped up with
+    already-seen ones when there are not enough; a repeat beats a short answer.
+    """
+    if not seen:
+        return list(items)[:size]
+    fresh, repeats = [], []
+    for item in items:
+        (repeats if key(item) in seen else fresh).append(item)
+        if len(fresh) == size:
+            return fresh
+    return fresh + repeats[:size - len(fresh)]
+
+
+class HistoryStore:
+    """
+    Loads and saves BloomFilters keyed by phone number in `table_name`
+    (hash key 'phone'). `dynamodb` defaults to the container's resource.
+    """
+
+    def __init__(self, table_name=TABLE_NAME, bits=DEFAULT_BITS, hashes=DEFAULT_HASHES,
+                 capacity=DEFAULT_CAPACITY, ttl=DEFAULT_TTL, dynamodb=None):
+        self.table_name = table_name
+        self.bits = bits
+        self.hashes = hashes
+        self.capacity = capacity
+        self.ttl = ttl
+        self._dynamodb = dynamodb
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    def _resource(self):
+        return self._dynamodb or aws_clients.resource('dynamodb')
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def new_filter(self):
+        return BloomFilter(self.bits, self.hashes)
+
+    def load(self, phone):
+        """The phone's filter, or an empty one for a new phone or a filter of another shape."""
+        item = self._resource().Table(self.table_name).get_item(Key={KEY_NAME: phone}).get('Item')
+        self._count('loaded')
+        if not item:
+            self._count('new')
+            return self.new_filter()
+        if (int(item.get('bits', 0)), int(item.get('hashes', 0))) != (self.bits, self.hashes):
+            logger.info("Resetting history of %s stored with another filter shape", phone)
+            self._count('reshaped')
+            return self.new_filter()
+        # boto3 wraps binary attributes in a Binary with the bytes in .value.
+        data = getattr(item['filter'], 'value', item['filter'])
+        return BloomFilter(self.bits, self.hashes, data, int(item.get('count', 0)))
+
+    def record(self, history, ids):
+        """`history` with `ids` added, starting over first if they would overflow it."""
+        if history.count + len(ids) > self.capacity:
+            self._count('rollovers')
+            history = self.new_filter()
+        for restaurant_id in ids:
+            history.add(restaurant_id)
+        return history
+
+    def save_all(self, histories):
+        """
+        Write (phone, filter) pairs with BatchWriteItem. Filters for the same
+        phone, e.g. two requests in one batch, are merged into one item.
+        """
+        merged = {}
+        for phone, history in histories:
+            merged[phone] = merged[phone].union(history) if phone in merged else history
+        if not merged:
+            return
+        now = int(time.time())
+        with BatchWriter(self._resource(), self.table_name, key_name=KEY_NAME) as writer:
+            for phone, history in merged.items():
+                item = {KEY_NAME: phone, 'filter': history.to_bytes(), 'bits': self.bits,
+                        'hashes': self.hashes, 'count': history.count, 'updated_at': now}
+                if self.ttl:
+                    item['expires_at'] = now + int(self.ttl)
+                writer.put(item)
+        self._count('saved', len(merged))
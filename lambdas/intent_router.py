@@ -0,0 +1,92 @@
+"""
+Table-driven routing of Lex intents to handler functions.
+
+Handlers are registered either as callables or as "module:function" strings;
+strings are imported on the first turn that needs them, so an intent's
+dependencies are only loaded in containers that actually serve it. Intents
+with no handler go to the fallback handler when one is set. Each turn is
+timed per intent, and turns slower than `slow_ms` are logged as warnings.
+"""
+import importlib
+import logging
+import threading
+import time
+from collections import defaultdict
+
+logger = logging.getLogger()
+
+
+class UnsupportedIntent(Exception):
+    pass
+
+
+def load_handler(spec):
+    """Resolve a "module:function" string to the function."""
+    module_name, _, attribute = spec.partition(':')
+    if not module_name or not attribute:
+        raise ValueError('Handler spec {!r} is not "module:function"'.format(spec))
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+class IntentRouter:
+    """
+    Maps intent names to handlers with a dict lookup. `handlers` and `fallback`
+    accept callables or "module:function" specs.
+    """
+
+    def __init__(self, handlers=None, fallback=None, slow_ms=1000):
+        self._specs = {}
+        self._resolved = {}
+        self._lock = threading.Lock()
+        self.fallback = fallback
+        self.slow_ms = slow_ms
+        self.timings = defaultdict(lambda: {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        for intent_name, handler in (handlers or {}).items():
+            self.register(intent_name, handler)
+
+    def register(self, intent_name, handler):
+        with self._lock:
+            self._specs[intent_name] = handler
+            self._resolved.pop(intent_name, None)
+
+    def __contains__(self, intent_name):
+        return intent_name in self._specs
+
+    def resolve(self, intent_name):
+        """The handler for `intent_name`, importing it on first use; None if unknown."""
+        handler = self._resolved.get(intent_name)
+        if handler is not None:
+            return handler
+        spec = self._specs.get(intent_name)
+        if spec is None:
+            return None
+        handler = load_handler(spec) if isinstance(spec, str) else spec
+        self._resolved[intent_name] = handler
+        return handler
+
+    def _fallback(self):
+        if isinstance(self.fallback, str):
+            self.fallback = load_handler(self.fallback)
+        return self.fallback
+
+    def dispatch(self, intent_request):
+        intent_name = intent_request['currentIntent']['name']
+        handler = self.resolve(intent_name)
+        if handler is None:
+            handler = self._fallback()
+            if handler is None:
+                raise UnsupportedIntent('Intent with name ' + intent_name + ' not supported')
+
+        start = time.perf_counter()
+        try:
+            return handler(intent_request)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            timing = self.timings[intent_name]
+            timing['calls'] += 1
+            timing['total_ms'] += elapsed_ms
+            timing['max_ms'] = max(timing['max_ms'], elapsed_ms)
+            if self.slow_ms is not None and elapsed_ms >= self.slow_ms:
+                logger.warning("Intent %s took %.1f ms", intent_name, elapsed_ms)
+            else:
+                logger.debug("Intent %s took %.1f ms", intent_name, elapsed_ms)
@@ -1,38 +1,133 @@
-import json
-import boto3
+import datetime
+import hashlib
+import os
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import aws_clients
+import metrics
+import structured_log
+from quick_replies import QuickReplies
+
+logger = structured_log.configure()
+
+BOT_NAME = os.environ.get('LEX_BOT_NAME', 'DiningBot')
+BOT_ALIAS = os.environ.get('LEX_BOT_ALIAS', 'DiningBot')
+# Different clients in one request are sent to Lex concurrently, up to this many.
+MAX_CLIENT_WORKERS = int(os.environ.get('LF0_MAX_CLIENT_WORKERS', 8))
+
+# Lex userId: 2-100 characters from this set.
+LEX_USER_ID = re.compile(r'[0-9A-Za-z._:-]{2,100}\Z')
+FALLBACK_REPLY = "Sorry, something went wrong. Please try again."
+
+# Greetings and thanks answered without calling Lex. LF0_QUICK_REPLIES may hold
+# a JSON object (or a path to one) of intent -> {"reply": ..., "phrases": [...]};
+# LF0_QUICK_REPLIES_ENABLED=false sends every turn to Lex.
+QUICK_REPLIES = QuickReplies.from_config(os.environ.get('LF0_QUICK_REPLIES')) \
+    if os.environ.get('LF0_QUICK_REPLIES_ENABLED', 'true').lower() == 'true' else None
+
+
+# --- Sessions ---
+
+
+def session_id(message, new_id):
+    """
+    Lex userId for the client that sent `message`: the `unstructured.id` the
+    client echoes back from earlier replies, or `new_id` for a new client.
+    Ids Lex would reject are hashed into an accepted form.
+    """
+    client_id = (message.get('unstructured') or {}).get('id')
+    if not client_id:
+        return new_id
+    if LEX_USER_ID.match(client_id):
+        return client_id
+    return hashlib.sha1(client_id.encode('utf-8')).hexdigest()
+
+
+def reply(user_id, text):
+    return {
+        "type": "unstructured",
+        "unstructured": {
+            "id": user_id,
+            "text": text,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        }
+    }
+
+
+# --- Lex ---
+
+
+def post_text(user_id, text, correlation_id):
+    """
+    One turn of `user_id`'s Lex conversation. Session attributes are left to
+    Lex so the dialog state lf1 keeps there survives between turns.
+    """
+    quick_reply = QUICK_REPLIES.match(text) if QUICK_REPLIES is not None else None
+    if quick_reply is not None:
+        return quick_reply[1]
+    with structured_log.correlation(correlation_id):
+        try:
+            with metrics.timed('lex'):
+                response = aws_clients.client('lex-runtime').post_text(
+                    botName=BOT_NAME,
+                    botAlias=BOT_ALIAS,
+                    userId=user_id,
+                    requestAttributes={
+                        'correlation_id': correlation_id
+                    },
+                    inputText=text
+                )
+        except Exception:
+            logger.exception("Lex call failed for user %s", user_id)
+            return FALLBACK_REPLY
+    return response.get('message') or FALLBACK_REPLY
+
+
+def converse(user_id, turns):
+    """Send one client's messages in order; returns [(position, reply text)]."""
+    return [(position, post_text(user_id, text, correlation_id)) for position, text, correlation_id in turns]
+
 
 def lambda_handler(event, context):
+    """
+    Forward every message of a BotRequest to Lex and answer with one reply per
+    message, in the same order. Messages of one client are sent in order;
+    different clients are handled concurrently.
+    """
+    # Follows each message through lf1 (Lex request attribute) and lf2 (SQS message attribute).
+    request_id = getattr(context, 'aws_request_id', None) or structured_log.new_correlation_id()
+    structured_log.set_correlation_id(request_id)
+    structured_log.log_sampled(logger, "event is: %s", structured_log.lazy_json(event))
+
+    messages = event.get('messages') or []
+    # Messages without an id come from a client that has not been answered yet.
+    new_id = uuid.uuid4().hex
+    user_ids = []
+    conversations = {}
+    for position, message in enumerate(messages):
+        user_id = session_id(message, new_id)
+        text = ((message.get('unstructured') or {}).get('text') or '').strip()
+        correlation_id = request_id if len(messages) == 1 else '{}-{}'.format(request_id, position)
+        user_ids.append(user_id)
+        if text:
+            conversations.setdefault(user_id, []).append((position, text, correlation_id))
 
+    texts = [FALLBACK_REPLY] * len(messages)
+    if len(conversations) <= 1:
+        results = [converse(user_id, turns) for user_id, turns in conversations.items()]
+    else:
+        with ThreadPoolExecutor(max(1, min(MAX_CLIENT_WORKERS, len(conversations)))) as executor:
+            results = list(executor.map(lambda item: converse(*item), conversations.items()))
+    for result in results:
+        for position, text in result:
+            texts[position] = text
+    metrics.flush()
+    if QUICK_REPLIES is not None:
+        logger.info("quick replies: %s", QUICK_REPLIES.snapshot())
 
-    client = boto3.client('lex-runtime')
-    print("event is: ", event)
-    user_id = 'user1'
-    bot_name_lex = 'DiningBot'
-    bot_alias =  'DiningBot'
-    msg_text = event['messages'][0]['unstructured']['text']
-    response = client.post_text(
-    botName=bot_name_lex ,
-    botAlias= bot_alias,
-    userId=user_id,
-    sessionAttributes={
-        'string': 'string'
-    },
-    requestAttributes={
-        'string': 'string'
-    },
-    inputText= msg_text
-)
-    bot_response= {
-            "messages": [
-                {
-                    "type": "unstructured",
-                    "unstructured": {
-                    "id": 'User1',
-                    "text": response['message'],
-                    "timestamp": ""
-                                     }
-                }
-                         ]
-
-            }
+    bot_response = {
+        "messages": [reply(user_id, text) for user_id, text in zip(user_ids, texts)]
+    }
     return bot_response
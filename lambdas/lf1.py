@@ -1,18 +1,81 @@
-import math
 import json
-import datetime
 import time
 import os
-import dateutil.parser
-import logging
-import boto3 as boto3
 
-logger = logging.getLogger()
-logger.setLevel(logging.DEBUG)
+import aws_clients
+import metrics
+import structured_log
+from geo_index import NEIGHBORHOODS, POINT_OR_ZIP_CODE
+from intent_router import IntentRouter
+from slot_schema import SlotSchema
+
+logger = structured_log.configure()
 
 
 QUEUE_NAME = "DiningBotQueue"
-SQS = boto3.client("sqs")
+TIMEZONE = os.environ.get('LF1_TIMEZONE', 'America/New_York')
+# Build the SQS client and resolve the queue URL during init instead of on the
+# first DiningSuggestions fulfillment (worth it with provisioned concurrency).
+EAGER_STARTUP = os.environ.get('LF1_EAGER_STARTUP', '').lower() in ('1', 'true', 'yes')
+
+# Neighborhoods, zip codes and "lat,lon" are only worth accepting when lf2 can
+# suggest the nearest restaurants, i.e. it answers from a cuisine snapshot. Set
+# the same CUISINE_SNAPSHOT_URI as lf2, or LF1_NEIGHBORHOOD_LOCATIONS=true.
+NEIGHBORHOOD_LOCATIONS = os.environ.get(
+    'LF1_NEIGHBORHOOD_LOCATIONS', 'true' if os.environ.get('CUISINE_SNAPSHOT_URI') else 'false').lower() == 'true'
+
+_timezone_set = False
+
+CITY_LOCATION = {
+    'one_of': ['new york'],
+    'message': 'We currently do not support {} as a valid destination. We are currently only supporting New York as a city.',
+}
+NEIGHBORHOOD_LOCATION = {
+    'one_of': ['new york', 'new york city', 'nyc'] + sorted(NEIGHBORHOODS),
+    'or_pattern': POINT_OR_ZIP_CODE,
+    'message': 'We currently do not support {} as a valid destination. We are currently only supporting New York City, its neighborhoods and zip codes.',
+}
+
+SUGGEST_DINE_SCHEMA = SlotSchema([
+    ('Location', NEIGHBORHOOD_LOCATION if NEIGHBORHOOD_LOCATIONS else CITY_LOCATION),
+    ('Cuisine', {
+        'one_of': ['italian', 'thai', 'american', 'chinese', 'indian', 'caribbean', 'korean', 'mexican'],
+        'message': 'We currently only support Italian, Thai, Chinese, Indian, Korean, Caribbean, Mexican and American cuisines. Can you choose from one of these?',
+    }),
+    ('DiningTime', {
+        'time_window': (10, 22),
+        'message': 'You can dine in from 10am. to 10pm only.',
+        'format_message': 'Invalid time format, please use HH:MM format.',
+    }),
+    ('NumPeople', {
+        'int_range': (1, 20),
+        'message': 'You can host only between 1 to 20 people. Can you provide the valid value in this range?',
+    }),
+    ('PhoneNum', {
+        'pattern': r'[0-9]{10}',
+        'message': 'Please enter a valid 10 digit phone number in the format 1234567890.',
+    }),
+])
+
+
+# --- Container setup ---
+
+
+def set_timezone():
+    """
+    Treat user requests as coming from TIMEZONE. The process environment lives
+    as long as the container, so this only has to happen once.
+    """
+    global _timezone_set
+    if not _timezone_set:
+        os.environ['TZ'] = TIMEZONE
+        time.tzset()
+        _timezone_set = True
+
+
+def warm_up():
+    set_timezone()
+    get_queue_url()
 
 
 # --- Helpers that build all of the responses ---
@@ -77,12 +140,6 @@ def safe_int(n):
         return int(n)
     return n
 
-def parse_int(n):
-    try:
-        return int(n)
-    except ValueError:
-        return float('nan')
-
 def try_ex(func):
     """
     Call passed in function in try block. If KeyError is encountered return None.
@@ -97,23 +154,12 @@ def try_ex(func):
         return None
 
 
-def isvalid_city(city):
-    # valid_cities = ['manhattan','new york']
-    valid_cities = ['new york']
-    return city.lower() in valid_cities
-
-
-def isvalid_cuisines(cuisine):
-    valid_cuisines = ['italian', 'thai', 'american', 'chinese', 'indian','caribbean','korean', 'mexican']
-    return cuisine.lower() in valid_cuisines
-
-
 def build_validation_result(isvalid, violated_slot, message_content):
 
     if violated_slot == 'DiningTime':
-        logger.debug("DiningTime violated: {}".format(message_content))
+        logger.debug("DiningTime violated: %s", message_content)
     else:
-        logger.debug("{} - {}".format(violated_slot, message_content))
+        logger.debug("%s - %s", violated_slot, message_content)
     return {
         'isValid': isvalid,
         'violatedSlot': violated_slot,
@@ -128,64 +174,14 @@ def format_and_send_to_sqs(location, cuisine, people, reserve_time, phone):
             'cuisine': cuisine, 'people': people,
             'phone': phone}
     json_data = json.dumps(data)
-    send_to_sqs(json_data)
+    send_to_sqs(json_data, structured_log.correlation_id())
 
+@metrics.timed('validate')
 def validate_suggest_dine(slots):
-    location = try_ex(lambda: slots['Location'])
-    cuisine = try_ex(lambda: slots['Cuisine'])
-    dineTime = try_ex(lambda: slots['DiningTime'])
-    numPeople = try_ex(lambda: slots['NumPeople'])
-    phoneNum = try_ex(lambda: slots['PhoneNum'])
-
-    if location and not isvalid_city(location):
-        return build_validation_result(
-            False,
-            'Location',
-            'We currently do not support {} as a valid destination. We are currently only supporting New York as a city.'.format(location)
-        )
-
-    if cuisine and not isvalid_cuisines(cuisine):
-        return build_validation_result(
-            False,
-            'Cuisine',
-            'We currently only support Italian, Thai, Chinese, Indian, Korean, Caribbean, Mexican and American cuisines. Can you choose from one of these?'
-        )
-
-    if dineTime is not None:
-        logger.debug("dineTime = {}".format(dineTime))
-        if len(dineTime) != 5:
-            # Not a valid time; use a prompt defined on the build-time model.
-            return build_validation_result(False, 'DiningTime', 'Invalid time format, please use HH:MM format.')
-
-        hour, minute = dineTime.split(':')
-        hour = parse_int(hour)
-        minute = parse_int(minute)
-        if math.isnan(hour) or math.isnan(minute):
-            # Not a valid time; use a prompt defined on the build-time model.
-            return build_validation_result(False, 'DiningTime', 'Invalid time format, please use HH:MM format.')
-
-        if hour < 10 or hour > 22:
-            # Outside of service hours
-            return build_validation_result(False, 'DiningTime', 'You can dine in from 10am. to 10pm only.')
-
-
-    # if numPeople is not None and int(numPeople) > 20 and int(numPeople) < 1:
-    if numPeople is not None:
-        if int(numPeople) > 20 or int(numPeople) < 1:
-            return build_validation_result(
-                False,
-                'NumPeople',
-                'You can host only between 1 to 20 people. Can you provide the valid value in this range?'
-            )
-
-    if phoneNum is not None and (len(phoneNum) != 10 or not phoneNum.isdigit()):
-        return build_validation_result(
-            False,
-            'PhoneNum',
-            'Please enter a valid 10 digit phone number in the format 1234567890.'
-        )
-
-    return {'isValid': True}
+    violation = SUGGEST_DINE_SCHEMA.first_violation(slots)
+    if violation is None:
+        return {'isValid': True}
+    return build_validation_result(False, *violation)
 
 """ --- Functions that control the bot's behavior --- """
 
@@ -301,7 +297,7 @@ def dining_suggestions(intent_request):
             return delegate(session_attributes, intent_request['currentIntent']['slots'])
 
     # Booking the reservation.  In a real application, this would likely involve a call to a backend service.
-    logger.debug('suggest dine out at={}'.format(reservation))
+    logger.debug('suggest dine out at=%s', reservation)
     del session_attributes['currentReservation']
     session_attributes['lastConfirmedReservation'] = reservation
     format_and_send_to_sqs(location,cuisine,numPeople,dineTime,phoneNum)
@@ -343,27 +339,49 @@ def thanks(intent_request):
         }
     )
 
+
+def unsupported_intent(intent_request):
+    """
+    Fallback for intents the bot model has but this hook has no handler for.
+    Enable with LF1_FALLBACK_HANDLER=lf1:unsupported_intent.
+    """
+    return close(
+        intent_request['sessionAttributes'] or {},
+        'Failed',
+        {
+            'contentType': 'PlainText',
+            'content': "Sorry, I can't help with that yet. I can suggest a restaurant for you."
+        }
+    )
+
+
 # --- Intents ---
 
 
+# Extra intents can be added without touching this file by setting
+# LF1_INTENT_HANDLERS to a JSON object of intent name -> "module:function";
+# those modules are only imported when their intent first comes in.
+ROUTER = IntentRouter(
+    {
+        'Greetings': greet,
+        'DiningSuggestions': dining_suggestions,
+        'ThankYou': thanks,
+    },
+    fallback=os.environ.get('LF1_FALLBACK_HANDLER') or None,
+    slow_ms=float(os.environ.get('LF1_SLOW_INTENT_MS', 1000)),
+)
+for _intent_name, _spec in json.loads(os.environ.get('LF1_INTENT_HANDLERS') or '{}').items():
+    ROUTER.register(_intent_name, _spec)
+
+
 def dispatch(intent_request):
     """
     Called when the user specifies an intent for this bot.
     """
 
-    logger.debug('dispatch userId={}, intentName={}'.format(intent_request['userId'], intent_request['currentIntent']['name']))
-
-    intent_name = intent_request['currentIntent']['name']
+    logger.debug('dispatch userId=%s, intentName=%s', intent_request['userId'], intent_request['currentIntent']['name'])
 
-    # Dispatch to your bot's intent handlers
-    if intent_name == 'Greetings':
-        return greet(intent_request)
-    elif intent_name == 'DiningSuggestions':
-        return dining_suggestions(intent_request)
-    elif intent_name == 'ThankYou':
-        return thanks(intent_request)
-
-    raise Exception('Intent with name ' + intent_name + ' not supported')
+    return ROUTER.dispatch(intent_request)
 
 
 # --- Main handler ---
@@ -374,31 +392,42 @@ def lambda_handler(event, context):
     Route the incoming request based on intent.
     The JSON body of the request is provided in the event slot.
     """
-    # By default, treat the user request as coming from the America/New_York time zone.
-    os.environ['TZ'] = 'America/New_York'
-    time.tzset()
-    logger.debug('event: {}'.format(event))
-    logger.debug('event.bot.name={}'.format(event['bot']['name']))
+    set_timezone()
+    request_attributes = event.get('requestAttributes') or {}
+    structured_log.set_correlation_id(
+        request_attributes.get('correlation_id') or structured_log.new_correlation_id())
+    structured_log.log_sampled(logger, 'event: %s', structured_log.lazy_json(event))
+    logger.debug('event.bot.name=%s', event['bot']['name'])
 
-    return dispatch(event)
+    try:
+        return dispatch(event)
+    finally:
+        metrics.flush()
 
 
 
 def get_queue_url():
-    """Retrieve the URL for the configured queue name"""
-    q = SQS.get_queue_url(QueueName=QUEUE_NAME).get('QueueUrl')
+    """Retrieve the URL for the configured queue name, resolved once per container"""
+    q = aws_clients.queue_url(QUEUE_NAME)
     logger.debug("Queue URL is %s", q)
     return q
 
 
-def send_to_sqs(data):
+@metrics.timed('enqueue')
+def send_to_sqs(data, correlation_id=None):
     """The lambda handler"""
     logger.debug("Sending data to SQS %s", data)
+    attributes = {}
+    if correlation_id:
+        attributes[structured_log.CORRELATION_ATTRIBUTE] = {'DataType': 'String', 'StringValue': correlation_id}
     try:
         url = get_queue_url()
         logger.debug("Got queue URL %s", url)
-        resp = SQS.send_message(QueueUrl=url, MessageBody=data)
-        logger.debug("Sending data to SQS %s", data)
+        resp = aws_clients.client('sqs').send_message(QueueUrl=url, MessageBody=data, MessageAttributes=attributes)
         logger.debug("Send result: %s", resp)
     except Exception as e:
         raise Exception("Could not record link! %s" % e)
+
+
+if EAGER_STARTUP:
+    warm_up()
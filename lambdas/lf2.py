@@ -1,111 +1,336 @@
-import boto3
+import importlib.util
 import json
-import logging
-import random
-from boto3.dynamodb.conditions import Key, Attr
-from botocore.vendored import requests
-from botocore.exceptions import ClientError
-
-logger = logging.getLogger()
-logger.setLevel(logging.DEBUG)
-
-def getSQSMsg():
-    SQS = boto3.client("sqs")
-    url = 'https://sqs.us-east-1.amazonaws.com/571251177522/DiningBotQueue'
-    response = SQS.receive_message(
-        QueueUrl=url,
+import os
+import zlib
+
+import aws_clients
+import metrics
+import structured_log
+from cuisine_snapshot import SnapshotLoader
+from fanout import DEFAULT_CONCURRENCY, Stage, run_pipeline
+from geo_index import resolve_location
+from history import DEFAULT_BITS, DEFAULT_CAPACITY, DEFAULT_HASHES, DEFAULT_TTL, HistoryStore, prefer_unseen
+from notifier import Notification, Notifier, is_retryable
+from ranking import DEFAULT_PRIOR_REVIEWS, DEFAULT_TEMPERATURE, rank_documents
+from record_cache import RecordCache
+from restaurant_search import HttpSearchClient, random_restaurants
+from restaurant_store import DISPLAY_FIELDS, fill_display_fields, stale_ids
+
+logger = structured_log.configure()
+
+QUEUE_NAME = 'DiningBotQueue'
+MAX_MESSAGES = 10
+WAIT_TIME_SECONDS = 20
+
+# Requests handled at once per invocation, and per-stage timeouts in seconds.
+CONCURRENCY = int(os.environ.get('LF2_CONCURRENCY', DEFAULT_CONCURRENCY))
+SEARCH_TIMEOUT = float(os.environ.get('LF2_SEARCH_TIMEOUT', 5))
+LOOKUP_TIMEOUT = float(os.environ.get('LF2_LOOKUP_TIMEOUT', 5))
+
+# Composed suggestions are texted together, this many at a time. Sends that keep
+# failing go to the LF2_NOTIFY_DLQ queue if set, else their messages are retried.
+NOTIFIER = Notifier(
+    concurrency=int(os.environ.get('LF2_NOTIFY_CONCURRENCY', 10)),
+    max_attempts=int(os.environ.get('LF2_NOTIFY_ATTEMPTS', 4)),
+    dead_letter_queue=os.environ.get('LF2_NOTIFY_DLQ') or None
+)
+
+# Restaurants listed in each SMS.
+SUGGESTION_COUNT = int(os.environ.get('SUGGESTION_COUNT', 5))
+SEARCH_SOURCE_FIELDS = ('RestaurantID',) + DISPLAY_FIELDS
+
+# LF2_RANKING=weighted (needs NumPy) draws suggestions favoring well-reviewed
+# restaurants from RANKING_CANDIDATES random search hits (or the whole snapshot
+# cuisine); 'uniform' picks SUGGESTION_COUNT restaurants at random.
+RANKING = os.environ.get('LF2_RANKING', 'weighted').lower()
+RANKING_CANDIDATES = int(os.environ.get('LF2_RANKING_CANDIDATES', 50))
+RANKING_PRIOR_REVIEWS = float(os.environ.get('LF2_RANKING_PRIOR_REVIEWS', DEFAULT_PRIOR_REVIEWS))
+RANKING_TEMPERATURE = float(os.environ.get('LF2_RANKING_TEMPERATURE', DEFAULT_TEMPERATURE))
+RANKING_SOURCE_FIELDS = SEARCH_SOURCE_FIELDS + ('Rating', 'ReviewCount')
+if RANKING == 'weighted':
+    # Pay for importing NumPy during init rather than in the first rank stage.
+    # The Lambda runtime does not ship it; without a NumPy layer, pick uniformly.
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        logger.warning("NumPy is not installed; LF2_RANKING=weighted falls back to uniform picks")
+        RANKING = 'uniform'
+# Complete stale search documents from DynamoDB instead of skipping them.
+DYNAMODB_FALLBACK = os.environ.get('LF2_DYNAMODB_FALLBACK', 'true').lower() == 'true'
+
+# Stateless, so one client serves every worker thread.
+SEARCH_CLIENT = HttpSearchClient()
+
+# Optional precomputed catalog (local path or s3:// URI); when usable, suggestions
+# are answered from memory without search or DynamoDB round trips.
+SNAPSHOT = SnapshotLoader(
+    os.environ['CUISINE_SNAPSHOT_URI'],
+    check_interval=float(os.environ.get('CUISINE_SNAPSHOT_CHECK_SECONDS', 300)),
+    max_age=float(os.environ.get('CUISINE_SNAPSHOT_MAX_AGE', 7 * 24 * 3600))
+) if os.environ.get('CUISINE_SNAPSHOT_URI') else None
+# When the Location is a neighborhood, zip code or "lat,lon", suggest the nearest
+# restaurants within this many km instead of random ones. This needs the
+# snapshot's coordinates (lf1 only accepts such locations when CUISINE_SNAPSHOT_URI
+# is set) and NumPy.
+NEAREST_MAX_KM = float(os.environ.get('LF2_NEAREST_MAX_KM', 5))
+NEAREST_ENABLED = SNAPSHOT is not None and importlib.util.find_spec('numpy') is not None
+if SNAPSHOT is not None and not NEAREST_ENABLED:
+    logger.warning("NumPy is not installed; suggestions ignore neighborhoods and zip codes")
+
+# Optional per-phone history (DynamoDB table with hash key 'phone') so repeat
+# requests skip restaurants already texted. With history, the candidate pool
+# grows by one per id already sent, so it always holds enough unseen ones,
+# plus HISTORY_OVERSAMPLE times SUGGESTION_COUNT as slack for false positives.
+HISTORY = HistoryStore(
+    os.environ['LF2_HISTORY_TABLE'],
+    bits=int(os.environ.get('LF2_HISTORY_BITS', DEFAULT_BITS)),
+    hashes=int(os.environ.get('LF2_HISTORY_HASHES', DEFAULT_HASHES)),
+    capacity=int(os.environ.get('LF2_HISTORY_CAPACITY', DEFAULT_CAPACITY)),
+    ttl=float(os.environ.get('LF2_HISTORY_TTL', DEFAULT_TTL))
+) if os.environ.get('LF2_HISTORY_TABLE') else None
+HISTORY_OVERSAMPLE = int(os.environ.get('LF2_HISTORY_OVERSAMPLE', 4))
+
+# Restaurant name/address records, kept for the life of the container.
+RESTAURANT_CACHE = RecordCache(
+    max_entries=int(os.environ.get('RESTAURANT_CACHE_SIZE', 2000)),
+    ttl=float(os.environ.get('RESTAURANT_CACHE_TTL', 3600)),
+    negative_ttl=float(os.environ.get('RESTAURANT_CACHE_NEGATIVE_TTL', 300))
+)
+
+
+# --- SQS helpers ---
+
+
+def receive_messages(sqs, max_messages=MAX_MESSAGES, wait_time=WAIT_TIME_SECONDS):
+    """
+    Long-poll the queue for up to `max_messages` requests. Messages stay invisible
+    for the queue's visibility timeout and are only deleted once handled.
+    """
+    response = sqs.receive_message(
+        QueueUrl=aws_clients.queue_url(QUEUE_NAME),
         AttributeNames=['SentTimestamp'],
         MessageAttributeNames=['All'],
-        VisibilityTimeout=0,
-        WaitTimeSeconds=0
+        MaxNumberOfMessages=max_messages,
+        WaitTimeSeconds=wait_time
     )
-    try:
-        message = response['Messages'][0]
-        if message is None:
-            logger.debug("Empty message")
-            return None
-    except KeyError:
-        logger.debug("No message in the queue")
-        return None
-    message = response['Messages'][0]
-    SQS.delete_message(
-            QueueUrl=url,
-            ReceiptHandle=message['ReceiptHandle']
+    messages = response.get('Messages', [])
+    logger.debug("Received %d messages", len(messages))
+    return messages
+
+
+def delete_messages(sqs, messages):
+    """
+    Acknowledge handled messages with DeleteMessageBatch, 10 entries per call.
+    """
+    for start in range(0, len(messages), MAX_MESSAGES):
+        chunk = messages[start:start + MAX_MESSAGES]
+        response = sqs.delete_message_batch(
+            QueueUrl=aws_clients.queue_url(QUEUE_NAME),
+            Entries=[{'Id': str(i), 'ReceiptHandle': message['ReceiptHandle']}
+                     for i, message in enumerate(chunk)]
         )
-    logger.debug('Received and deleted message: %s' % response)
-    logger.debug("message: {}".format(message))
-    return message
+        for failed in response.get('Failed', []):
+            logger.warning("Could not delete message %s: %s", failed['Id'], failed.get('Message'))
 
-def lambda_handler(event, context):
 
+def message_id(record):
+    """Message id of a ReceiveMessage result or an SQS event record."""
+    return record['messageId'] if 'messageId' in record else record['MessageId']
+
+
+def message_body(record):
+    """Body of a ReceiveMessage result or an SQS event record."""
+    return record['body'] if 'body' in record else record['Body']
+
+
+def message_correlation_id(record):
+    """CorrelationId attribute set by lf1, falling back to the message id."""
+    if 'messageAttributes' in record:
+        attribute = record['messageAttributes'].get(structured_log.CORRELATION_ATTRIBUTE) or {}
+        value = attribute.get('stringValue')
+    else:
+        attribute = (record.get('MessageAttributes') or {}).get(structured_log.CORRELATION_ATTRIBUTE) or {}
+        value = attribute.get('StringValue')
+    return value or message_id(record)
+
+
+def process_records(records):
     """
-        Query SQS to get the messages
-        Store the relevant info, and pass it to the Elastic Search
+    Run the queued requests through the suggestion stages concurrently, text
+    the composed suggestions as one batch and return the records that failed,
+    so only those are retried.
     """
+    records = list(records)
+    parsed = []
+    for record in records:
+        with structured_log.correlation(message_correlation_id(record)) as correlation_id:
+            request = parse_request(message_body(record), message_id(record))
+        if request is not None:
+            request["correlation_id"] = correlation_id
+        parsed.append(request)
+    pending = [i for i, request in enumerate(parsed) if request is not None]
 
-    message = getSQSMsg() #data will be a json object
-    if message is None:
-        logger.debug("No Cuisine or PhoneNum key found in message")
-        return
+    outcomes = run_pipeline([parsed[i] for i in pending], SUGGESTION_STAGES, CONCURRENCY)
 
-    message_body = json.loads(message["Body"])
-    logger.debug("cuisine: {}".format(message_body["cuisine"]))
-    cuisine = message_body["cuisine"]
+    failures = []
+    composed = []
+    for i, outcome in zip(pending, outcomes):
+        metrics.record('compose', outcome.elapsed * 1000, error=outcome.error is not None)
+        if outcome.error is not None:
+            with structured_log.correlation(parsed[i]["correlation_id"]):
+                logger.error("Failed to handle message %s in stage %s: %r",
+                             message_id(records[i]), outcome.stage, outcome.error)
+            failures.append(records[i])
+        elif outcome.value is not None:
+            composed.append(i)
 
-    logger.debug(cuisine)
+    deliveries = NOTIFIER.send_all(
+        Notification(parsed[i]["phone"], parsed[i]["message"], parsed[i]["correlation_id"]) for i in composed)
+    delivered = []
+    for i, delivery in zip(composed, deliveries):
+        # Redelivering the message only helps if the send failed for a transient
+        # reason and the suggestion was not parked in the dead-letter queue.
+        if delivery.error is not None and not delivery.dead_lettered and is_retryable(delivery.error):
+            failures.append(records[i])
+        elif delivery.error is None:
+            delivered.append(i)
+    save_history(parsed[i] for i in delivered)
+    return failures
 
-    location = message_body["location"]
-    time = message_body["time"]
-    numOfPeople = message_body["people"]
-    phoneNumber = message_body["phone"]
-    # phoneNumber = "+1" + phoneNumber
-    if not cuisine or not phoneNumber:
-        logger.debug("No Cuisine or PhoneNum key found in message")
+
+def save_history(requests):
+    """Store the updated history of every texted phone; a failure only costs some history."""
+    histories = [(request["phone"], request["history"]) for request in requests
+                 if request.get("history") is not None]
+    if not histories:
         return
+    try:
+        with metrics.timed('history') as timer:
+            HISTORY.save_all(histories)
+            timer.results = len(histories)
+    except Exception:
+        logger.exception("Could not save the suggestion history of %d phones", len(histories))
+
+
+# --- Suggestion stages ---
 
+
+def parse_request(body, seed_key=None):
     """
-        Query database based on elastic search results
-        Store the relevant info, create the message and sns the info
+    Decode one dining request. Requests that can never succeed (bad JSON,
+    no cuisine or phone) are dropped by returning None. `seed_key` (the SQS
+    message id) seeds the random picks.
     """
+    try:
+        request = json.loads(body)
+    except ValueError:
+        logger.warning("Dropping malformed message: %s", body)
+        return None
+
+    if not isinstance(request, dict) or not request.get("cuisine") or not request.get("phone"):
+        logger.debug("No Cuisine or PhoneNum key found in message")
+        return None
+    logger.debug("cuisine: %s", request["cuisine"])
+    # Redeliveries of the same message get the same suggestions, while asking
+    # again with the same details (a new message) gets fresh ones.
+    request["seed"] = zlib.crc32((seed_key or body).encode('utf-8'))
+    return request
 
-    headers = {'content-type': 'application/json'}
-    esUrl = 'https://search-concierge-chatbot-mupjitn6btj57fg6oxgajiffdy.us-east-1.es.amazonaws.com/_search?q={cuisine}'.format(cuisine = cuisine)
-    esResponse = requests.get(esUrl, auth=("demo", "Demo@1234"), headers=headers)
-    logger.debug("esResponse: {}".format(esResponse.text))
-    data = json.loads(esResponse.content.decode('utf-8'))
-    logger.info("data: {}".format(data))
+
+def load_history(request):
+    """The phone's suggestion history, or None without a store or when it cannot be read."""
+    if HISTORY is None:
+        return None
     try:
-        esData = data["hits"]["hits"]
-        logger.info("esData: {}".format(esData))
-    except KeyError:
-        logger.debug("Error extracting hits from ES response")
+        with metrics.timed('history'):
+            return HISTORY.load(request["phone"])
+    except Exception:
+        logger.exception("Could not load the suggestion history of %s", request["phone"])
+        return None
+
+
+def search_restaurants(request):
+    """
+    Choose SUGGESTION_COUNT restaurants of the requested cuisine from the search
+    index, weighted by rating unless LF2_RANKING=uniform. The index carries the
+    display fields, so only those (and the ranking inputs) are fetched.
+    A loaded cuisine snapshot answers instead when it knows the cuisine, with
+    the nearest restaurants when the location resolves to a point.
+    Restaurants in the phone's history are skipped while others are left.
+    """
+    seen = request["history"] = load_history(request)
+    # Even if every id already sent is drawn, the pool still has enough others.
+    wanted = SUGGESTION_COUNT * HISTORY_OVERSAMPLE + len(seen) if seen else SUGGESTION_COUNT
+
+    def choose(candidates):
+        return prefer_unseen(candidates, SUGGESTION_COUNT, seen, key=lambda restaurant: restaurant["RestaurantID"])
+
+    snapshot = SNAPSHOT.get() if SNAPSHOT is not None else None
+    if NEAREST_ENABLED and snapshot is not None and snapshot.has_coordinates(request["cuisine"]):
+        point = resolve_location(request.get("location"), snapshot.zip_centroids)
+        if point is not None:
+            with metrics.timed('nearest') as timer:
+                request["restaurants"] = choose(snapshot.nearest(
+                    request["cuisine"], point[0], point[1], wanted, max_km=NEAREST_MAX_KM))
+                timer.results = len(request["restaurants"])
+            if request["restaurants"]:
+                return request
+            logger.debug("No %s restaurants within %s km of %s", request["cuisine"], NEAREST_MAX_KM, point)
+    if snapshot is not None and request["cuisine"] in snapshot:
+        with metrics.timed('snapshot') as timer:
+            if RANKING == 'weighted':
+                request["restaurants"] = choose(snapshot.rank(request["cuisine"], wanted, request["seed"],
+                                                              RANKING_PRIOR_REVIEWS, RANKING_TEMPERATURE))
+            else:
+                request["restaurants"] = choose(snapshot.pick(request["cuisine"], wanted, request["seed"]))
+            timer.results = len(request["restaurants"])
+        logger.debug("Answered from cuisine snapshot %s", snapshot.version)
+        return request
 
-    # extract bID from AWS ES
-    ids = []
-    for restaurant in esData:
-        ids.append(restaurant["_source"]["RestaurantID"])
+    if RANKING == 'weighted':
+        with metrics.timed('search') as timer:
+            candidates = random_restaurants(SEARCH_CLIENT, request["cuisine"],
+                                            max(wanted, RANKING_CANDIDATES), request["seed"],
+                                            RANKING_SOURCE_FIELDS)
+            timer.results = len(candidates)
+        with metrics.timed('rank') as timer:
+            # A full weighted order, so skipping seen ones keeps the draw weighted.
+            request["restaurants"] = choose(rank_documents(candidates, len(candidates), request["seed"],
+                                                           RANKING_PRIOR_REVIEWS, RANKING_TEMPERATURE))
+            timer.results = len(request["restaurants"])
+    else:
+        with metrics.timed('search') as timer:
+            request["restaurants"] = choose(random_restaurants(
+                SEARCH_CLIENT, request["cuisine"], wanted, request["seed"], SEARCH_SOURCE_FIELDS))
+            timer.results = len(request["restaurants"])
+    structured_log.log_sampled(logger, "restaurants: %s", structured_log.lazy(
+        lambda: [restaurant["RestaurantID"] for restaurant in request["restaurants"]]))
+    return request
 
+
+def compose_suggestion(request):
+    """
+    Build the SMS text from the search results. DynamoDB is only read
+    for documents indexed before the display fields were added.
+    """
     messageToSend = 'Hello! Here are my {cuisine} restaurant suggestions in {location} for {numPeople} people, at {diningTime}: '.format(
-            cuisine=cuisine,
-            location=location,
-            numPeople=numOfPeople,
-            diningTime=time,
+            cuisine=request["cuisine"],
+            location=request.get("location"),
+            numPeople=request.get("people"),
+            diningTime=request.get("time"),
         )
 
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table('yelp-restaurants')
-    ind = random.sample(ids,10)
-    logger.info("ind: {}".format(ind))
+    # Only requests with stale documents need a DynamoDB handle at all.
+    stale = DYNAMODB_FALLBACK and stale_ids(request["restaurants"])
+    dynamodb = aws_clients.resource('dynamodb') if stale else None
+    # Records the 'dynamodb' stage itself, only when it has to read the table.
+    restaurants = fill_display_fields(request["restaurants"], dynamodb, cache=RESTAURANT_CACHE)
+    if not restaurants:
+        logger.warning("No %s restaurants found", request["cuisine"])
+        messageToSend = 'Sorry, I could not find any {} restaurants in {} right now.'.format(
+            request["cuisine"], request.get("location"))
     itr = 1
-    for id in ind:
-        logger.info("id: {}".format(id))
-        if itr == 6:
-            break
-        response = table.scan(FilterExpression=Attr('id').eq(id))
-        logger.info("dynamodb response: {}".format(response))
-        item = response['Items'][0]
-        if response is None:
-            continue
+    for item in restaurants:
         restaurantMsg = '\n' + str(itr) + '. '
         name = item["Name"]
         address = item["Address"]
@@ -113,22 +338,56 @@ def lambda_handler(event, context):
         messageToSend += restaurantMsg
         itr += 1
 
-    messageToSend += "Enjoy your meal!!"
-    logger.info("messageToSend: {}".format(messageToSend))
+    if restaurants:
+        messageToSend += "Enjoy your meal!!"
+    if request.get("history") is not None:
+        request["history"] = HISTORY.record(request["history"], [item["RestaurantID"] for item in restaurants])
+    structured_log.log_sampled(logger, "messageToSend: %s", messageToSend)
+    request["message"] = messageToSend
+    return request
+
+
+# Stages run on worker threads, so each binds its request's correlation ID.
+SUGGESTION_STAGES = [
+    Stage('search', structured_log.correlated(search_restaurants), SEARCH_TIMEOUT),
+    Stage('lookup', structured_log.correlated(compose_suggestion), LOOKUP_TIMEOUT),
+]
 
+
+# --- Main handler ---
+
+
+def lambda_handler(event, context):
+    """
+    Invoked either by an SQS event source mapping (event has 'Records'; the mapping
+    must enable ReportBatchItemFailures) or on a schedule, in which case it
+    long-polls the queue for a batch itself.
+    """
+    # A batch mixes requests; each one's logs are tagged inside process_records.
+    structured_log.set_correlation_id(None)
     try:
-        client = boto3.client('sns')
-        response = client.publish(
-            PhoneNumber=phoneNumber,
-            Message= messageToSend,
-            MessageStructure='string'
-        )
-    except KeyError:
-        logger.debug("Error sending ")
-    logger.debug("response - %s",json.dumps(response) )
-    logger.debug("Message = '%s' Phone Number = %s" % (messageToSend, phoneNumber))
+        return handle_event(event)
+    finally:
+        metrics.flush()
+
+
+def handle_event(event):
+    if event and event.get('Records'):
+        failures = process_records(event['Records'])
+        logger.info("restaurant cache: %s", RESTAURANT_CACHE.snapshot())
+        return {'batchItemFailures': [{'itemIdentifier': message_id(record)} for record in failures]}
+
+    sqs = aws_clients.client('sqs')
+    messages = receive_messages(sqs)
+    if not messages:
+        logger.debug("No message in the queue")
+        return None
+
+    failed_ids = {message_id(record) for record in process_records(messages)}
+    delete_messages(sqs, [message for message in messages if message_id(message) not in failed_ids])
+    logger.info("restaurant cache: %s", RESTAURANT_CACHE.snapshot())
 
     return {
         'statusCode': 200,
-        'body': json.dumps(messageToSend)
+        'body': json.dumps({'processed': len(messages) - len(failed_ids), 'failed': len(failed_ids)})
     }
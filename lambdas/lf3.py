@@ -0,0 +1,64 @@
+from boto3.dynamodb.types import TypeDeserializer
+
+import structured_log
+from restaurant_search import HttpSearchClient, bulk_write, delete_action, index_action, restaurant_document
+
+logger = structured_log.configure()
+
+SEARCH_CLIENT = HttpSearchClient(timeout=30)
+_deserializer = TypeDeserializer()
+
+
+def _image(attributes):
+    return {name: _deserializer.deserialize(value) for name, value in attributes.items()}
+
+
+def stream_actions(records):
+    """
+    Turn DynamoDB Streams records from yelp-restaurants into bulk actions:
+    inserts and updates re-index the new image, removals delete the document.
+    Returns a list of (record, action) pairs; records without usable data are skipped.
+    """
+    actions = []
+    for record in records:
+        change = record.get('dynamodb', {})
+        if record['eventName'] == 'REMOVE':
+            restaurant_id = _image(change['Keys'])['id']
+            actions.append((record, delete_action(restaurant_id)))
+        elif 'NewImage' in change:
+            actions.append((record, index_action(restaurant_document(_image(change['NewImage'])))))
+        else:
+            logger.warning("Skipping %s record without NewImage; the stream view type "
+                           "must include new images", record['eventName'])
+    return actions
+
+
+def apply_stream_records(records, client=None):
+    """
+    Write the changes in `records` to the index (default SEARCH_CLIENT) in one
+    _bulk request. Returns the records whose change could not be written.
+    """
+    pairs = stream_actions(records)
+    if not pairs:
+        return []
+    _, failed = bulk_write(client or SEARCH_CLIENT, [action for _, action in pairs])
+    failed_ids = {meta[next(iter(meta))]['_id'] for (meta, _), _ in failed}
+    for (meta, _), error in failed:
+        logger.error("Could not sync restaurant %s: %s", meta[next(iter(meta))]['_id'], error)
+    return [record for record, (meta, _) in pairs if meta[next(iter(meta))]['_id'] in failed_ids]
+
+
+def lambda_handler(event, context):
+    """
+    Keep the search index in step with yelp-restaurants from its DynamoDB stream,
+    so the index only does work for restaurants that changed. The event source
+    mapping should enable ReportBatchItemFailures; the batch is then retried from
+    the first record that failed.
+    """
+    records = event.get('Records', [])
+    failed = apply_stream_records(records)
+    logger.info("Synced %d of %d stream records", len(records) - len(failed), len(records))
+    if not failed:
+        return {'batchItemFailures': []}
+    first = min(failed, key=lambda record: int(record['dynamodb']['SequenceNumber']))
+    return {'batchItemFailures': [{'itemIdentifier': first['dynamodb']['SequenceNumber']}]}
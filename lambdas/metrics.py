@@ -0,0 +1,175 @@
+"""
+Per-stage latency, result and error counts for the lambdas.
+
+    with metrics.timed('search') as timer:
+        restaurants = random_restaurants(...)
+        timer.results = len(restaurants)
+
+    @metrics.timed('validate')
+    def validate_suggest_dine(slots): ...
+
+Every timed block records its duration in milliseconds, an optional result
+count and whether it raised. By default the values are buffered and
+flush() (called at the end of each handler) prints them as CloudWatch
+embedded metric format lines, one per stage, so CloudWatch extracts the
+metrics from the logs without PutMetricData calls. Benchmarks install a
+LocalSink instead to get p50/p95/p99 summaries.
+"""
+import functools
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+
+NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'DiningBot')
+FUNCTION = os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local')
+# EMF accepts at most 100 values per metric in one document.
+MAX_VALUES = 100
+
+
+class EmfSink:
+    """Buffers values per stage and writes them as EMF JSON lines on flush()."""
+
+    def __init__(self, namespace=NAMESPACE, function=FUNCTION, write=print):
+        self.namespace = namespace
+        self.function = function
+        self.write = write
+        self._values = defaultdict(self._series)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _series():
+        return {'Duration': [], 'Results': [], 'Errors': []}
+
+    def record(self, stage, duration_ms, results, error):
+        with self._lock:
+            values = self._values[stage]
+            values['Duration'].append(round(duration_ms, 3))
+            values['Errors'].append(1 if error else 0)
+            if results is not None:
+                values['Results'].append(results)
+
+    def flush(self):
+        with self._lock:
+            pending, self._values = self._values, defaultdict(self._series)
+        for stage, values in pending.items():
+            for start in range(0, len(values['Duration']), MAX_VALUES):
+                self.write(self.document(stage, {name: series[start:start + MAX_VALUES]
+                                                 for name, series in values.items()}))
+
+    def document(self, stage, values):
+        units = {'Duration': 'Milliseconds', 'Results': 'Count', 'Errors': 'Count'}
+        values = {name: series for name, series in values.items() if series}
+        return json.dumps({
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': self.namespace,
+                    'Dimensions': [['Function', 'Stage']],
+                    'Metrics': [{'Name': name, 'Unit': units[name]} for name in values],
+                }],
+            },
+            'Function': self.function,
+            'Stage': stage,
+            **values,
+        }, separators=(',', ':'))
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class LocalSink:
+    """Keeps every value in memory and summarizes them per stage."""
+
+    def __init__(self):
+        self._durations = defaultdict(list)
+        self._results = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, stage, duration_ms, results, error):
+        with self._lock:
+            self._durations[stage].append(duration_ms)
+            self._results[stage] += results or 0
+            self._errors[stage] += 1 if error else 0
+
+    def flush(self):
+        pass
+
+    def summary(self):
+        with self._lock:
+            stages = {stage: sorted(durations) for stage, durations in self._durations.items()}
+            summary = {}
+            for stage, durations in stages.items():
+                summary[stage] = {
+                    'count': len(durations),
+                    'errors': self._errors[stage],
+                    'results': self._results[stage],
+                    'mean_ms': sum(durations) / len(durations),
+                    'p50_ms': percentile(durations, 0.50),
+                    'p95_ms': percentile(durations, 0.95),
+                    'p99_ms': percentile(durations, 0.99),
+                }
+        return summary
+
+    def report(self):
+        lines = ["{:<12} {:>7} {:>7} {:>9} {:>9} {:>9} {:>9}".format(
+            'stage', 'count', 'errors', 'mean ms', 'p50 ms', 'p95 ms', 'p99 ms')]
+        for stage, row in sorted(self.summary().items()):
+            lines.append("{:<12} {:>7} {:>7} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.2f}".format(
+                stage, row['count'], row['errors'], row['mean_ms'], row['p50_ms'], row['p95_ms'], row['p99_ms']))
+        return '\n'.join(lines)
+
+
+_sink = EmfSink() if os.environ.get('METRICS_SINK', 'emf') == 'emf' else None
+
+
+def set_sink(sink):
+    """Send metrics to `sink` (EmfSink, LocalSink or None to drop them)."""
+    global _sink
+    _sink = sink
+    return sink
+
+
+def record(stage, duration_ms, results=None, error=False):
+    if _sink is not None:
+        _sink.record(stage, duration_ms, results, error)
+
+
+def flush():
+    if _sink is not None:
+        _sink.flush()
+
+
+class timed:
+    """
+    Context manager and decorator timing one stage. Set `results` on the
+    context object to record a result count as well.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.results = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.stage, (time.perf_counter() - self._start) * 1000, self.results, exc_type is not None)
+
+    def __call__(self, func):
+        stage = self.stage
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return func(*args, **kwargs)
+        return wrapper
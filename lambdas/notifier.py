@@ -0,0 +1,136 @@
+"""
+Concurrent SMS delivery for lf2.
+
+A Notifier publishes a batch of composed messages through SNS with at most
+`concurrency` sends in flight. Throttling and transient errors are retried
+with jittered exponential backoff; messages that still cannot be sent, or
+that SNS rejects outright, go to a dead-letter queue when one is configured.
+Each attempt's latency is recorded as the 'sns' metric.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import aws_clients
+import metrics
+import structured_log
+
+logger = logging.getLogger()
+
+DEFAULT_CONCURRENCY = 10
+
+# SNS error codes worth another attempt; anything else (e.g. InvalidParameter
+# for a bad phone number) fails the same way every time.
+RETRYABLE_CODES = frozenset([
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'TooManyRequestsException',
+    'RequestLimitExceeded', 'InternalError', 'InternalFailure', 'ServiceUnavailable',
+    'KMSThrottlingException',
+])
+
+Notification = namedtuple('Notification', ['phone', 'message', 'correlation_id'])
+
+# `dead_lettered` is True when the notification was parked in the dead-letter
+# queue instead of being sent; `error` is the last error, if any.
+Delivery = namedtuple('Delivery', ['notification', 'message_id', 'error', 'attempts', 'dead_lettered'])
+
+
+def error_code(error):
+    """The AWS error code of a botocore ClientError (or a stand-in's), else None."""
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        return response.get('Error', {}).get('Code')
+    return None
+
+
+def is_retryable(error):
+    code = error_code(error)
+    if code is not None:
+        return code in RETRYABLE_CODES
+    # No AWS error code: connection resets, read timeouts and the like.
+    return isinstance(error, OSError) or \
+        type(error).__name__ in ('EndpointConnectionError', 'ConnectTimeoutError', 'ReadTimeoutError')
+
+
+class Notifier:
+    """
+    Sends Notifications through `sns` (default: the container's SNS client).
+    `dead_letter_queue` names an SQS queue for undeliverable notifications;
+    without one they are reported as failed so the caller can retry them.
+    """
+
+    def __init__(self, sns=None, concurrency=DEFAULT_CONCURRENCY, max_attempts=4, base_delay=0.2,
+                 max_delay=5.0, dead_letter_queue=None, sqs=None):
+        self._sns = sns
+        self._sqs = sqs
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.dead_letter_queue = dead_letter_queue
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def send(self, notification):
+        """Publish one notification, retrying transient failures. Returns a Delivery."""
+        sns = self._sns or aws_clients.client('sns')
+        error = None
+        attempt = 0
+        with structured_log.correlation(notification.correlation_id):
+            while attempt < self.max_attempts:
+                attempt += 1
+                try:
+                    with metrics.timed('sns'):
+                        response = sns.publish(PhoneNumber=notification.phone, Message=notification.message,
+                                               MessageStructure='string')
+                except Exception as exc:
+                    error = exc
+                    if not is_retryable(exc):
+                        self._count('rejected')
+                        break
+                    self._count('retries' if attempt < self.max_attempts else 'exhausted')
+                    if attempt < self.max_attempts:
+                        delay = self._backoff(attempt)
+                        logger.debug("SNS %s for %s, retrying in %.2fs", error_code(exc) or exc,
+                                     notification.phone, delay)
+                        time.sleep(delay)
+                    continue
+                self._count('sent')
+                structured_log.log_sampled(logger, "response - %s", structured_log.lazy_json(response))
+                return Delivery(notification, response.get('MessageId'), None, attempt, False)
+
+            logger.error("Could not text %s after %d attempts: %r", notification.phone, attempt, error)
+            return Delivery(notification, None, error, attempt, self._dead_letter(notification, error, attempt))
+
+    def _dead_letter(self, notification, error, attempts):
+        if not self.dead_letter_queue:
+            return False
+        sqs = self._sqs or aws_clients.client('sqs')
+        body = json.dumps({'phone': notification.phone, 'message': notification.message,
+                           'correlation_id': notification.correlation_id, 'attempts': attempts,
+                           'error': error_code(error) or repr(error)})
+        try:
+            sqs.send_message(QueueUrl=aws_clients.queue_url(self.dead_letter_queue, sqs=sqs), MessageBody=body)
+        except Exception:
+            logger.exception("Could not dead-letter the message for %s", notification.phone)
+            return False
+        self._count('dead_lettered')
+        return True
+
+    def send_all(self, notifications):
+        """Publish every notification, `concurrency` at a time. Deliveries keep the input order."""
+        notifications = list(notifications)
+        if len(notifications) <= 1 or self.concurrency <= 1:
+            return [self.send(notification) for notification in notifications]
+        with ThreadPoolExecutor(min(self.concurrency, len(notifications))) as executor:
+            return list(executor.map(self.send, notifications))
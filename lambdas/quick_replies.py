@@ -0,0 +1,83 @@
+"""
+Fixed answers for small talk that does not need Lex.
+
+"hi", "hello" and "thanks" make up a large share of chat turns, and Lex only
+routes them to lf1's greet()/thanks(), which return constant text. A
+QuickReplies table answers them in lf0 instead. Phrases are normalized
+(case, punctuation, repeated whitespace) and looked up in a dict, so only an
+exact match of a listed phrase is answered; anything else goes to Lex.
+"""
+import json
+import re
+import threading
+from collections import Counter
+
+_NOT_WORD = re.compile(r"[^\w']+")
+
+# Same texts as lf1's greet() and thanks().
+DEFAULT_REPLIES = {
+    'Greetings': {
+        'reply': 'Hi there, how can I help you?',
+        'phrases': ['hi', 'hello', 'hey', 'hi there', 'hello there', 'hey there', 'hiya',
+                    'good morning', 'good afternoon', 'good evening'],
+    },
+    'ThankYou': {
+        'reply': 'Welcome !! Have a nice day ahead.',
+        'phrases': ['thanks', 'thank you', 'thank you so much', 'thanks a lot', 'many thanks',
+                    'thx', 'ty', 'cheers'],
+    },
+}
+
+
+def normalize(text):
+    return ' '.join(_NOT_WORD.sub(' ', text.lower()).split())
+
+
+class QuickReplies:
+    """
+    `replies` maps an intent name to {'reply': text, 'phrases': [...]}.
+    `stats` counts hits per intent and misses; every hit is a Lex call saved.
+    """
+
+    def __init__(self, replies=None):
+        self._table = {}
+        for intent_name, entry in (DEFAULT_REPLIES if replies is None else replies).items():
+            for phrase in entry['phrases']:
+                key = normalize(phrase)
+                if key in self._table and self._table[key][0] != intent_name:
+                    raise ValueError('Phrase {!r} is listed for both {} and {}'.format(
+                        phrase, self._table[key][0], intent_name))
+                self._table[key] = (intent_name, entry['reply'])
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, value):
+        """Build from a JSON document or a path to one; empty means the defaults."""
+        if not value:
+            return cls()
+        if value.lstrip().startswith('{'):
+            return cls(json.loads(value))
+        with open(value) as config_file:
+            return cls(json.load(config_file))
+
+    def __len__(self):
+        return len(self._table)
+
+    def match(self, text):
+        """(intent name, reply text) for a listed phrase, else None."""
+        found = self._table.get(normalize(text))
+        with self._lock:
+            if found is None:
+                self.stats['misses'] += 1
+            else:
+                self.stats['hits'] += 1
+                self.stats['hits.' + found[0]] += 1
+        return found
+
+    def snapshot(self):
+        with self._lock:
+            stats = Counter(self.stats)
+        total = stats['hits'] + stats['misses']
+        return dict(stats, lex_calls_saved=stats['hits'],
+                    hit_ratio=round(stats['hits'] / total, 3) if total else 0.0)
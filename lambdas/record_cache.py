@@ -0,0 +1,89 @@
+"""
+Size-bounded LRU cache with TTL expiry for restaurant records.
+
+An instance created at module level lives as long as the Lambda container, so
+warm invocations reuse records fetched by earlier ones.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+
+# Stored for ids the table does not have, when negative caching is enabled.
+_MISSING = object()
+
+
+class RecordCache:
+    """
+    `max_entries` bounds memory; the least recently used entry is evicted first.
+    Entries expire `ttl` seconds after they were stored. Ids reported missing are
+    remembered for `negative_ttl` seconds (0 disables negative caching).
+    """
+
+    def __init__(self, max_entries=1000, ttl=3600, negative_ttl=0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stats = Counter()
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, keys):
+        """
+        Split `keys` into cached records and keys that still have to be fetched.
+        Returns (found, missing): a dict of key -> record and a list of keys.
+        Keys cached as not found appear in neither.
+        """
+        found = {}
+        missing = []
+        now = self._clock()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] <= now:
+                    del self._entries[key]
+                    self.stats['expired'] += 1
+                    entry = None
+                if entry is None:
+                    self.stats['misses'] += 1
+                    missing.append(key)
+                    continue
+                self._entries.move_to_end(key)
+                if entry[0] is _MISSING:
+                    self.stats['negative_hits'] += 1
+                else:
+                    self.stats['hits'] += 1
+                    found[key] = entry[0]
+        return found, missing
+
+    def store(self, records, missing_keys=()):
+        """Cache fetched records and, if enabled, the keys that were not found."""
+        now = self._clock()
+        with self._lock:
+            for key, record in records.items():
+                self._put(key, record, now + self.ttl)
+            if self.negative_ttl:
+                for key in missing_keys:
+                    self._put(key, _MISSING, now + self.negative_ttl)
+
+    def _put(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self):
+        """Counters plus current size and hit ratio, for sizing the cache."""
+        with self._lock:
+            stats = dict(self.stats, size=len(self._entries), max_entries=self.max_entries)
+        lookups = stats.get('hits', 0) + stats.get('negative_hits', 0) + stats.get('misses', 0)
+        stats['hit_ratio'] = round((lookups - stats.get('misses', 0)) / lookups, 4) if lookups else 0.0
+        return stats
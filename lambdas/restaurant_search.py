@@ -0,0 +1,163 @@
+"""
+Structured queries and bulk writes against the restaurants search index.
+"""
+import base64
+import json
+import logging
+import os
+import time
+import urllib.error
+import urllib.request
+
+from cuisine_snapshot import finite_float
+
+logger = logging.getLogger()
+
+SEARCH_HOST = os.environ.get('SEARCH_HOST', 'https://search-concierge-chatbot-mupjitn6btj57fg6oxgajiffdy.us-east-1.es.amazonaws.com')
+SEARCH_USER = os.environ.get('SEARCH_USER', 'demo')
+SEARCH_PASSWORD = os.environ.get('SEARCH_PASSWORD', 'Demo@1234')
+INDEX = 'restaurants'
+DOC_TYPE = 'Restaurant'
+
+# Bulk item statuses worth retrying; anything else is a permanent rejection.
+BULK_RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+# Cuisine is indexed with dynamic mapping, which adds an exact-match keyword subfield.
+CUISINE_FIELD = 'Cuisine.keyword'
+
+
+class HttpSearchClient:
+    """
+    Minimal JSON-over-HTTP client for the search domain using basic auth.
+    """
+
+    def __init__(self, host=SEARCH_HOST, user=SEARCH_USER, password=SEARCH_PASSWORD, timeout=5):
+        self.host = host.rstrip('/')
+        self.timeout = timeout
+        token = base64.b64encode('{}:{}'.format(user, password).encode('utf-8')).decode('ascii')
+        self._headers = {'Content-Type': 'application/json', 'Authorization': 'Basic ' + token}
+
+    def request(self, method, path, body=None, content_type=None):
+        data = body if isinstance(body, bytes) or body is None else json.dumps(body).encode('utf-8')
+        headers = dict(self._headers)
+        if content_type:
+            headers['Content-Type'] = content_type
+        http_request = urllib.request.Request(self.host + path, data=data, headers=headers, method=method)
+        with urllib.request.urlopen(http_request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+    def search(self, index, body):
+        return self.request('POST', '/{}/_search'.format(index), body)
+
+    def bulk(self, payload):
+        """`payload` is the newline-delimited JSON body of a _bulk request."""
+        return self.request('POST', '/_bulk', payload, content_type='application/x-ndjson')
+
+
+def restaurant_document(item):
+    """
+    Search document for one yelp-restaurants item. Besides the id and cuisine it
+    carries everything lf2 shows to the user, so suggestions need no DynamoDB lookup.
+    """
+    document = {
+        'RestaurantID': item['id'],
+        'Cuisine': item['Cuisine'],
+        'Name': item.get('Name'),
+        'Address': item.get('Address'),
+        'Rating': finite_float(item.get('Rating')),
+        'ReviewCount': int(item['Number of Reviews']) if 'Number of Reviews' in item else None,
+    }
+    latitude = finite_float(item.get('Latitude'))
+    longitude = finite_float(item.get('Longitude'))
+    if latitude is not None and longitude is not None:
+        document['Coordinates'] = {'lat': latitude, 'lon': longitude}
+    return document
+
+
+def index_action(document, index=INDEX):
+    return ({'index': {'_index': index, '_type': DOC_TYPE, '_id': document['RestaurantID']}}, document)
+
+
+def delete_action(restaurant_id, index=INDEX):
+    return ({'delete': {'_index': index, '_type': DOC_TYPE, '_id': restaurant_id}}, None)
+
+
+def _bulk_payload(actions):
+    lines = []
+    for meta, source in actions:
+        lines.append(json.dumps(meta))
+        if source is not None:
+            lines.append(json.dumps(source))
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def bulk_write(client, actions, max_retries=3, backoff=0.5):
+    """
+    Send index/delete actions in one _bulk request, resending only the items
+    rejected with a retryable status. A whole request rejected with a retryable
+    HTTP status is resent with the same backoff. Deleting a document that is
+    already gone counts as success. Returns (succeeded, failed) where `failed`
+    lists (action, error) pairs that could not be written.
+    """
+    pending = list(actions)
+    succeeded = 0
+    failed = []
+    attempt = 0
+    while pending:
+        try:
+            response = client.bulk(_bulk_payload(pending))
+        except urllib.error.HTTPError as error:
+            if error.code not in BULK_RETRY_STATUSES:
+                raise
+            if attempt >= max_retries:
+                logger.warning("Giving up on %d bulk items after HTTP %d", len(pending), error.code)
+                failed.extend((action, 'HTTP {}'.format(error.code)) for action in pending)
+                break
+            attempt += 1
+            logger.debug("Retrying a bulk request rejected with HTTP %d (attempt %d)", error.code, attempt)
+            time.sleep(backoff * (2 ** (attempt - 1)))
+            continue
+        retry = []
+        for action, result in zip(pending, response['items']):
+            outcome = next(iter(result.values()))
+            status = outcome.get('status', 500)
+            if status < 300 or ('delete' in result and status == 404):
+                succeeded += 1
+            elif status in BULK_RETRY_STATUSES and attempt < max_retries:
+                retry.append(action)
+            else:
+                failed.append((action, outcome.get('error', status)))
+        pending = retry
+        if pending:
+            attempt += 1
+            logger.debug("Retrying %d bulk items (attempt %d)", len(pending), attempt)
+            time.sleep(backoff * (2 ** (attempt - 1)))
+    return succeeded, failed
+
+
+def suggestion_query(cuisine, size, seed, fields):
+    """
+    Exactly `size` random restaurants of one cuisine. The shuffle happens in the
+    search engine and is repeatable for the same seed.
+    """
+    return {
+        'size': size,
+        '_source': list(fields),
+        'query': {
+            'function_score': {
+                'query': {'bool': {'filter': {'term': {CUISINE_FIELD: cuisine.lower()}}}},
+                'random_score': {'seed': seed, 'field': '_seq_no'},
+                'boost_mode': 'replace'
+            }
+        }
+    }
+
+
+def random_restaurants(client, cuisine, size, seed, fields, index=INDEX):
+    """
+    Return the `_source` of up to `size` randomly chosen restaurants serving `cuisine`.
+    """
+    response = client.search(index, suggestion_query(cuisine, size, seed, fields))
+    hits = response['hits']['hits']
+    logger.debug("search returned %d of %d requested restaurants", len(hits), size)
+    return [hit['_source'] for hit in hits]
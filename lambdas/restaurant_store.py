@@ -0,0 +1,178 @@
+import logging
+import time
+from collections import Counter
+
+import metrics
+
+logger = logging.getLogger()
+
+TABLE_NAME = 'yelp-restaurants'
+
+# Fields the suggestion SMS needs; the search index stores them alongside the id.
+DISPLAY_FIELDS = ('Name', 'Address')
+
+# BatchGetItem accepts at most 100 keys per request.
+BATCH_GET_LIMIT = 100
+# BatchWriteItem accepts at most 25 put or delete requests.
+BATCH_WRITE_LIMIT = 25
+MAX_UNPROCESSED_RETRIES = 5
+RETRY_BASE_DELAY = 0.05
+
+
+def _chunks(seq, size):
+    for start in range(0, len(seq), size):
+        yield seq[start:start + size]
+
+
+def _batch_get(dynamodb, table_name, keys, projection=None):
+    """
+    Run one BatchGetItem for up to 100 keys, re-requesting unprocessed keys
+    with exponential backoff. Returns the items found and the keys that were
+    still unprocessed when the retries ran out.
+    """
+    request = {'Keys': keys}
+    if projection:
+        projection = ['id'] + [name for name in projection if name != 'id']
+        request['ProjectionExpression'] = ', '.join('#p{}'.format(i) for i in range(len(projection)))
+        request['ExpressionAttributeNames'] = {'#p{}'.format(i): name for i, name in enumerate(projection)}
+
+    items = []
+    attempt = 0
+    while True:
+        response = dynamodb.batch_get_item(RequestItems={table_name: request})
+        items.extend(response.get('Responses', {}).get(table_name, []))
+
+        unprocessed = response.get('UnprocessedKeys', {}).get(table_name)
+        if not unprocessed or not unprocessed.get('Keys'):
+            return items, []
+
+        attempt += 1
+        if attempt > MAX_UNPROCESSED_RETRIES:
+            logger.warning("Giving up on %d unprocessed keys", len(unprocessed['Keys']))
+            return items, unprocessed['Keys']
+        time.sleep(RETRY_BASE_DELAY * (2 ** (attempt - 1)))
+        request = unprocessed
+
+
+def get_restaurants(ids, dynamodb, table_name=TABLE_NAME, projection=None, cache=None):
+    """
+    Look up restaurants by primary key in as few BatchGetItem round trips as possible.
+
+    `dynamodb` is a boto3 DynamoDB service resource (or a stand-in from local_aws).
+    Items are returned in the order of `ids`; duplicate IDs are fetched once and
+    IDs that are not in the table are skipped.
+
+    With a RecordCache, only ids it does not hold are fetched, and the fetched
+    items (plus ids confirmed missing) are stored back. The cache should always
+    be used with the same projection.
+    """
+    unique_ids = list(dict.fromkeys(ids))
+    if not unique_ids:
+        return []
+
+    if cache is not None:
+        found, to_fetch = cache.lookup(unique_ids)
+    else:
+        found, to_fetch = {}, unique_ids
+
+    fetched = {}
+    unresolved = set()
+    for chunk in _chunks(to_fetch, BATCH_GET_LIMIT):
+        keys = [{'id': restaurant_id} for restaurant_id in chunk]
+        items, unprocessed = _batch_get(dynamodb, table_name, keys, projection)
+        for item in items:
+            fetched[item['id']] = item
+        unresolved.update(key['id'] for key in unprocessed)
+
+    not_found = [restaurant_id for restaurant_id in to_fetch
+                 if restaurant_id not in fetched and restaurant_id not in unresolved]
+    if cache is not None:
+        cache.store(fetched, not_found)
+    found.update(fetched)
+
+    if not_found:
+        logger.debug("%d restaurant ids not found in %s", len(not_found), table_name)
+    return [found[restaurant_id] for restaurant_id in unique_ids if restaurant_id in found]
+
+
+def stale_ids(documents, fields=DISPLAY_FIELDS):
+    """Ids of the search documents missing one of `fields`."""
+    return [doc['RestaurantID'] for doc in documents if any(not doc.get(field) for field in fields)]
+
+
+def fill_display_fields(documents, dynamodb, fields=DISPLAY_FIELDS, table_name=TABLE_NAME, cache=None):
+    """
+    Complete search documents that predate the denormalized index with their
+    display fields from DynamoDB, in one batch for all of them. Pass
+    dynamodb=None to skip the fallback and drop stale documents instead.
+    Only the lookup is timed, as the 'dynamodb' metric. Returns the usable
+    documents in their original order.
+    """
+    stale = stale_ids(documents, fields)
+    if not stale:
+        return list(documents)
+    if dynamodb is None:
+        logger.debug("Dropping %d search results without display fields", len(stale))
+        return [doc for doc in documents if all(doc.get(field) for field in fields)]
+
+    logger.debug("Filling display fields of %d stale search results from %s", len(stale), table_name)
+    with metrics.timed('dynamodb') as timer:
+        records = {item['id']: item for item in
+                   get_restaurants(stale, dynamodb, table_name, projection=list(fields), cache=cache)}
+        timer.results = len(records)
+    completed = []
+    for doc in documents:
+        if all(doc.get(field) for field in fields):
+            completed.append(doc)
+        elif doc['RestaurantID'] in records:
+            item = records[doc['RestaurantID']]
+            completed.append(dict(doc, **{field: item.get(field) for field in fields}))
+    return completed
+
+
+class BatchWriter:
+    """
+    Buffer puts and write them 25 at a time with BatchWriteItem, re-sending
+    UnprocessedItems with backoff. A second put for a key still in the buffer
+    replaces the first, since one batch may not hold duplicate keys.
+    `stats` counts round trips, items written and retried batches.
+    """
+
+    def __init__(self, dynamodb, table_name=TABLE_NAME, key_name='id'):
+        self.dynamodb = dynamodb
+        self.table_name = table_name
+        self.key_name = key_name
+        self.stats = Counter()
+        self._buffer = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.flush()
+
+    def put(self, item):
+        self._buffer[item[self.key_name]] = item
+        if len(self._buffer) >= BATCH_WRITE_LIMIT:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        requests = [{'PutRequest': {'Item': item}} for item in self._buffer.values()]
+        self._buffer = {}
+        attempt = 0
+        while requests:
+            self.stats['round_trips'] += 1
+            response = self.dynamodb.batch_write_item(RequestItems={self.table_name: requests})
+            unprocessed = response.get('UnprocessedItems', {}).get(self.table_name, [])
+            self.stats['items_written'] += len(requests) - len(unprocessed)
+            requests = unprocessed
+            if requests:
+                attempt += 1
+                if attempt > MAX_UNPROCESSED_RETRIES:
+                    raise RuntimeError('{} items still unprocessed after {} retries'.format(
+                        len(requests), MAX_UNPROCESSED_RETRIES))
+                self.stats['retries'] += 1
+                time.sleep(RETRY_BASE_DELAY * (2 ** (attempt - 1)))
+
@@ -0,0 +1,113 @@
+"""
+Declarative slot validation for the Lex code hook.
+
+An intent's slots are described as an ordered list of rules, e.g.
+
+    ('Cuisine', {'one_of': ['thai', 'korean'], 'message': '...'})
+    ('Location', {'one_of': ['new york'], 'or_pattern': r'\d{5}', 'message': '...'})
+    ('NumPeople', {'int_range': (1, 20), 'message': '...'})
+    ('DiningTime', {'time_window': (10, 22), 'message': '...', 'format_message': '...'})
+    ('PhoneNum', {'pattern': r'\d{10}', 'message': '...'})
+
+SlotSchema compiles them once, at import time, into frozenset lookups and
+precompiled regexes, and first_violation() walks the slots in a single pass.
+A slot that is unset (None) is never validated; the Lex model elicits it.
+"""
+import re
+
+# A 24-hour clock time: hours 00-23, minutes 00-59.
+TIME_FORMAT = re.compile(r'([01][0-9]|2[0-3]):([0-5][0-9])\Z')
+INTEGER = re.compile(r'[0-9]+\Z')
+
+
+def _one_of(rule):
+    # `or_pattern` also accepts values outside the list that match a regex.
+    allowed = frozenset(value.lower() for value in rule['one_of'])
+    pattern = re.compile(rule['or_pattern'] + r'\Z') if 'or_pattern' in rule else None
+    message = rule['message']
+
+    def check(value):
+        # An empty answer is left for Lex to re-elicit, like an unset slot.
+        if value and value.lower() not in allowed and (pattern is None or not pattern.match(value.strip())):
+            return message.format(value)
+    return check
+
+
+def _int_range(rule):
+    # Canonical spellings of every allowed number answer the common case with
+    # one set lookup; anything else ('04', '25', 'four') goes through the regex.
+    low, high = rule['int_range']
+    allowed = frozenset(str(number) for number in range(low, high + 1))
+    message = rule['message']
+
+    def check(value):
+        if value in allowed:
+            return None
+        if not INTEGER.match(value) or not low <= int(value) <= high:
+            return message.format(value)
+    return check
+
+
+def _time_window(rule):
+    # Every HH:MM inside the window is precomputed, so only rejected values need
+    # the regex to pick the right message.
+    earliest, latest = rule['time_window']
+    allowed = frozenset('{:02d}:{:02d}'.format(hour, minute)
+                        for hour in range(earliest, latest + 1) for minute in range(60))
+    message = rule['message']
+    format_message = rule.get('format_message', message)
+
+    def check(value):
+        if value in allowed:
+            return None
+        if TIME_FORMAT.match(value) is None:
+            return format_message.format(value)
+        return message.format(value)
+    return check
+
+
+def _pattern(rule):
+    pattern = re.compile(rule['pattern'] + r'\Z')
+    message = rule['message']
+
+    def check(value):
+        if not pattern.match(value):
+            return message.format(value)
+    return check
+
+
+VALIDATORS = {
+    'one_of': _one_of,
+    'int_range': _int_range,
+    'time_window': _time_window,
+    'pattern': _pattern,
+}
+
+
+class SlotSchema:
+    """
+    Compiled validators for one intent's slots, checked in declaration order.
+    Messages may use {} for the offending value.
+    """
+
+    def __init__(self, rules):
+        self._checks = []
+        for slot, rule in rules:
+            kinds = [kind for kind in VALIDATORS if kind in rule]
+            if len(kinds) != 1:
+                raise ValueError('Slot {} needs exactly one of {}'.format(slot, sorted(VALIDATORS)))
+            self._checks.append((slot, VALIDATORS[kinds[0]](rule)))
+
+    @property
+    def slots(self):
+        return [slot for slot, _ in self._checks]
+
+    def first_violation(self, slots):
+        """(slot name, message) for the first invalid slot, or None if all pass."""
+        for slot, check in self._checks:
+            value = slots.get(slot)
+            if value is not None:
+                message = check(value)
+                if message is not None:
+                    return slot, message
+        return None
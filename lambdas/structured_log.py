@@ -0,0 +1,154 @@
+"""
+JSON-lines logging shared by the lambdas.
+
+configure() installs a formatter on the root logger that writes one JSON
+object per record, tagged with the correlation ID of the request being
+handled. Messages keep the stdlib "%s" style, so arguments are only
+formatted for records that pass the level check; wrap costly arguments in
+lazy()/lazy_json() so even building them is skipped. Verbose payloads go
+through log_sampled(), which logs them at DEBUG, or at INFO for the
+LOG_SAMPLE_RATE share of requests, chosen by correlation ID so one request
+is sampled (or not) in every lambda it passes through.
+
+The correlation ID is created by lf0, passed to lf1 as a Lex request
+attribute and to lf2 as the CorrelationId SQS message attribute.
+"""
+import contextlib
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+import zlib
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 0.01))
+
+CORRELATION_ATTRIBUTE = 'CorrelationId'
+
+_context = threading.local()
+
+
+# --- Correlation IDs ---
+
+
+def new_correlation_id():
+    # 32 random hex digits, like uuid4().hex, without importing uuid at cold start.
+    return os.urandom(16).hex()
+
+
+def correlation_id():
+    """The correlation ID bound to this thread, or None."""
+    return getattr(_context, 'correlation_id', None)
+
+
+def set_correlation_id(value):
+    _context.correlation_id = value
+    _context.sampled = None
+
+
+@contextlib.contextmanager
+def correlation(value):
+    """Bind `value` as this thread's correlation ID for the duration of a block."""
+    previous = (correlation_id(), getattr(_context, 'sampled', None))
+    set_correlation_id(value)
+    try:
+        yield value
+    finally:
+        _context.correlation_id, _context.sampled = previous
+
+
+def correlated(func):
+    """Wrap a pipeline stage so its logs carry the request's correlation_id."""
+    @functools.wraps(func)
+    def wrapper(request):
+        with correlation(request.get('correlation_id')):
+            return func(request)
+    return wrapper
+
+
+def is_sampled(rate=None):
+    """Whether verbose payloads of the current request are logged at INFO."""
+    rate = LOG_SAMPLE_RATE if rate is None else rate
+    if rate >= 1:
+        return True
+    if rate <= 0:
+        return False
+    sampled = getattr(_context, 'sampled', None)
+    if sampled is None:
+        value = correlation_id()
+        bucket = zlib.crc32(value.encode('utf-8')) % 10000 if value else random.randrange(10000)
+        sampled = _context.sampled = bucket < rate * 10000
+    return sampled
+
+
+# --- Lazy arguments ---
+
+
+class lazy:
+    """Log argument whose text is only computed if the record is emitted."""
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self):
+        return str(self.func(*self.args))
+
+
+def lazy_json(value):
+    return lazy(_dumps, value)
+
+
+def _dumps(value):
+    return json.dumps(value, default=str, separators=(',', ':'))
+
+
+def log_sampled(logger, message, *args):
+    """Log a verbose payload at DEBUG, or at INFO if this request is sampled."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(message, *args)
+    elif logger.isEnabledFor(logging.INFO) and is_sampled():
+        logger.info(message, *args, extra={'sampled': True})
+
+
+# --- Output ---
+
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record):
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + '.%03dZ' % record.msecs,
+            'level': record.levelname,
+            'message': record.getMessage(),
+            'logger': record.name,
+        }
+        value = correlation_id()
+        if value is not None:
+            entry['correlation_id'] = value
+        request_id = getattr(record, 'aws_request_id', None)
+        if request_id:
+            entry['aws_request_id'] = request_id
+        if getattr(record, 'sampled', False):
+            entry['sampled'] = True
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return _dumps(entry)
+
+
+def configure(level=None):
+    """
+    Use JSON output on the root logger (the Lambda runtime's handler, or a
+    stderr handler when run locally) at LOG_LEVEL. Safe to call repeatedly.
+    """
+    root = logging.getLogger()
+    root.setLevel(level or LOG_LEVEL)
+    if not root.handlers:
+        root.addHandler(logging.StreamHandler())
+    for handler in root.handlers:
+        if not isinstance(handler.formatter, JsonFormatter):
+            handler.setFormatter(JsonFormatter())
+    return root
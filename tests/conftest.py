@@ -0,0 +1,54 @@
+"""
+Shared fixtures: the lambdas run against the local_aws stand-ins, never AWS.
+
+    python -m pytest -q
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'lambdas'))
+sys.path.insert(0, os.path.join(ROOT, 'Other'))
+
+import aws_clients
+import restaurant_store
+import structured_log
+from local_aws import FakeDynamoDB, FakeSearch, FakeSNS, FakeSQS, fixture_catalog
+from restaurant_search import INDEX, restaurant_document
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(restaurant_store, 'RETRY_BASE_DELAY', 0)
+
+
+@pytest.fixture(autouse=True)
+def no_correlation_id():
+    # Handlers bind an ID per invocation and leave it on the thread, as Lambda reuses it.
+    yield
+    structured_log.set_correlation_id(None)
+
+
+@pytest.fixture
+def catalog():
+    return fixture_catalog(per_cuisine=20)
+
+
+@pytest.fixture
+def services(catalog):
+    """Stand-ins loaded with `catalog` and registered for aws_clients, by service name."""
+    services = {
+        'dynamodb': FakeDynamoDB(),
+        'sqs': FakeSQS(),
+        'sns': FakeSNS(),
+        'search': FakeSearch(),
+    }
+    services['dynamodb'].Table(restaurant_store.TABLE_NAME).load(catalog)
+    services['search'].index_documents(INDEX, [restaurant_document(item) for item in catalog])
+    aws_clients.reset()
+    for name in ('dynamodb', 'sqs', 'sns'):
+        aws_clients.register(name, services[name])
+    yield services
+    aws_clients.reset()
@@ -0,0 +1,41 @@
+import threading
+
+import pytest
+
+import aws_clients
+
+
+@pytest.fixture
+def real_clients(monkeypatch):
+    pytest.importorskip('boto3')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    aws_clients.reset()
+    yield
+    aws_clients.reset()
+
+
+def test_clients_are_shared_and_resources_are_per_thread(real_clients):
+    resource = aws_clients.resource('dynamodb')
+    client = aws_clients.client('sqs')
+    other_thread = {}
+
+    def use():
+        other_thread['resource'] = aws_clients.resource('dynamodb')
+        other_thread['client'] = aws_clients.client('sqs')
+
+    thread = threading.Thread(target=use)
+    thread.start()
+    thread.join()
+
+    assert aws_clients.resource('dynamodb') is resource
+    assert aws_clients.client('sqs') is client
+    assert other_thread['client'] is client
+    assert other_thread['resource'] is not resource
+
+
+def test_registered_stand_ins_replace_clients_and_resources(services):
+    assert aws_clients.client('dynamodb') is services['dynamodb']
+    assert aws_clients.resource('dynamodb') is services['dynamodb']
+    assert aws_clients.queue_url('DiningBotQueue').endswith('/DiningBotQueue')
+    aws_clients.queue_url('DiningBotQueue')
+    assert services['sqs'].stats['get_queue_url'] == 1
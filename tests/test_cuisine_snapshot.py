@@ -0,0 +1,53 @@
+import os
+
+from cuisine_snapshot import CuisineSnapshot, SnapshotLoader, build_snapshot, dump_snapshot, finite_float
+
+
+def test_build_snapshot_is_versioned_by_content(catalog):
+    first = build_snapshot(catalog, built_at=1)
+    again = build_snapshot(list(reversed(catalog)), built_at=2)
+    changed = build_snapshot(catalog[1:], built_at=1)
+
+    assert first['version'] == again['version']
+    assert changed['version'] != first['version']
+    assert sorted(first['cuisines']) == sorted({item['Cuisine'] for item in catalog})
+
+
+def test_pick_is_repeatable_and_shaped_like_search_hits(catalog):
+    snapshot = CuisineSnapshot(build_snapshot(catalog))
+    names = {item['id']: item['Name'] for item in catalog}
+
+    picks = snapshot.pick('Italian', 5, seed=4)
+
+    assert len({pick['RestaurantID'] for pick in picks}) == 5
+    assert all(names[pick['RestaurantID']] == pick['Name'] for pick in picks)
+    assert snapshot.pick('italian', 5, seed=4) == picks
+    assert snapshot.pick('italian', 5, seed=5) != picks
+    assert snapshot.pick('french', 5, seed=4) == []
+    assert 'ITALIAN' in snapshot and 'french' not in snapshot
+
+
+def test_finite_float_rejects_unknown_values():
+    assert finite_float('40.7') == 40.7
+    assert [finite_float(value) for value in ('None', None, 'nan', 'inf', '')] == [None] * 5
+
+
+def test_loader_reloads_only_when_the_file_changes(tmp_path, catalog):
+    path = tmp_path / 'snapshot.json.gz'
+    path.write_bytes(dump_snapshot(build_snapshot(catalog)))
+    loader = SnapshotLoader(str(path), check_interval=0)
+
+    first = loader.get()
+    assert loader.get() is first
+
+    path.write_bytes(dump_snapshot(build_snapshot(catalog[1:])))
+    os.utime(path, ns=(0, 0))
+    assert loader.get().version != first.version
+
+
+def test_loader_hides_stale_and_unreadable_snapshots(tmp_path, catalog):
+    path = tmp_path / 'snapshot.json.gz'
+    path.write_bytes(dump_snapshot(build_snapshot(catalog, built_at=0)))
+
+    assert SnapshotLoader(str(path), max_age=3600).get() is None
+    assert SnapshotLoader(str(tmp_path / 'missing.json.gz')).get() is None
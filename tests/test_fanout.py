@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from fanout import Stage, StageTimeout, run_pipeline
+
+
+def test_outcomes_keep_input_order():
+    def slow_for_small(value):
+        time.sleep(0.01 * (5 - value))
+        return value
+
+    stages = [Stage('wait', slow_for_small, None), Stage('double', lambda value: value * 2, None)]
+
+    outcomes = run_pipeline(range(5), stages, concurrency=5)
+
+    assert [outcome.value for outcome in outcomes] == [0, 2, 4, 6, 8]
+    assert all(outcome.error is None for outcome in outcomes)
+
+
+def test_concurrency_is_bounded():
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+
+    def stage(value):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.005)
+        with lock:
+            running[0] -= 1
+        return value
+
+    run_pipeline(range(20), [Stage('a', stage, None), Stage('b', stage, None)], concurrency=3)
+
+    assert peak[0] == 3
+
+
+def test_none_ends_a_request_early():
+    calls = []
+    stages = [Stage('filter', lambda value: value if value % 2 else None, None),
+              Stage('record', lambda value: calls.append(value) or value, None)]
+
+    outcomes = run_pipeline(range(4), stages)
+
+    assert [outcome.value for outcome in outcomes] == [None, 1, None, 3]
+    assert sorted(calls) == [1, 3]
+
+
+def test_failures_name_their_stage():
+    def fail_on_two(value):
+        if value == 2:
+            raise ValueError('bad input')
+        return value
+
+    outcomes = run_pipeline(range(3), [Stage('ok', lambda value: value, None), Stage('check', fail_on_two, None)])
+
+    assert [outcome.stage for outcome in outcomes] == [None, None, 'check']
+    assert isinstance(outcomes[2].error, ValueError)
+
+
+def test_slow_stage_times_out_without_holding_up_the_others():
+    release = threading.Event()
+
+    def stuck_on_zero(value):
+        if value == 0:
+            release.wait(5)
+        return value
+
+    start = time.monotonic()
+    try:
+        outcomes = run_pipeline(range(4), [Stage('search', stuck_on_zero, 0.05)], concurrency=2)
+    finally:
+        release.set()
+
+    assert time.monotonic() - start < 1
+    assert isinstance(outcomes[0].error, StageTimeout)
+    assert outcomes[0].stage == 'search'
+    assert outcomes[0].elapsed == pytest.approx(0.05, abs=0.05)
+    assert [outcome.value for outcome in outcomes[1:]] == [1, 2, 3]
+
+
+def test_warm_invocations_reuse_the_worker_threads():
+    def thread_name(value):
+        time.sleep(0.002)
+        return threading.current_thread().name
+
+    stages = [Stage('name', thread_name, None)]
+    first = {outcome.value for outcome in run_pipeline(range(8), stages, concurrency=4)}
+    second = {outcome.value for outcome in run_pipeline(range(8), stages, concurrency=4)}
+
+    # Fresh pools for each call would have needed up to eight threads.
+    assert len(first | second) <= 4
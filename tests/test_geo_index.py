@@ -0,0 +1,72 @@
+import math
+import random
+
+import pytest
+
+from geo_index import NEIGHBORHOODS, resolve_location
+
+
+@pytest.mark.parametrize('text, point', [
+    ('40.75,-73.99', (40.75, -73.99)),
+    (' 40.7 , -74 ', (40.7, -74.0)),
+    ('Times  Square', NEIGHBORHOODS['times square']),
+    ('soho,', NEIGHBORHOODS['soho']),
+    ('10001', (40.7506, -73.9972)),
+])
+def test_resolve_location(text, point):
+    assert resolve_location(text, {'10001': [40.7506, -73.9972]}) == point
+
+
+@pytest.mark.parametrize('text', ['', None, 'New York', '10002', '91,0', '0,181'])
+def test_unresolved_locations(text):
+    assert resolve_location(text, {'10001': (40.7506, -73.9972)}) is None
+
+
+def brute_force_km(lat, lon, lats, lons):
+    distances = []
+    for other_lat, other_lon in zip(lats, lons):
+        if not (math.isfinite(other_lat) and math.isfinite(other_lon)):
+            distances.append(math.inf)
+            continue
+        a = math.sin(math.radians(other_lat - lat) / 2) ** 2 + math.cos(math.radians(lat)) * \
+            math.cos(math.radians(other_lat)) * math.sin(math.radians(other_lon - lon) / 2) ** 2
+        distances.append(2 * 6371.0088 * math.asin(math.sqrt(min(a, 1.0))))
+    return distances
+
+
+@pytest.fixture
+def points():
+    pytest.importorskip('numpy')
+    rng = random.Random(7)
+    lats = [40.55 + rng.random() * 0.35 for _ in range(2000)]
+    lons = [-74.10 + rng.random() * 0.35 for _ in range(2000)]
+    # Points without coordinates are skipped but keep their positions.
+    lats[3], lons[10] = float('nan'), float('inf')
+    return lats, lons
+
+
+@pytest.mark.parametrize('k, max_km', [(1, None), (10, None), (25, 1.0), (3000, None), (5, 0.0001)])
+def test_nearest_matches_brute_force(points, k, max_km):
+    from geo_index import GeoIndex
+
+    lats, lons = points
+    index = GeoIndex(lats, lons, cell_degrees=0.005)
+
+    for lat, lon in [(40.75, -73.99), (40.56, -74.09), (41.5, -73.0)]:
+        positions, distances = index.nearest(lat, lon, k, max_km=max_km)
+
+        expected = sorted((distance, position) for position, distance
+                          in enumerate(brute_force_km(lat, lon, lats, lons))
+                          if math.isfinite(distance) and (max_km is None or distance <= max_km))[:k]
+        assert positions.tolist() == [position for _, position in expected]
+        assert distances.tolist() == pytest.approx([distance for distance, _ in expected])
+
+
+def test_index_without_points():
+    pytest.importorskip('numpy')
+    from geo_index import GeoIndex
+
+    index = GeoIndex([], [])
+
+    assert len(index) == 0
+    assert index.nearest(40.75, -73.99, 5)[0].tolist() == []
@@ -0,0 +1,108 @@
+import pytest
+
+from history import KEY_NAME, TABLE_NAME, BloomFilter, HistoryStore, prefer_unseen
+from local_aws import FakeDynamoDB
+
+
+def ids(prefix, count):
+    return ['{}-{}'.format(prefix, i) for i in range(count)]
+
+
+def bloom(*groups):
+    bloom_filter = BloomFilter()
+    for group in groups:
+        for value in group:
+            bloom_filter.add(value)
+    return bloom_filter
+
+
+def test_added_ids_are_members():
+    bloom_filter = bloom(ids('a', 100))
+
+    assert all(value in bloom_filter for value in ids('a', 100))
+    assert sum(value in bloom_filter for value in ids('b', 1000)) < 10
+    assert len(bloom_filter) == 100
+
+
+def test_union_counts_shared_ids_once():
+    shared = ids('shared', 40)
+    first, second = bloom(shared, ids('a', 30)), bloom(shared, ids('b', 30))
+
+    merged = first.union(second)
+
+    assert all(value in merged for value in shared + ids('a', 30) + ids('b', 30))
+    assert merged.count == pytest.approx(100, abs=5)
+    assert bloom(ids('a', 100)).union(bloom(ids('b', 100))).count == pytest.approx(200, abs=10)
+    assert first.union(bloom()).count == 70
+
+
+def test_union_of_a_full_filter_sums_the_counts():
+    full = BloomFilter(bits=8, hashes=1, data=b'\xff', count=8)
+
+    assert full.union(BloomFilter(bits=8, hashes=1, count=3)).count == 11
+
+
+def test_union_needs_the_same_shape():
+    with pytest.raises(ValueError):
+        BloomFilter(bits=1024).union(BloomFilter(bits=2048))
+
+
+def test_prefer_unseen_tops_up_with_repeats():
+    items = ids('r', 6)
+
+    assert prefer_unseen(items, 3, {'r-0', 'r-2'}, key=str) == ['r-1', 'r-3', 'r-4']
+    assert prefer_unseen(items, 3, set(items[1:]), key=str) == ['r-0', 'r-1', 'r-2']
+    assert prefer_unseen(items, 3, None, key=str) == items[:3]
+
+
+def history_table():
+    dynamodb = FakeDynamoDB()
+    dynamodb.create_table(TableName=TABLE_NAME, KeySchema=[{'AttributeName': KEY_NAME, 'KeyType': 'HASH'}])
+    return dynamodb
+
+
+@pytest.fixture
+def store():
+    return HistoryStore(capacity=50, dynamodb=history_table())
+
+
+def test_histories_round_trip_through_the_table(store):
+    history = store.record(store.load('+12125550100'), ids('a', 5))
+    store.save_all([('+12125550100', history)])
+
+    loaded = store.load('+12125550100')
+
+    assert all(value in loaded for value in ids('a', 5))
+    assert loaded.count == 5
+    assert store.stats['new'] == 1
+
+
+def test_requests_of_one_phone_in_a_batch_are_merged(store):
+    store.save_all([('+12125550100', store.record(store.load('+12125550100'), ids('a', 10)))])
+    base = store.load('+12125550100')
+    first = store.record(BloomFilter(data=base.to_bytes(), count=base.count), ids('b', 5))
+    second = store.record(BloomFilter(data=base.to_bytes(), count=base.count), ids('c', 5))
+
+    store.save_all([('+12125550100', first), ('+12125550100', second)])
+
+    loaded = store.load('+12125550100')
+    assert all(value in loaded for value in ids('a', 10) + ids('b', 5) + ids('c', 5))
+    assert loaded.count == pytest.approx(20, abs=2)
+
+
+def test_full_histories_start_over(store):
+    history = store.record(store.load('+12125550100'), ids('a', 48))
+
+    history = store.record(history, ids('b', 5))
+
+    assert store.stats['rollovers'] == 1
+    assert history.count == 5
+    assert 'b-0' in history and 'a-0' not in history
+
+
+def test_histories_of_another_shape_are_reset(store):
+    store.save_all([('+12125550100', store.record(store.load('+12125550100'), ids('a', 5)))])
+
+    reshaped = HistoryStore(bits=1024, dynamodb=store._dynamodb).load('+12125550100')
+
+    assert reshaped.count == 0 and reshaped.bits == 1024
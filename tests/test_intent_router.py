@@ -0,0 +1,67 @@
+import sys
+
+import pytest
+
+from intent_router import IntentRouter, UnsupportedIntent, load_handler
+
+
+def request(intent_name):
+    return {'currentIntent': {'name': intent_name, 'slots': {}}, 'userId': 'u'}
+
+
+def test_dispatch_calls_the_registered_handler_and_times_it():
+    router = IntentRouter({'Greetings': lambda intent_request: 'hello'})
+
+    assert router.dispatch(request('Greetings')) == 'hello'
+    assert router.dispatch(request('Greetings')) == 'hello'
+    assert router.timings['Greetings']['calls'] == 2
+    assert 'Greetings' in router and 'ThankYou' not in router
+
+
+def test_string_handlers_are_imported_on_first_use(tmp_path, monkeypatch):
+    (tmp_path / 'lazy_handlers.py').write_text('def thanks(intent_request):\n    return "you are welcome"\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, 'lazy_handlers', raising=False)
+
+    router = IntentRouter({'ThankYou': 'lazy_handlers:thanks'})
+    assert 'lazy_handlers' not in sys.modules
+
+    assert router.dispatch(request('ThankYou')) == 'you are welcome'
+    assert 'lazy_handlers' in sys.modules
+
+
+def test_unknown_intents_go_to_the_fallback():
+    router = IntentRouter({}, fallback=lambda intent_request: 'fallback ' + intent_request['currentIntent']['name'])
+
+    assert router.dispatch(request('BookHotel')) == 'fallback BookHotel'
+
+
+def test_unknown_intent_without_fallback_is_unsupported():
+    with pytest.raises(UnsupportedIntent):
+        IntentRouter({}).dispatch(request('BookHotel'))
+
+
+def test_register_replaces_a_handler():
+    router = IntentRouter({'Greetings': lambda intent_request: 'hello'})
+    router.dispatch(request('Greetings'))
+
+    router.register('Greetings', lambda intent_request: 'hi again')
+
+    assert router.dispatch(request('Greetings')) == 'hi again'
+
+
+def test_handler_errors_still_count_the_turn():
+    def broken(intent_request):
+        raise RuntimeError('boom')
+
+    router = IntentRouter({'Greetings': broken})
+
+    with pytest.raises(RuntimeError):
+        router.dispatch(request('Greetings'))
+    assert router.timings['Greetings']['calls'] == 1
+
+
+def test_load_handler_needs_module_and_function():
+    assert load_handler('json:dumps')([1]) == '[1]'
+    with pytest.raises(ValueError):
+        load_handler('json')
@@ -0,0 +1,89 @@
+import hashlib
+import threading
+
+import pytest
+
+import aws_clients
+import lf0
+import lf1
+from local_aws import FakeLex
+
+
+class RecordingLex:
+    """Echoes every turn as '<userId>: <text>' and records the calls; `fail_on` texts raise."""
+
+    def __init__(self, fail_on=()):
+        self.calls = []
+        self.fail_on = set(fail_on)
+        self._lock = threading.Lock()
+
+    def post_text(self, botName, botAlias, userId, inputText, requestAttributes=None, **kwargs):
+        with self._lock:
+            self.calls.append((userId, inputText, requestAttributes['correlation_id']))
+        if inputText in self.fail_on:
+            raise RuntimeError('Lex is unavailable')
+        return {'message': '{}: {}'.format(userId, inputText)}
+
+
+@pytest.fixture
+def lex(services, monkeypatch):
+    monkeypatch.setattr(lf0, 'QUICK_REPLIES', None)
+    lex = RecordingLex(fail_on={'break'})
+    aws_clients.register('lex-runtime', lex)
+    return lex
+
+
+def event(*messages):
+    return {'messages': [{'type': 'unstructured', 'unstructured': dict({'text': text}, **({'id': id} if id else {}))}
+                         for id, text in messages]}
+
+
+def replies(response):
+    return [(message['unstructured']['id'], message['unstructured']['text']) for message in response['messages']]
+
+
+def test_every_message_gets_its_reply_in_order(lex):
+    response = lf0.lambda_handler(event(('alice', 'one'), ('bob', 'two'), ('alice', 'three')), None)
+
+    assert replies(response) == [('alice', 'alice: one'), ('bob', 'bob: two'), ('alice', 'alice: three')]
+    # One client's turns reach Lex in the order they were sent.
+    assert [text for user_id, text, _ in lex.calls if user_id == 'alice'] == ['one', 'three']
+
+
+def test_new_clients_get_an_id_and_bad_ids_are_hashed(lex):
+    response = lf0.lambda_handler(event((None, 'hi'), ('not a lex id!', 'yo')), None)
+
+    (new_id, _), (hashed_id, _) = replies(response)
+    assert lf0.LEX_USER_ID.match(new_id)
+    assert hashed_id == hashlib.sha1(b'not a lex id!').hexdigest()
+
+
+def test_failures_and_blank_messages_only_affect_their_reply(lex):
+    response = lf0.lambda_handler(event(('alice', 'break'), ('bob', '   '), ('carol', 'fine')), None)
+
+    assert [text for _, text in replies(response)] == [lf0.FALLBACK_REPLY, lf0.FALLBACK_REPLY, 'carol: fine']
+    assert sorted(text for _, text, _ in lex.calls) == ['break', 'fine']
+
+
+def test_each_message_has_its_own_correlation_id(lex):
+    class Context:
+        aws_request_id = 'req'
+
+    lf0.lambda_handler(event(('alice', 'one'), ('bob', 'two')), Context())
+    lf0.lambda_handler(event(('alice', 'three')), Context())
+
+    assert sorted(correlation_id for _, _, correlation_id in lex.calls) == ['req', 'req-0', 'req-1']
+
+
+def test_clients_keep_separate_lex_sessions(services, monkeypatch):
+    monkeypatch.setattr(lf0, 'QUICK_REPLIES', None)
+    aws_clients.register('lex-runtime', FakeLex(lf1.lambda_handler))
+
+    def turn(*messages):
+        return [text for _, text in replies(lf0.lambda_handler(event(*messages), None))]
+
+    turn(('alice', 'I need restaurant suggestions'), ('bob', 'I need restaurant suggestions'))
+    alice, bob = turn(('alice', 'New York'), ('bob', 'Boston'))
+
+    assert alice == 'What cuisine would you like to try?'
+    assert 'Boston' in bob
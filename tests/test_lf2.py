@@ -0,0 +1,235 @@
+import json
+
+import pytest
+
+import aws_clients
+import lf2
+import metrics
+from cuisine_snapshot import CuisineSnapshot, build_snapshot
+from history import KEY_NAME, TABLE_NAME, HistoryStore
+from local_aws import FIXTURE_CUISINES, FakeDynamoDB, StaticSnapshot, fixture_catalog
+from notifier import Notifier
+from record_cache import RecordCache
+from restaurant_search import INDEX
+
+CUISINE = FIXTURE_CUISINES[0]
+
+
+@pytest.fixture
+def env(services, monkeypatch):
+    """lf2 wired to the stand-ins: uniform search picks, no snapshot or history, sequential sends."""
+    monkeypatch.setattr(lf2, 'SEARCH_CLIENT', services['search'])
+    monkeypatch.setattr(lf2, 'SNAPSHOT', None)
+    monkeypatch.setattr(lf2, 'NEAREST_ENABLED', False)
+    monkeypatch.setattr(lf2, 'HISTORY', None)
+    monkeypatch.setattr(lf2, 'RANKING', 'uniform')
+    monkeypatch.setattr(lf2, 'RESTAURANT_CACHE', RecordCache())
+    monkeypatch.setattr(lf2, 'NOTIFIER', Notifier(services['sns'], concurrency=1, max_attempts=1))
+    return services
+
+
+def request_body(phone='+12125550100', **fields):
+    return json.dumps(dict({'location': 'new york', 'cuisine': CUISINE, 'people': '2', 'time': '19:30',
+                            'phone': phone}, **fields))
+
+
+def record(message_id, phone='+12125550100', **fields):
+    return {'messageId': message_id, 'receiptHandle': message_id + '#1',
+            'body': request_body(phone, **fields), 'messageAttributes': {}}
+
+
+def texted(services):
+    return [message['Message'] for message in services['sns'].sent]
+
+
+def test_suggestions_come_from_search_without_dynamodb_reads(env):
+    assert lf2.process_records([record('m-1')]) == []
+
+    [message] = texted(env)
+    assert message.count(', located at ') == lf2.SUGGESTION_COUNT
+    assert env['search'].stats['search'] == 1
+    assert env['dynamodb'].stats['batch_get_item'] == 0
+    assert env['dynamodb'].stats['scan'] == 0
+
+
+def test_stale_search_documents_are_completed_in_one_batch(env):
+    documents = env['search'].documents(INDEX)
+    for document in documents.values():
+        if document['Cuisine'] == CUISINE:
+            del document['Name'], document['Address']
+
+    lf2.process_records([record('m-1')])
+
+    [message] = texted(env)
+    assert message.count(', located at ') == lf2.SUGGESTION_COUNT
+    assert env['dynamodb'].stats['batch_get_item'] == 1
+    assert env['dynamodb'].stats['items_read'] == lf2.SUGGESTION_COUNT
+
+
+def test_dynamodb_handle_is_only_built_for_stale_documents(env, monkeypatch):
+    requested = []
+    resource = aws_clients.resource
+    monkeypatch.setattr(aws_clients, 'resource', lambda name: requested.append(name) or resource(name))
+
+    lf2.process_records([record('m-1')])
+    assert requested == []
+
+    for document in env['search'].documents(INDEX).values():
+        document.pop('Name')
+    lf2.process_records([record('m-2')])
+    assert requested == ['dynamodb']
+
+
+def test_dynamodb_stage_is_only_recorded_when_the_table_is_read(env, monkeypatch):
+    sink = metrics.LocalSink()
+    monkeypatch.setattr(metrics, '_sink', sink)
+
+    lf2.process_records([record('m-1')])
+    assert 'dynamodb' not in sink.summary()
+
+    for document in env['search'].documents(INDEX).values():
+        document.pop('Name')
+    lf2.process_records([record('m-2')])
+    assert sink.summary()['dynamodb']['count'] == 1
+    assert sink.summary()['dynamodb']['results'] == lf2.SUGGESTION_COUNT
+
+
+class FailingSearch:
+    """Search that is down for Thai restaurants only."""
+
+    def __init__(self, search):
+        self._search = search
+
+    def search(self, index, body):
+        if 'thai' in json.dumps(body['query']):
+            raise ConnectionError('search is down')
+        return self._search.search(index, body)
+
+
+def test_failed_stage_fails_only_its_records(env, monkeypatch):
+    monkeypatch.setattr(lf2, 'SEARCH_CLIENT', FailingSearch(env['search']))
+
+    response = lf2.handle_event({'Records': [record('italian'), record('thai', cuisine='thai')]})
+
+    assert response == {'batchItemFailures': [{'itemIdentifier': 'thai'}]}
+    assert len(texted(env)) == 1
+
+
+def test_only_retryable_failures_are_reported(env):
+    env['sns'].throttle_every = 2
+    records = [
+        record('sent'),
+        record('throttled'),
+        record('bad-phone', phone='2125550100'),
+        {'messageId': 'malformed', 'body': '{not json', 'messageAttributes': {}},
+        {'messageId': 'no-cuisine', 'body': json.dumps({'phone': '+12125550100'}), 'messageAttributes': {}},
+    ]
+
+    response = lf2.handle_event({'Records': records})
+
+    # Throttling is worth a redelivery; a rejected phone or a bad body never succeeds.
+    assert response == {'batchItemFailures': [{'itemIdentifier': 'throttled'}]}
+    assert len(texted(env)) == 1
+
+
+def test_polling_deletes_only_handled_messages(env, monkeypatch):
+    monkeypatch.setattr(lf2, 'SEARCH_CLIENT', FailingSearch(env['search']))
+    sqs = env['sqs']
+    url = aws_clients.queue_url(lf2.QUEUE_NAME)
+    for cuisine in ('italian', 'thai', 'korean'):
+        sqs.send_message(QueueUrl=url, MessageBody=request_body(cuisine=cuisine))
+    sqs.send_message(QueueUrl=url, MessageBody='{not json')
+
+    response = lf2.handle_event({})
+
+    # The malformed message can never succeed, so it is acknowledged too.
+    assert json.loads(response['body']) == {'processed': 3, 'failed': 1}
+    assert sqs.pending(url) == 1
+    assert sqs.stats['receive_message'] == 1
+    assert sqs.stats['delete_message_batch'] == 1
+    assert len(texted(env)) == 2
+
+
+def test_empty_queue_returns_nothing(env):
+    assert lf2.handle_event({}) is None
+
+
+def test_redelivered_message_gets_the_same_suggestions(env):
+    lf2.process_records([record('m-1')])
+    lf2.process_records([record('m-1')])
+    lf2.process_records([record('m-2')])
+
+    first, redelivered, new_request = texted(env)
+    assert redelivered == first
+    # The same details in a new message are a new request, with new picks.
+    assert new_request != first
+
+
+def test_snapshot_answers_without_search_or_dynamodb(env, catalog, monkeypatch):
+    monkeypatch.setattr(lf2, 'SNAPSHOT', StaticSnapshot(CuisineSnapshot(build_snapshot(catalog))))
+
+    lf2.process_records([record('m-1'), record('m-1'), record('m-2')])
+
+    first, redelivered, new_request = texted(env)
+    assert first.count(', located at ') == lf2.SUGGESTION_COUNT
+    assert redelivered == first and new_request != first
+    assert env['search'].stats['search'] == 0
+    assert env['dynamodb'].stats['batch_get_item'] == 0
+
+
+def test_cuisines_missing_from_the_snapshot_fall_back_to_search(env, monkeypatch):
+    catalog = [item for item in fixture_catalog(per_cuisine=5) if item['Cuisine'] != CUISINE]
+    monkeypatch.setattr(lf2, 'SNAPSHOT', StaticSnapshot(CuisineSnapshot(build_snapshot(catalog))))
+
+    lf2.process_records([record('m-1')])
+
+    assert len(texted(env)) == 1
+    assert env['search'].stats['search'] == 1
+
+
+def test_neighborhoods_get_the_nearest_restaurants(env, catalog, monkeypatch):
+    pytest.importorskip('numpy')
+    snapshot = CuisineSnapshot(build_snapshot(catalog))
+    monkeypatch.setattr(lf2, 'SNAPSHOT', StaticSnapshot(snapshot))
+    monkeypatch.setattr(lf2, 'NEAREST_ENABLED', True)
+
+    lf2.process_records([record('m-1', location='Times Square'), record('m-2', location='40.75,-73.95')])
+
+    nearest_times_square, nearest_point = texted(env)
+    for message, (lat, lon) in ((nearest_times_square, (40.7580, -73.9855)), (nearest_point, (40.75, -73.95))):
+        names = [restaurant['Name'] for restaurant in snapshot.nearest(CUISINE, lat, lon, lf2.SUGGESTION_COUNT)]
+        positions = [message.index(name + ', located at ') for name in names]
+        assert positions == sorted(positions)
+    assert env['search'].stats['search'] == 0
+
+
+def test_weighted_ranking_draws_from_a_wider_search(env, monkeypatch):
+    pytest.importorskip('numpy')
+    monkeypatch.setattr(lf2, 'RANKING', 'weighted')
+    monkeypatch.setattr(lf2, 'RANKING_CANDIDATES', 15)
+    searches = []
+    search = env['search'].search
+    monkeypatch.setattr(env['search'], 'search', lambda index, body: searches.append(body) or search(index, body))
+
+    lf2.process_records([record('m-1'), record('m-1')])
+
+    first, redelivered = texted(env)
+    assert first.count(', located at ') == lf2.SUGGESTION_COUNT
+    assert redelivered == first
+    assert [body['size'] for body in searches] == [15, 15]
+    assert 'ReviewCount' in searches[0]['_source']
+
+
+def test_history_keeps_repeat_requests_from_repeating_restaurants(env, monkeypatch):
+    dynamodb = FakeDynamoDB()
+    dynamodb.create_table(TableName=TABLE_NAME, KeySchema=[{'AttributeName': KEY_NAME, 'KeyType': 'HASH'}])
+    monkeypatch.setattr(lf2, 'HISTORY', HistoryStore(dynamodb=dynamodb))
+
+    for i in range(3):
+        lf2.process_records([record('m-{}'.format(i))])
+
+    suggested = [line.split(', located at ')[0] for message in texted(env)
+                 for line in message.split('\n') if ', located at ' in line]
+    assert len(suggested) == 3 * lf2.SUGGESTION_COUNT
+    assert len(set(suggested)) == len(suggested)
+    assert dynamodb.stats['get_item'] == 3
@@ -0,0 +1,62 @@
+import pytest
+
+pytest.importorskip('boto3')
+
+import lf3
+from local_aws import FakeSearch
+from restaurant_search import INDEX
+
+
+def stream_record(event_name, sequence_number, restaurant_id, rating='4.5', image=True):
+    change = {'Keys': {'id': {'S': restaurant_id}}, 'SequenceNumber': str(sequence_number)}
+    if image and event_name != 'REMOVE':
+        change['NewImage'] = {'id': {'S': restaurant_id}, 'Cuisine': {'S': 'thai'}, 'Name': {'S': 'Thai Place'},
+                              'Address': {'S': '1 Broadway'}, 'Rating': {'N': rating},
+                              'Number of Reviews': {'N': '12'}, 'Latitude': {'S': 'None'}}
+    return {'eventName': event_name, 'dynamodb': change}
+
+
+class RejectingItems:
+    """Passes _bulk requests on, but reports the given ids as rejected with a 400."""
+
+    def __init__(self, search, rejected_ids):
+        self.search = search
+        self.rejected_ids = set(rejected_ids)
+
+    def bulk(self, payload):
+        response = self.search.bulk(payload)
+        for item in response['items']:
+            outcome = next(iter(item.values()))
+            if outcome['_id'] in self.rejected_ids:
+                outcome.update(status=400, error={'type': 'mapper_parsing_exception'})
+        return response
+
+
+def test_stream_changes_are_applied_in_one_bulk_request():
+    search = FakeSearch()
+    search.index_documents(INDEX, [{'RestaurantID': 'gone', 'Cuisine': 'thai'}])
+    records = [stream_record('INSERT', 1, 'new'), stream_record('MODIFY', 2, 'changed', rating='3.0'),
+               stream_record('REMOVE', 3, 'gone'), stream_record('REMOVE', 4, 'never-indexed')]
+
+    assert lf3.apply_stream_records(records, client=search) == []
+
+    documents = search.documents(INDEX)
+    assert sorted(documents) == ['changed', 'new']
+    assert documents['changed']['Rating'] == 3.0
+    assert documents['new']['ReviewCount'] == 12
+    assert 'Coordinates' not in documents['new']
+    assert search.stats['bulk'] == 1
+
+
+def test_records_without_a_new_image_are_skipped():
+    search = FakeSearch()
+
+    assert lf3.apply_stream_records([stream_record('MODIFY', 1, 'a', image=False)], client=search) == []
+    assert search.stats['bulk'] == 0
+
+
+def test_handler_retries_from_the_first_failed_record(monkeypatch):
+    monkeypatch.setattr(lf3, 'SEARCH_CLIENT', RejectingItems(FakeSearch(), ['b', 'c']))
+    records = [stream_record('INSERT', 10, 'a'), stream_record('INSERT', 11, 'b'), stream_record('INSERT', 12, 'c')]
+
+    assert lf3.lambda_handler({'Records': records}, None) == {'batchItemFailures': [{'itemIdentifier': '11'}]}
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    sink = metrics.LocalSink()
+    monkeypatch.setattr(metrics, '_sink', sink)
+    return sink
+
+
+def test_timed_records_duration_results_and_errors(sink):
+    with metrics.timed('search') as timer:
+        timer.results = 5
+    with pytest.raises(ValueError):
+        with metrics.timed('search'):
+            raise ValueError
+
+    summary = sink.summary()['search']
+    assert (summary['count'], summary['results'], summary['errors']) == (2, 5, 1)
+
+
+def test_timed_decorator(sink):
+    @metrics.timed('validate')
+    def validate(value):
+        return value
+
+    assert validate(3) == 3
+    assert validate.__wrapped__(4) == 4
+    assert sink.summary()['validate']['count'] == 1
+
+
+def test_emf_documents_are_split_at_100_values():
+    lines = []
+    sink = metrics.EmfSink(namespace='Test', function='lf2', write=lines.append)
+    for i in range(150):
+        sink.record('sns', i, None, False)
+
+    sink.flush()
+    sink.flush()
+
+    documents = [json.loads(line) for line in lines]
+    assert [len(document['Duration']) for document in documents] == [100, 50]
+    assert 'Results' not in documents[0]
+    assert documents[0]['Stage'] == 'sns' and documents[0]['Function'] == 'lf2'
+    assert documents[0]['_aws']['CloudWatchMetrics'][0]['Namespace'] == 'Test'
+
+
+def test_percentile_uses_nearest_rank():
+    assert metrics.percentile([1, 2, 3, 4], 0.5) == 2
+    assert metrics.percentile([1, 2, 3, 4], 0.99) == 4
+    assert metrics.percentile([], 0.5) is None
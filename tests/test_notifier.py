@@ -0,0 +1,56 @@
+import json
+
+import aws_clients
+from local_aws import FakeSNS, FakeSQS
+from notifier import Notification, Notifier, is_retryable
+
+
+def notifications(*phones):
+    return [Notification(phone, 'message {}'.format(i), 'c-{}'.format(i)) for i, phone in enumerate(phones)]
+
+
+def test_throttled_sends_are_retried():
+    sns = FakeSNS(throttle_every=2)
+
+    deliveries = Notifier(sns, base_delay=0).send_all(notifications('+12125550100', '+12125550101'))
+
+    assert [delivery.error for delivery in deliveries] == [None, None]
+    assert [delivery.attempts for delivery in deliveries] == [1, 2]
+    assert sns.stats['throttled'] == 1
+    assert len(sns.sent) == 2
+
+
+def test_rejected_phone_is_not_retried():
+    sns = FakeSNS()
+
+    [delivery] = Notifier(sns, base_delay=0).send_all(notifications('2125550100'))
+
+    assert (delivery.attempts, delivery.dead_lettered) == (1, False)
+    assert not is_retryable(delivery.error)
+    assert sns.sent == []
+
+
+def test_deliveries_keep_the_input_order():
+    phones = ['+1212555{:04d}'.format(i) for i in range(20)]
+
+    deliveries = Notifier(FakeSNS(), concurrency=5).send_all(notifications(*phones))
+
+    assert [delivery.notification.phone for delivery in deliveries] == phones
+    assert all(delivery.message_id for delivery in deliveries)
+
+
+def test_undeliverable_messages_go_to_the_dead_letter_queue():
+    sqs = FakeSQS()
+    aws_clients.reset()
+    try:
+        notifier = Notifier(FakeSNS(throttle_every=1), max_attempts=2, base_delay=0,
+                            dead_letter_queue='SmsDeadLetters', sqs=sqs)
+        [delivery] = notifier.send_all(notifications('+12125550100'))
+        url = aws_clients.queue_url('SmsDeadLetters', sqs=sqs)
+    finally:
+        aws_clients.reset()
+
+    assert (delivery.attempts, delivery.dead_lettered) == (2, True)
+    [message] = sqs.receive_message(QueueUrl=url)['Messages']
+    assert json.loads(message['Body'])['error'] == 'Throttling'
+    assert notifier.stats['dead_lettered'] == 1
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+import aws_clients
+import lf0
+import lf1
+from quick_replies import DEFAULT_REPLIES, QuickReplies, normalize
+
+
+@pytest.mark.parametrize('text', ['Hi', 'hi!', '  HELLO   there ', 'Thank you.', "thank-you"])
+def test_listed_phrases_match_after_normalizing(text):
+    assert QuickReplies().match(text) is not None
+
+
+@pytest.mark.parametrize('text', ['hi, I need a restaurant', 'thanks for nothing', 'hello world', ''])
+def test_anything_else_goes_to_lex(text):
+    assert QuickReplies().match(text) is None
+
+
+def test_replies_are_the_same_as_lf1():
+    for intent_name in ('Greetings', 'ThankYou'):
+        event = {'currentIntent': {'name': intent_name, 'slots': {}}, 'sessionAttributes': {},
+                 'invocationSource': 'FulfillmentCodeHook', 'bot': {'name': 'bot'}, 'userId': 'u'}
+        assert lf1.dispatch(event)['dialogAction']['message']['content'] == DEFAULT_REPLIES[intent_name]['reply']
+
+
+def test_normalize():
+    assert normalize("  Don't   STOP, me-now!! ") == "don't stop me now"
+
+
+def test_a_phrase_cannot_belong_to_two_intents():
+    with pytest.raises(ValueError):
+        QuickReplies({'A': {'reply': 'a', 'phrases': ['Hi']}, 'B': {'reply': 'b', 'phrases': ['hi!']}})
+
+
+def test_config_from_json_text_or_a_path(tmp_path):
+    config = {'Bye': {'reply': 'See you!', 'phrases': ['bye', 'good bye']}}
+    path = tmp_path / 'replies.json'
+    path.write_text(json.dumps(config))
+
+    for value in (json.dumps(config), str(path)):
+        replies = QuickReplies.from_config(value)
+        assert len(replies) == 2
+        assert replies.match('Good-bye') == ('Bye', 'See you!')
+        assert replies.match('hi') is None
+    assert len(QuickReplies.from_config('')) == len(QuickReplies())
+
+
+def test_snapshot_counts_the_lex_calls_saved():
+    replies = QuickReplies()
+    for text in ('hi', 'thanks', 'thx', 'book a table'):
+        replies.match(text)
+
+    snapshot = replies.snapshot()
+    assert snapshot['lex_calls_saved'] == 3
+    assert snapshot['hits.ThankYou'] == 2
+    assert snapshot['hit_ratio'] == 0.75
+
+
+class CountingLex:
+    def __init__(self):
+        self.texts = []
+
+    def post_text(self, inputText, **kwargs):
+        self.texts.append(inputText)
+        return {'message': 'from lex'}
+
+
+def test_lf0_only_calls_lex_for_unlisted_turns(services, monkeypatch):
+    monkeypatch.setattr(lf0, 'QUICK_REPLIES', QuickReplies())
+    lex = CountingLex()
+    aws_clients.register('lex-runtime', lex)
+    event = {'messages': [{'type': 'unstructured', 'unstructured': {'id': 'alice', 'text': text}}
+                          for text in ('Hello!', 'I need suggestions', 'thanks')]}
+
+    response = lf0.lambda_handler(event, None)
+
+    assert [message['unstructured']['text'] for message in response['messages']] == [
+        DEFAULT_REPLIES['Greetings']['reply'], 'from lex', DEFAULT_REPLIES['ThankYou']['reply']]
+    assert lex.texts == ['I need suggestions']
@@ -0,0 +1,54 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from cuisine_snapshot import CuisineSnapshot, build_snapshot
+from local_aws import FIXTURE_CUISINES
+from ranking import Ranker, bayesian_scores, rank_documents
+
+CUISINE = FIXTURE_CUISINES[0]
+
+
+def test_bayesian_scores_trust_ratings_with_more_reviews():
+    scores = bayesian_scores([5.0, 4.5, 3.0], [3, 2000, 2000])
+
+    assert scores[1] > scores[0] > scores[2]
+
+
+def test_zero_temperature_returns_best_scores_first():
+    ranker = Ranker([3.0, 4.5, 5.0, 4.0], [100, 100, 100, 100], temperature=0)
+
+    assert ranker.sample(3).tolist() == [2, 1, 3]
+
+
+def test_draws_are_distinct_and_repeatable_per_seed():
+    ranker = Ranker([1 + i % 9 / 2 for i in range(40)], [i * 10 for i in range(40)])
+
+    picks = ranker.sample(10, seed=7).tolist()
+
+    assert len(set(picks)) == 10
+    assert ranker.sample(10, seed=7).tolist() == picks
+    assert ranker.sample(10, seed=8).tolist() != picks
+
+
+def test_rank_documents_prefers_well_reviewed_restaurants():
+    documents = [{'RestaurantID': 'good', 'Rating': 4.5, 'ReviewCount': 2000}] + \
+                [{'RestaurantID': 'poor-{}'.format(i), 'Rating': 2.0, 'ReviewCount': 2000} for i in range(9)]
+
+    firsts = [rank_documents(documents, 1, seed)[0]['RestaurantID'] for seed in range(200)]
+
+    # At a temperature of 0.5, 4.5 stars weigh e^5 (~148) times 2.0: 'good' leads ~94% of draws.
+    assert firsts.count('good') > 150
+
+
+def test_snapshot_rank_uses_review_counts(catalog):
+    snapshot = CuisineSnapshot(build_snapshot(catalog))
+    items = sorted((item for item in catalog if item['Cuisine'] == CUISINE), key=lambda item: item['id'])
+    ratings = [item['Rating'] for item in items]
+    scores = bayesian_scores(ratings, [item['Number of Reviews'] for item in items])
+    best = [items[i]['id'] for i in np.argsort(-scores, kind='stable')[:5]]
+
+    # Review counts break the ties between equal ratings.
+    assert len(set(scores.tolist())) > len(set(ratings))
+    assert [row['RestaurantID'] for row in snapshot.rank(CUISINE, 5, seed=1, temperature=0)] == best
+    assert snapshot.rank(CUISINE, 5, seed=3) == snapshot.rank(CUISINE, 5, seed=3)
@@ -0,0 +1,32 @@
+from record_cache import RecordCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = RecordCache(max_entries=2)
+    cache.store({'a': 1, 'b': 2})
+    cache.lookup(['a'])
+    cache.store({'c': 3})
+
+    assert cache.lookup(['a', 'b', 'c']) == ({'a': 1, 'c': 3}, ['b'])
+    assert cache.stats['evictions'] == 1
+
+
+def test_entries_expire_after_their_ttl():
+    clock = Clock()
+    cache = RecordCache(ttl=10, negative_ttl=5, clock=clock)
+    cache.store({'a': 1}, missing_keys=['gone'])
+
+    clock.now = 4
+    assert cache.lookup(['a', 'gone']) == ({'a': 1}, [])
+    clock.now = 6
+    assert cache.lookup(['a', 'gone']) == ({'a': 1}, ['gone'])
+    clock.now = 11
+    assert cache.lookup(['a']) == ({}, ['a'])
@@ -0,0 +1,87 @@
+import urllib.error
+
+import pytest
+
+from local_aws import FakeSearch
+from restaurant_search import INDEX, bulk_write, index_action, random_restaurants, restaurant_document
+
+FIELDS = ('RestaurantID', 'Cuisine', 'Name')
+
+
+def test_random_restaurants_are_repeatable_per_seed(services):
+    search = services['search']
+
+    first = random_restaurants(search, 'Thai', 5, 11, FIELDS)
+
+    assert len({document['RestaurantID'] for document in first}) == 5
+    assert all(document['Cuisine'] == 'thai' for document in first)
+    assert set(first[0]) == set(FIELDS)
+    assert random_restaurants(search, 'thai', 5, 11, FIELDS) == first
+    assert random_restaurants(search, 'thai', 5, 12, FIELDS) != first
+    # One query per pick, returning only the documents asked for.
+    assert search.stats['search'] == 3
+    assert search.stats['documents_returned'] == 15
+
+
+def test_random_restaurants_returns_what_exists(services, catalog):
+    per_cuisine = sum(item['Cuisine'] == 'thai' for item in catalog)
+
+    assert len(random_restaurants(services['search'], 'thai', per_cuisine + 10, 1, FIELDS)) == per_cuisine
+    assert random_restaurants(services['search'], 'french', 5, 1, FIELDS, index=INDEX) == []
+
+
+class RejectingBulk:
+    """Answers the first `rejections` _bulk requests with HTTP `status`, then passes them on."""
+
+    def __init__(self, search, status, rejections):
+        self.search = search
+        self.status = status
+        self.rejections = rejections
+        self.calls = 0
+
+    def bulk(self, payload):
+        self.calls += 1
+        if self.calls <= self.rejections:
+            raise urllib.error.HTTPError('http://search.local/_bulk', self.status, 'rejected', {}, None)
+        return self.search.bulk(payload)
+
+
+def actions(catalog):
+    return [index_action(restaurant_document(item)) for item in catalog[:5]]
+
+
+def test_bulk_write_resends_only_rejected_items(catalog):
+    search = FakeSearch(reject_bulk_items=2)
+
+    succeeded, failed = bulk_write(search, actions(catalog), backoff=0)
+
+    assert (succeeded, failed) == (5, [])
+    assert search.stats['bulk'] == 2
+    assert len(search.documents(INDEX)) == 5
+
+
+def test_bulk_write_retries_a_throttled_request(catalog):
+    search = FakeSearch()
+    client = RejectingBulk(search, 429, rejections=2)
+
+    assert bulk_write(client, actions(catalog), backoff=0) == (5, [])
+    assert client.calls == 3
+    assert len(search.documents(INDEX)) == 5
+
+
+def test_bulk_write_reports_items_of_a_request_that_keeps_failing(catalog):
+    client = RejectingBulk(FakeSearch(), 503, rejections=10)
+
+    succeeded, failed = bulk_write(client, actions(catalog), max_retries=2, backoff=0)
+
+    assert succeeded == 0
+    assert [error for _, error in failed] == ['HTTP 503'] * 5
+    assert client.calls == 3
+
+
+def test_bulk_write_does_not_retry_a_bad_request(catalog):
+    client = RejectingBulk(FakeSearch(), 400, rejections=1)
+
+    with pytest.raises(urllib.error.HTTPError):
+        bulk_write(client, actions(catalog), backoff=0)
+    assert client.calls == 1
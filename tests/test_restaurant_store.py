@@ -0,0 +1,74 @@
+from local_aws import FakeDynamoDB
+from record_cache import RecordCache
+from restaurant_store import TABLE_NAME, fill_display_fields, get_restaurants
+
+
+def test_get_restaurants_keeps_order_across_unprocessed_keys(catalog):
+    dynamodb = FakeDynamoDB(max_batch_get=3)
+    dynamodb.Table(TABLE_NAME).load(catalog)
+    ids = [item['id'] for item in reversed(catalog[:10])]
+
+    items = get_restaurants(ids, dynamodb)
+
+    assert [item['id'] for item in items] == ids
+    # 10 keys served 3 at a time: the first call plus three retries of the rest.
+    assert dynamodb.stats['batch_get_item'] == 4
+    assert dynamodb.stats['items_read'] == 10
+    assert dynamodb.stats['scan'] == 0
+
+
+def test_get_restaurants_skips_missing_and_duplicate_ids(services, catalog):
+    dynamodb = services['dynamodb']
+    first, second = catalog[0]['id'], catalog[1]['id']
+
+    items = get_restaurants([second, 'no-such-id', first, second], dynamodb)
+
+    assert [item['id'] for item in items] == [second, first]
+    assert dynamodb.stats['batch_get_item'] == 1
+    assert dynamodb.stats['items_read'] == 2
+
+
+def test_get_restaurants_splits_requests_of_more_than_100_keys():
+    dynamodb = FakeDynamoDB()
+    dynamodb.Table(TABLE_NAME).load({'id': 'r{:03d}'.format(i)} for i in range(250))
+    ids = ['r{:03d}'.format(i) for i in range(250)]
+
+    assert [item['id'] for item in get_restaurants(ids, dynamodb)] == ids
+    assert dynamodb.stats['batch_get_item'] == 3
+    assert dynamodb.stats['items_read'] == 250
+
+
+def test_get_restaurants_reads_only_what_the_cache_misses(services, catalog):
+    dynamodb = services['dynamodb']
+    cache = RecordCache(negative_ttl=60)
+    ids = [item['id'] for item in catalog[:5]]
+
+    get_restaurants(ids[:3] + ['no-such-id'], dynamodb, cache=cache)
+    items = get_restaurants(ids + ['no-such-id'], dynamodb, cache=cache)
+
+    assert [item['id'] for item in items] == ids
+    assert dynamodb.stats['batch_get_item'] == 2
+    # The second call only reads the two ids it has not seen; the missing one is remembered.
+    assert dynamodb.stats['items_read'] == 5
+
+
+def test_fill_display_fields_reads_stale_documents_only(services, catalog):
+    dynamodb = services['dynamodb']
+    documents = [{'RestaurantID': item['id'], 'Name': item['Name'], 'Address': item['Address']}
+                 for item in catalog[:4]]
+    documents[1] = {'RestaurantID': catalog[1]['id']}
+    documents[3] = {'RestaurantID': 'no-such-id'}
+
+    filled = fill_display_fields(documents, dynamodb)
+
+    assert [document['RestaurantID'] for document in filled] == [item['id'] for item in catalog[:3]]
+    assert filled[1]['Name'] == catalog[1]['Name']
+    assert dynamodb.stats['batch_get_item'] == 1
+    assert dynamodb.stats['items_read'] == 1
+
+
+def test_fill_display_fields_without_dynamodb_drops_stale_documents(catalog):
+    documents = [{'RestaurantID': 'stale'},
+                 {'RestaurantID': catalog[0]['id'], 'Name': catalog[0]['Name'], 'Address': catalog[0]['Address']}]
+
+    assert fill_display_fields(documents, None) == documents[1:]
@@ -0,0 +1,56 @@
+import pytest
+
+import lf1
+from slot_schema import SlotSchema
+
+SCHEMA = SlotSchema([
+    ('Cuisine', {'one_of': ['Thai', 'Korean'], 'message': 'No {} food'}),
+    ('Location', {'one_of': ['new york'], 'or_pattern': r'\d{5}', 'message': 'Not in {}'}),
+    ('NumPeople', {'int_range': (1, 20), 'message': '{} people'}),
+    ('DiningTime', {'time_window': (10, 22), 'message': 'Closed at {}', 'format_message': 'Bad time {}'}),
+    ('PhoneNum', {'pattern': r'\d{10}', 'message': 'Bad phone {}'}),
+])
+
+
+@pytest.mark.parametrize('slots, violation', [
+    ({}, None),
+    ({'Cuisine': None, 'Location': None}, None),
+    ({'Cuisine': 'THAI', 'Location': '10001', 'NumPeople': '20', 'DiningTime': '22:59', 'PhoneNum': '2125550100'},
+     None),
+    ({'Cuisine': 'French'}, ('Cuisine', 'No French food')),
+    ({'Cuisine': ''}, None),
+    ({'Location': 'Boston'}, ('Location', 'Not in Boston')),
+    ({'NumPeople': '04'}, None),
+    ({'NumPeople': '0'}, ('NumPeople', '0 people')),
+    ({'NumPeople': 'four'}, ('NumPeople', 'four people')),
+    ({'DiningTime': '09:59'}, ('DiningTime', 'Closed at 09:59')),
+    ({'DiningTime': '23:00'}, ('DiningTime', 'Closed at 23:00')),
+    ({'DiningTime': '10:75'}, ('DiningTime', 'Bad time 10:75')),
+    ({'DiningTime': '24:00'}, ('DiningTime', 'Bad time 24:00')),
+    ({'DiningTime': '7pm'}, ('DiningTime', 'Bad time 7pm')),
+    ({'PhoneNum': '555-0100'}, ('PhoneNum', 'Bad phone 555-0100')),
+])
+def test_first_violation(slots, violation):
+    assert SCHEMA.first_violation(slots) == violation
+
+
+def test_slots_are_checked_in_declaration_order():
+    assert SCHEMA.slots == ['Cuisine', 'Location', 'NumPeople', 'DiningTime', 'PhoneNum']
+    assert SCHEMA.first_violation({'PhoneNum': 'x', 'Cuisine': 'French'})[0] == 'Cuisine'
+
+
+def test_rules_need_exactly_one_kind():
+    with pytest.raises(ValueError):
+        SlotSchema([('NumPeople', {'message': 'm'})])
+    with pytest.raises(ValueError):
+        SlotSchema([('NumPeople', {'int_range': (1, 2), 'pattern': r'\d', 'message': 'm'})])
+
+
+def test_suggest_dine_rejects_minutes_past_59():
+    result = lf1.validate_suggest_dine({'Location': 'New York', 'Cuisine': 'Thai', 'DiningTime': '10:75',
+                                        'NumPeople': '2', 'PhoneNum': '2125550100'})
+
+    assert result['isValid'] is False
+    assert result['violatedSlot'] == 'DiningTime'
+    assert result['message']['content'] == 'Invalid time format, please use HH:MM format.'
+    assert lf1.validate_suggest_dine({'Location': 'New York', 'DiningTime': '21:45'}) == {'isValid': True}
@@ -0,0 +1,61 @@
+import json
+import logging
+import re
+import subprocess
+import sys
+
+import structured_log
+from structured_log import JsonFormatter, correlation, is_sampled, lazy, log_sampled, new_correlation_id
+
+
+def test_correlation_ids_are_random_hex():
+    first, second = new_correlation_id(), new_correlation_id()
+
+    assert re.match(r'[0-9a-f]{32}\Z', first)
+    assert first != second
+
+
+def test_importing_does_not_load_uuid():
+    # uuid costs ~10 ms of cold start and is not needed for random hex ids.
+    code = 'import sys, structured_log; print("uuid" in sys.modules)'
+    output = subprocess.run([sys.executable, '-c', code], cwd=structured_log.__file__.rsplit('/', 1)[0],
+                            stdout=subprocess.PIPE, universal_newlines=True, check=True).stdout
+
+    assert output.strip() == 'False'
+
+
+def test_records_are_json_tagged_with_the_correlation_id():
+    record = logging.LogRecord('root', logging.INFO, __file__, 1, 'found %d', (3,), None)
+
+    with correlation('abc'):
+        entry = json.loads(JsonFormatter().format(record))
+
+    assert (entry['message'], entry['level'], entry['correlation_id']) == ('found 3', 'INFO', 'abc')
+    assert 'correlation_id' not in json.loads(JsonFormatter().format(record))
+
+
+def test_sampling_is_decided_per_correlation_id():
+    decisions = set()
+    for _ in range(3):
+        with correlation('request-42'):
+            decisions.add(is_sampled(0.5))
+    assert len(decisions) == 1
+
+    with correlation('request-42'):
+        assert is_sampled(1) and not is_sampled(0)
+
+
+def test_unsampled_payloads_are_never_built(caplog):
+    calls = []
+    payload = lazy(lambda: calls.append(1) or 'payload')
+    logger = logging.getLogger('test_structured_log')
+    logger.setLevel(logging.INFO)
+
+    with correlation('id'), caplog.at_level(logging.INFO, logger='test_structured_log'):
+        structured_log._context.sampled = False
+        log_sampled(logger, 'payload: %s', payload)
+        assert calls == [] and not caplog.records
+        structured_log._context.sampled = True
+        log_sampled(logger, 'payload: %s', payload)
+
+    assert [record.getMessage() for record in caplog.records] == ['payload: payload']
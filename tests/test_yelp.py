@@ -0,0 +1,163 @@
+import json
+import time
+
+import pytest
+
+pytest.importorskip('boto3')
+pytest.importorskip('requests')
+
+import yelp
+from fake_yelp_server import FakeYelpServer
+from local_aws import FakeDynamoDB
+
+CITIES = {'New York'}
+CUISINES = {'korean', 'thai'}
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeYelpServer(businesses_per_term=120).start()
+    monkeypatch.setattr(yelp, 'SEARCH_API_URL', server.url)
+    monkeypatch.setattr(yelp, 'RETRY_BASE_DELAY', 0.001)
+    yield server
+    server.stop()
+
+
+def crawl(tmp_path, **options):
+    options = dict({'cities': CITIES, 'cuisines': CUISINES, 'workers': 2, 'requests_per_second': 1000,
+                    'checkpoint_path': str(tmp_path / 'staging.jsonl.checkpoint.json'),
+                    'staging_path': str(tmp_path / 'staging.jsonl')}, **options)
+    yelp.yelp(**options)
+
+
+def staged(tmp_path):
+    with open(str(tmp_path / 'staging.jsonl')) as staging_file:
+        return [json.loads(line) for line in staging_file]
+
+
+def test_crawl_writes_every_business_once(server, tmp_path):
+    server.throttle_every = 4
+
+    crawl(tmp_path)
+
+    rows = staged(tmp_path)
+    assert len(rows) == 240
+    assert len({row['id'] for row in rows}) == 240
+    assert {row['Cuisine'] for row in rows} == CUISINES
+    assert all(row['Name'] and row['Address'] and row['Zip Code'] for row in rows)
+    # Throttled pages were retried rather than lost; 3 pages per search.
+    assert server.throttled > 0
+    assert server.requests == 6 + server.throttled
+    # A finished crawl leaves no checkpoint behind.
+    assert not (tmp_path / 'staging.jsonl.checkpoint.json').exists()
+
+
+def test_token_bucket_limits_the_request_rate():
+    limiter = yelp.TokenBucket(rate=200, capacity=1)
+
+    start = time.monotonic()
+    for _ in range(21):
+        limiter.acquire()
+
+    assert time.monotonic() - start >= 0.095
+
+
+def items(cuisine, ids):
+    return [{'id': id, 'Cuisine': cuisine, 'Name': id} for id in ids]
+
+
+def test_store_sink_counts_new_and_stored_businesses_from_the_ids_file(tmp_path):
+    dynamodb = FakeDynamoDB()
+    seen_ids = str(tmp_path / 'seen-ids.txt')
+
+    first = yelp.StoreSink(dynamodb, seen_ids)
+    first.write('thai', items('thai', ['a', 'b']))
+    first.close()
+    second = yelp.StoreSink(dynamodb, seen_ids)
+    second.write('thai', items('thai', ['b', 'c']))
+    second.write('korean', items('korean', ['c']))
+    second.close()
+
+    assert (second.count, second.repeated, second.duplicates) == ({'thai': 1}, {'thai': 1}, 1)
+    assert sorted(dynamodb.Table('yelp-restaurants')._items) == ['a', 'b', 'c']
+    assert dynamodb.stats['scan'] == 0
+    assert dynamodb.stats['batch_write_item'] == 2
+
+
+def test_store_sink_without_an_ids_file_never_reads_the_table():
+    dynamodb = FakeDynamoDB()
+    dynamodb.Table('yelp-restaurants').load(items('thai', ['a']))
+
+    sink = yelp.StoreSink(dynamodb)
+    sink.write('thai', items('thai', ['a', 'b']))
+    sink.close()
+
+    assert (sink.count, sink.repeated) == ({'thai': 2}, {})
+    assert dynamodb.stats['scan'] == 0
+    assert dynamodb.stats['items_read'] == 0
+
+
+def test_crawl_into_the_table(server, tmp_path):
+    dynamodb = FakeDynamoDB()
+
+    crawl(tmp_path, staging_path=None, dynamodb=dynamodb, checkpoint_path=str(tmp_path / 'checkpoint.json'))
+
+    assert len(dynamodb.Table('yelp-restaurants')._items) == 240
+    assert dynamodb.stats['scan'] == 0
+    # One batch per 25 items, flushed once per 50-business page (3 pages of 50, 50 and 20 per search).
+    assert dynamodb.stats['batch_write_item'] == 2 * (2 + 2 + 1)
+
+
+def test_interrupted_crawl_resumes_where_it_stopped(server, monkeypatch, tmp_path):
+    checkpoint = tmp_path / 'staging.jsonl.checkpoint.json'
+    # One worker crawls korean then thai, 3 pages each; the 5th request (thai at
+    # offset 50) is throttled and, with no retries, abandons that search.
+    monkeypatch.setattr(yelp, 'MAX_RETRIES', 0)
+    server.throttle_every = 5
+
+    crawl(tmp_path, workers=1)
+
+    assert len(staged(tmp_path)) == 170
+    saved = json.loads(checkpoint.read_text())
+    assert saved['sink'] == 'staging:' + str(tmp_path / 'staging.jsonl')
+    assert saved['searches'] == {'New York|korean': {'next_offset': 150, 'done': True},
+                                 'New York|thai': {'next_offset': 50, 'done': False}}
+
+    server.throttle_every = 0
+    server.requests = 0
+    crawl(tmp_path, workers=1)
+
+    rows = staged(tmp_path)
+    assert len(rows) == 240 and len({row['id'] for row in rows}) == 240
+    assert server.requests == 2
+    assert not checkpoint.exists()
+
+
+def test_new_dry_run_starts_the_staging_file_over(server, tmp_path):
+    (tmp_path / 'staging.jsonl').write_text('{"id": "stale"}\n')
+
+    crawl(tmp_path)
+
+    assert 'stale' not in {row['id'] for row in staged(tmp_path)}
+
+
+def test_checkpoint_of_a_dry_run_is_not_resumed_into_the_table(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    dry_run = yelp.CrawlCheckpoint(path, 'staging:/tmp/staging.jsonl')
+    dry_run.record('New York', 'thai', 0, False)
+
+    with pytest.raises(ValueError):
+        yelp.CrawlCheckpoint(path, 'dynamodb:yelp-restaurants')
+    assert yelp.CrawlCheckpoint(path, 'staging:/tmp/staging.jsonl').remaining(CITIES, CUISINES) == [
+        ('New York', 'korean', 0), ('New York', 'thai', 50)]
+
+
+def test_dry_runs_default_to_their_own_checkpoint(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(yelp, 'yelp', lambda **options: calls.append(options['checkpoint_path']))
+
+    for argv in (['yelp.py'], ['yelp.py', '--dry-run', 'staging.jsonl']):
+        monkeypatch.setattr('sys.argv', argv)
+        yelp.main()
+
+    assert calls == ['yelp-checkpoint.json', 'staging.jsonl.checkpoint.json']